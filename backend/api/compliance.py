@@ -1,19 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 from backend.core.database import get_db
 from backend.core.security import verify_token
 from backend.compliance.service import ComplianceService
 from backend.compliance.sanctions import sanctions_service
+from backend.compliance.sanctions_index import sanctions_lists
+from backend.compliance.bulk_screening import bulk_screener
+from backend.compliance.delta_rescreen import delta_rescreener
+from backend.compliance.monitoring import transaction_monitor, monitoring_replay
+from backend.compliance.alert_aggregator import alert_aggregator
+from backend.compliance.kyc_pipeline import kyc_pipeline
 from backend.compliance.audit_log import audit_log_service
+from backend.compliance.chain_verifier import parallel_chain_verifier
 from backend.compliance.schemas import (
     AuditLogResponse,
     ComplianceAlertResponse,
+    ComplianceAlertPage,
     KYCVerificationRequest,
+    KYCBatchVerificationRequest,
+    KYCJobResponse,
     SanctionScreeningRequest,
+    SanctionBatchScreeningRequest,
+    SanctionBatchJobResponse,
     SanctionCheckResult,
+    MonitoringReplayRequest,
     AuditLogExportRequest,
+    AuditLogStreamExportRequest,
     AuditLogExportResponse
 )
 
@@ -95,33 +110,137 @@ async def export_audit_logs(
         generated_at=datetime.utcnow()
     )
 
+@router.post("/audit-logs/export/stream")
+async def stream_audit_logs(
+    export_request: AuditLogStreamExportRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Stream audit logs as NDJSON or CSV, optionally gzipped, for large date ranges"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    extension = "csv" if export_request.format == "csv" else "ndjson"
+    media_type = "text/csv" if export_request.format == "csv" else "application/x-ndjson"
+    if export_request.gzip:
+        extension += ".gz"
+        media_type = "application/gzip"
+    
+    filename = f"audit_logs_{export_request.start_date:%Y%m%d}_{export_request.end_date:%Y%m%d}.{extension}"
+    
+    return StreamingResponse(
+        audit_log_service.stream_export(
+            export_request.start_date,
+            export_request.end_date,
+            format=export_request.format,
+            compress=export_request.gzip
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/audit-logs/verify-chain")
 async def verify_audit_chain(
+    full: bool = False,
+    parallel: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
-    """Verify integrity of audit log chain"""
+    """Verify integrity of audit log chain since the last checkpoint, or in full"""
     if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    is_valid = await audit_log_service.verify_chain(db)
+    # Parallel verification is always a full rescan across a process pool
+    if parallel:
+        result = await parallel_chain_verifier.verify(db, verified_by=current_user.get("sub"))
+    else:
+        result = await audit_log_service.verify_chain(db, full=full, verified_by=current_user.get("sub"))
     
     return {
-        "chain_valid": is_valid,
-        "message": "Audit log chain is intact" if is_valid else "Audit log chain has been tampered with"
+        **result.model_dump(),
+        "message": "Audit log chain is intact" if result.chain_valid else "Audit log chain has been tampered with"
     }
 
-@router.get("/alerts", response_model=List[ComplianceAlertResponse])
+@router.get("/audit-logs/{log_id}/proof")
+async def get_audit_log_proof(
+    log_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Get and verify the Merkle inclusion proof of an audit log entry"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    proof = await audit_log_service.get_inclusion_proof(db, log_id)
+    if not proof:
+        raise HTTPException(status_code=404, detail="Audit log not found")
+    
+    return proof
+
+@router.post("/audit-logs/archive/seal")
+async def seal_audit_logs(
+    day: date,
+    purge: bool = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Seal audit logs through the end of a day into a compressed archive segment"""
+    if current_user.get("role") != "bank_admin":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if not audit_log_service.archive:
+        raise HTTPException(status_code=400, detail="Audit archive is not configured")
+    
+    try:
+        segment = await audit_log_service.archive.seal_day(db, day, purge=purge)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not segment:
+        return {"message": "Nothing to seal", "day": day}
+    
+    return {"message": "Audit logs sealed", "segment": segment}
+
+@router.get("/alerts", response_model=ComplianceAlertPage)
 async def get_compliance_alerts(
+    status: str = "open",
+    severity: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
-    """Get open compliance alerts"""
+    """Get compliance alerts newest first, one page at a time"""
     if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    alerts = await ComplianceService.get_open_alerts(db)
-    return alerts
+    try:
+        alerts, next_cursor = await ComplianceService.list_alerts(
+            db,
+            status=status,
+            severity=severity,
+            alert_type=alert_type,
+            user_id=user_id,
+            cursor=cursor,
+            limit=max(1, min(limit, 500))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"alerts": alerts, "next_cursor": next_cursor}
+
+@router.get("/alerts/counts")
+async def get_compliance_alert_counts(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Open alerts per severity"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    counts = await ComplianceService.get_open_alert_counts(db)
+    return {"open": sum(counts.values()), "by_severity": counts}
 
 @router.post("/alerts/{alert_id}/resolve")
 async def resolve_alert(
@@ -141,6 +260,64 @@ async def resolve_alert(
     
     return {"message": "Alert resolved", "alert_id": alert_id}
 
+@router.post("/kyc/verify", response_model=KYCJobResponse, status_code=202)
+async def verify_kyc(
+    verification_request: KYCVerificationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Queue KYC verification; poll the job or wait for the websocket event"""
+    is_staff = current_user.get("role") in ["bank_admin", "compliance_officer"]
+    if verification_request.user_id != current_user.get("sub") and not is_staff:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if verification_request.priority == "premium" and not is_staff:
+        raise HTTPException(status_code=403, detail="Premium onboarding requires staff")
+    
+    try:
+        jobs = await kyc_pipeline.submit(db, [verification_request], current_user.get("sub"))
+        await db.commit()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    kyc_pipeline.notify()
+    
+    return await kyc_pipeline.get_job(db, jobs[0]["id"])
+
+@router.post("/kyc/verify/batch", status_code=202)
+async def verify_kyc_batch(
+    batch_request: KYCBatchVerificationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Queue KYC verification for an onboarding campaign"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    try:
+        jobs = await kyc_pipeline.submit(db, batch_request.requests, current_user.get("sub"))
+        await db.commit()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    kyc_pipeline.notify()
+    
+    return {"queued": len(jobs), "job_ids": [job["id"] for job in jobs]}
+
+@router.get("/kyc/jobs/{job_id}", response_model=KYCJobResponse)
+async def get_kyc_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Progress of a KYC verification job"""
+    job = await kyc_pipeline.get_job(db, job_id)
+    is_staff = current_user.get("role") in ["bank_admin", "compliance_officer"]
+    if not job or (job.user_id != current_user.get("sub") and not is_staff):
+        raise HTTPException(status_code=404, detail="KYC job not found")
+    
+    return job
+
 @router.post("/sanctions/screen", response_model=SanctionCheckResult)
 async def screen_sanctions(
     screening_request: SanctionScreeningRequest,
@@ -155,7 +332,8 @@ async def screen_sanctions(
         name=screening_request.name,
         country=screening_request.country,
         entity_type=screening_request.entity_type,
-        db=db
+        db=db,
+        checked_by=current_user.get("sub")
     )
     
     # Log the sanctions check
@@ -174,3 +352,204 @@ async def screen_sanctions(
     )
     
     return result
+
+@router.post("/sanctions/screen/batch")
+async def screen_sanctions_batch(
+    batch_request: SanctionBatchScreeningRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Screen many entities, streaming NDJSON results as each chunk is recorded"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer", "operations"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return StreamingResponse(
+        bulk_screener.stream(batch_request.entities, created_by=current_user.get("sub")),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/sanctions/screen/jobs", response_model=SanctionBatchJobResponse, status_code=202)
+async def create_sanctions_screening_job(
+    batch_request: SanctionBatchScreeningRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Screen many entities in the background; poll the job for progress"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer", "operations"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    job = await bulk_screener.submit(batch_request.entities, created_by=current_user.get("sub"))
+    return job.summary()
+
+@router.get("/sanctions/screen/jobs/{job_id}", response_model=SanctionBatchJobResponse)
+async def get_sanctions_screening_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Progress of a background screening job"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer", "operations"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    job = await bulk_screener.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Screening job not found")
+    
+    return job
+
+@router.get("/sanctions/screen/jobs/{job_id}/hits", response_model=List[SanctionCheckResult])
+async def get_sanctions_screening_hits(
+    job_id: str,
+    limit: int = 100,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Results of a screening batch that matched a sanctions list"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    checks = await ComplianceService.get_batch_sanction_hits(db, job_id, limit=min(limit, 1000), offset=offset)
+    return [_check_result(check) for check in checks]
+
+@router.get("/sanctions/checks", response_model=List[SanctionCheckResult])
+async def get_sanction_checks_for_name(
+    name: str,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Screening history for a name, matched on its stored normalized and phonetic keys"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    checks = await ComplianceService.get_sanction_checks_for_name(db, name, limit=min(limit, 1000))
+    return [_check_result(check) for check in checks]
+
+def _check_result(check) -> SanctionCheckResult:
+    return SanctionCheckResult(
+        entity_name=check.entity_name,
+        entity_type=check.entity_type,
+        country=check.country,
+        risk_level=check.risk_level,
+        matches=check.matches or [],
+        checked_at=check.screened_at or check.created_at,
+        lists_checked=check.lists_checked or [],
+        lists_failed=check.lists_failed or [],
+        list_version=check.list_version,
+        check_id=check.id,
+        cache_hit=bool(check.cache_hit)
+    )
+
+@router.get("/sanctions/lists")
+async def get_sanctions_lists(current_user: dict = Depends(verify_token)):
+    """Version and size of the locally loaded sanctions lists"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if not sanctions_lists.index:
+        return {"loaded": False, "cache": sanctions_service.cache.stats()}
+    
+    return {"loaded": True, **sanctions_lists.index.stats(), "cache": sanctions_service.cache.stats()}
+
+@router.post("/sanctions/lists/reload")
+async def reload_sanctions_lists(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Reload sanctions list files and swap in the new index if they changed"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    previous = sanctions_lists.index.version if sanctions_lists.index else None
+    try:
+        index = await sanctions_lists.reload()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to load sanctions lists: {e}")
+    
+    if not index:
+        raise HTTPException(status_code=404, detail="No sanctions list files found")
+    
+    stats = index.stats()
+    if index.version != previous:
+        await audit_log_service.log_event(
+            db=db,
+            event_type="sanctions_lists_reloaded",
+            user_id=current_user.get("sub"),
+            action="reload_sanctions_lists",
+            resource_type="sanctions",
+            resource_id=index.version,
+            details={
+                "previous_version": previous,
+                "version": index.version,
+                "entries": stats["entries"],
+                "names_indexed": stats["names_indexed"]
+            }
+        )
+        # Rescreen customers against the entries that changed; queued behind a run already going
+        started = delta_rescreener.submit(triggered_by=current_user.get("sub"), queue=True)
+        return {"reloaded": True, "rescreen": "started" if started else "queued", **stats}
+    
+    return {"reloaded": False, **stats}
+
+@router.post("/sanctions/rescreen", status_code=202)
+async def rescreen_customers(
+    full: bool = False,
+    current_user: dict = Depends(verify_token)
+):
+    """Rescreen KYC'd customers against changed list entries, or all entries with full=true"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if not sanctions_lists.index:
+        raise HTTPException(status_code=400, detail="No sanctions lists loaded")
+    
+    if not delta_rescreener.submit(full=full, triggered_by=current_user.get("sub")):
+        raise HTTPException(status_code=409, detail="A rescreen is already running")
+    
+    return {"message": "Rescreen started", "full": full}
+
+@router.get("/sanctions/rescreen")
+async def get_rescreen_status(current_user: dict = Depends(verify_token)):
+    """Status of the most recent customer rescreen"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return {
+        "running": delta_rescreener.running,
+        "pending": delta_rescreener.pending,
+        "last_run": delta_rescreener.last_run
+    }
+
+@router.get("/monitoring")
+async def get_monitoring_stats(current_user: dict = Depends(verify_token)):
+    """Live transaction monitoring counters and the most recent replay"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return {
+        **transaction_monitor.stats(),
+        "aggregator": alert_aggregator.stats(),
+        "replay": {"running": monitoring_replay.running, "last_run": monitoring_replay.last_run}
+    }
+
+@router.post("/monitoring/replay", status_code=202)
+async def replay_transactions(
+    request: MonitoringReplayRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Run the monitoring rules over historical transactions"""
+    if current_user.get("role") not in ["bank_admin", "compliance_officer"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if request.since and request.until and request.since >= request.until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    
+    started = monitoring_replay.submit(
+        since=request.since,
+        until=request.until,
+        record=request.record,
+        triggered_by=current_user.get("sub")
+    )
+    if not started:
+        raise HTTPException(status_code=409, detail="A replay is already running")
+    
+    return {"message": "Replay started", "record": request.record}
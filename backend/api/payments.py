@@ -4,41 +4,114 @@ from backend.core.database import get_db
 from backend.core.security import verify_token
 from backend.payments.pi_service import PiNetworkService
 from backend.payments.fx_service import FXService
-from pydantic import BaseModel
-from typing import Dict
+from backend.payments.fx_history import FXRateHistory
+from backend.payments.models import PiPaymentOutbox
+from backend.payments.outbox import pi_payment_saga
+from backend.core.config import settings
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
+from decimal import Decimal
+from datetime import datetime
 
 router = APIRouter()
 pi_service = PiNetworkService()
-fx_service = FXService()
+fx_service = FXService(
+    history=FXRateHistory(settings.FX_HISTORY_PATH) if settings.FX_HISTORY_PATH else None
+)
 
 class PaymentCreate(BaseModel):
-    amount: float
+    amount: Decimal
     currency: str
     memo: str
     metadata: Dict
+    account_id: Optional[str] = None
+
+class PaymentCompletion(BaseModel):
+    txid: str
 
 class FXConversion(BaseModel):
     amount: float
     from_currency: str
     to_currency: str
 
-@router.post("/pi/create")
+class FXBatchConversion(BaseModel):
+    amounts: List[Decimal] = Field(..., max_length=100_000)
+    from_currencies: List[str]
+    to_currencies: List[str]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        if not (len(self.amounts) == len(self.from_currencies) == len(self.to_currencies)):
+            raise ValueError("amounts, from_currencies and to_currencies must have the same length")
+        return self
+
+@router.post("/pi/create", status_code=202)
 async def create_pi_payment(
     payment_data: PaymentCreate,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
-    """Create Pi Network payment"""
+    """Record a Pi Network payment; the saga workers drive it against Pi"""
     try:
-        result = await pi_service.create_payment(
+        outbox = await pi_payment_saga.enqueue(
+            db,
             amount=payment_data.amount,
+            currency=payment_data.currency,
             memo=payment_data.memo,
-            metadata=payment_data.metadata
+            metadata=payment_data.metadata,
+            user_id=current_user.get("sub"),
+            account_id=payment_data.account_id
         )
-        return result
+        await db.commit()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    pi_payment_saga.notify()
+
+    return {
+        "outbox_id": outbox.id,
+        "transaction_id": outbox.transaction_id,
+        "state": outbox.state
+    }
+
+@router.get("/pi/outbox/{outbox_id}")
+async def get_pi_payment_progress(
+    outbox_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Get saga progress for a Pi payment"""
+    outbox = await db.get(PiPaymentOutbox, outbox_id)
+    if not outbox or outbox.user_id != current_user.get("sub"):
+        raise HTTPException(status_code=404, detail="Payment not found")
+
+    return {
+        "outbox_id": outbox.id,
+        "transaction_id": outbox.transaction_id,
+        "state": outbox.state,
+        "pi_payment_id": outbox.pi_payment_id,
+        "attempts": outbox.attempts,
+        "last_error": outbox.last_error,
+        "updated_at": outbox.updated_at
+    }
+
+@router.post("/pi/outbox/{outbox_id}/complete", status_code=202)
+async def complete_pi_payment(
+    outbox_id: str,
+    completion: PaymentCompletion,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Submit the blockchain txid so the saga can complete the payment"""
+    outbox = await pi_payment_saga.record_txid(db, outbox_id, completion.txid, current_user.get("sub"))
+    if not outbox:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    await db.commit()
+
+    pi_payment_saga.notify()
+
+    return {"outbox_id": outbox.id, "state": outbox.state}
+
 @router.get("/pi/{payment_id}")
 async def get_pi_payment(
     payment_id: str,
@@ -63,6 +136,29 @@ async def get_fx_rates(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/fx/rates/as-of")
+async def get_fx_rate_as_of(
+    from_currency: str,
+    to_currency: str,
+    at: datetime,
+    current_user: dict = Depends(verify_token)
+):
+    """Get the FX rate that was in effect at a point in time"""
+    try:
+        rate = fx_service.rate_as_of(from_currency, to_currency, at)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if rate is None:
+        raise HTTPException(status_code=404, detail="No FX snapshot recorded before the requested time")
+
+    return {
+        "from_currency": from_currency,
+        "to_currency": to_currency,
+        "at": at,
+        "rate": rate
+    }
+
 @router.post("/fx/convert")
 async def convert_currency(
     conversion: FXConversion,
@@ -83,3 +179,23 @@ async def convert_currency(
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/fx/convert:batch")
+async def convert_currency_batch(
+    batch: FXBatchConversion,
+    current_user: dict = Depends(verify_token)
+):
+    """Convert many amounts in one request, rounded to each target currency's minor unit"""
+    try:
+        converted, rates = await fx_service.convert_batch(
+            batch.amounts,
+            batch.from_currencies,
+            batch.to_currencies
+        )
+        return {
+            "count": len(converted),
+            "converted_amounts": converted,
+            "rates": rates
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
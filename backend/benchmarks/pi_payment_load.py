@@ -0,0 +1,226 @@
+"""
+Load harness for the Pi payment path.
+
+Drives /api/v1/payments/pi/* end-to-end (create -> wait for approval ->
+complete -> wait for completion) at a fixed arrival rate and writes a JSON
+report with throughput, latency percentiles and an error breakdown.
+
+    uvicorn backend.payments.pi_simulator:app --port 8100
+    PI_API_BASE_URL=http://localhost:8100 uvicorn backend.main:app --port 8000
+    python -m backend.benchmarks.pi_payment_load --rps 50 --duration 60 --output results.json
+
+Flows are spread over simulated users, one bearer token each, so no user
+goes over the per-user transfer quota the rate limiter enforces on create.
+"""
+
+from typing import Dict, List, Optional
+from collections import Counter, defaultdict
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+import httpx
+
+# Creates per simulated user and hour; the rate limiter's TRANSFERS quota allows 30
+FLOWS_PER_USER = 30
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize(samples: List[float]) -> Dict:
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else None,
+        "p50_ms": percentile(samples, 50) * 1000 if samples else None,
+        "p95_ms": percentile(samples, 95) * 1000 if samples else None,
+        "p99_ms": percentile(samples, 99) * 1000 if samples else None,
+        "max_ms": max(samples) * 1000 if samples else None,
+    }
+
+class PaymentLoadHarness:
+    """
+    Open-loop load generator: arrivals are scheduled regardless of response times.
+    Flow n runs as simulated user n % len(tokens).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        tokens: List[str],
+        rps: float,
+        duration: float,
+        max_in_flight: int = 1000,
+        poll_interval: float = 0.2,
+        flow_timeout: float = 60.0,
+        complete: bool = True
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.tokens = tokens
+        self.rps = rps
+        self.duration = duration
+        self.poll_interval = poll_interval
+        self.flow_timeout = flow_timeout
+        self.complete = complete
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.flow_latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.outcomes: Counter = Counter()
+        self.dropped = 0
+
+    async def _request(self, client: httpx.AsyncClient, name: str, method: str, path: str, **kwargs) -> Optional[Dict]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[f"{name}: {type(e).__name__}"] += 1
+            return None
+        finally:
+            self.latencies[name].append(time.perf_counter() - start)
+
+        if response.status_code >= 400:
+            self.errors[f"{name}: HTTP {response.status_code}"] += 1
+            return None
+        return response.json()
+
+    async def _wait_for(self, client: httpx.AsyncClient, outbox_id: str, states: tuple, deadline: float, headers: Dict) -> Optional[str]:
+        while time.perf_counter() < deadline:
+            progress = await self._request(client, "progress", "GET", f"/api/v1/payments/pi/outbox/{outbox_id}", headers=headers)
+            state = progress.get("state") if progress else None
+            if state in states or state == "failed":
+                return state
+            await asyncio.sleep(self.poll_interval)
+        return "timeout"
+
+    async def _flow(self, client: httpx.AsyncClient, n: int):
+        start = time.perf_counter()
+        deadline = start + self.flow_timeout
+        headers = {"Authorization": f"Bearer {self.tokens[n % len(self.tokens)]}"}
+        try:
+            created = await self._request(client, "create", "POST", "/api/v1/payments/pi/create", headers=headers, json={
+                "amount": "1.0",
+                "currency": "PI",
+                "memo": f"load test {n}",
+                "metadata": {"load_test": True, "n": n}
+            })
+            if not created:
+                self.outcomes["create_failed"] += 1
+                return
+
+            outbox_id = created["outbox_id"]
+            if not self.complete:
+                self.outcomes["created"] += 1
+                self.flow_latencies.append(time.perf_counter() - start)
+                return
+
+            state = await self._wait_for(client, outbox_id, ("approved", "completed"), deadline, headers)
+            if state == "approved":
+                await self._request(
+                    client, "complete", "POST", f"/api/v1/payments/pi/outbox/{outbox_id}/complete",
+                    headers=headers, json={"txid": uuid.uuid4().hex}
+                )
+                state = await self._wait_for(client, outbox_id, ("completed",), deadline, headers)
+
+            self.outcomes[state] += 1
+            if state == "completed":
+                self.flow_latencies.append(time.perf_counter() - start)
+        finally:
+            self._slots.release()
+
+    async def run(self) -> Dict:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+        tasks = []
+        started = time.perf_counter()
+
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30.0) as client:
+            interval = 1.0 / self.rps
+            n = 0
+            while True:
+                scheduled = started + n * interval
+                if scheduled - started >= self.duration:
+                    break
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+                # Count arrivals we could not issue instead of silently slowing down
+                if self._slots.locked():
+                    self.dropped += 1
+                else:
+                    await self._slots.acquire()
+                    tasks.append(asyncio.create_task(self._flow(client, n)))
+                n += 1
+
+            await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - started
+        return self.report(n, elapsed)
+
+    def report(self, scheduled: int, elapsed: float) -> Dict:
+        requests = sum(len(v) for v in self.latencies.values())
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "target": {"base_url": self.base_url, "rps": self.rps, "duration_s": self.duration, "users": len(self.tokens)},
+            "elapsed_s": elapsed,
+            "flows": {
+                "scheduled": scheduled,
+                "dropped": self.dropped,
+                "outcomes": dict(self.outcomes),
+                "throughput_per_s": self.outcomes.get("completed" if self.complete else "created", 0) / elapsed,
+                "latency": summarize(self.flow_latencies),
+            },
+            "requests": {
+                "total": requests,
+                "throughput_per_s": requests / elapsed,
+                "by_endpoint": {name: summarize(samples) for name, samples in self.latencies.items()},
+            },
+            "errors": dict(self.errors),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Pi payment path")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", action="append", help="Bearer token of one simulated user; repeat for more. Minted from SECRET_KEY when omitted")
+    parser.add_argument("--users", type=int, help="Users to mint tokens for; by default enough to stay within the per-user transfer quota")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--create-only", action="store_true", help="Measure only the create request")
+    parser.add_argument("--label", help="Release or run label stored in the report")
+    parser.add_argument("--output", default="pi_payment_load.json")
+    args = parser.parse_args()
+
+    tokens = args.token
+    if not tokens:
+        from backend.core.security import create_access_token
+        # Every create counts against its user's hourly transfer quota
+        users = args.users or max(1, math.ceil(args.rps * args.duration / FLOWS_PER_USER))
+        tokens = [create_access_token({"sub": f"load-test-{i}", "role": "operations"}) for i in range(users)]
+
+    harness = PaymentLoadHarness(
+        args.base_url,
+        tokens,
+        rps=args.rps,
+        duration=args.duration,
+        max_in_flight=args.max_in_flight,
+        complete=not args.create_only
+    )
+    report = asyncio.run(harness.run())
+    report["label"] = args.label
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    flows = report["flows"]
+    print(f"{flows['outcomes']} in {report['elapsed_s']:.1f}s, "
+          f"{flows['throughput_per_s']:.1f} flows/s, p99 {flows['latency']['p99_ms']} ms -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
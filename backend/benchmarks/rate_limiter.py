@@ -0,0 +1,169 @@
+"""
+Benchmark for the in-memory rate limiter.
+
+Runs the limiter against a simulated clock, so it needs no server: a spread
+of distinct keys (one per client), a single abusive key hammering its limit,
+and an idle period after which every key should have been evicted. A last
+scenario has several processes share limits through the Redis backend
+(InProcessRedis unless --redis-url is given) and counts round trips. Writes
+a JSON report with check throughput, memory per key and eviction counts.
+
+    python -m backend.benchmarks.rate_limiter --keys 100000 --requests 1000000 --output results.json
+"""
+
+from typing import Dict
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from backend.security.rate_limiter import RateLimiter, RedisRateLimitBackend, InProcessRedis
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def distinct_keys(keys: int, requests: int, max_requests: int, window: float, rate: float) -> Dict:
+    """Requests from `keys` clients arriving at `rate` per second overall"""
+    clock = SimulatedClock()
+    limiter = RateLimiter(clock=clock)
+    names = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+    order = [random.randrange(keys) for _ in range(requests)]
+
+    allowed = 0
+    started = time.perf_counter()
+    for index in order:
+        clock.now += 1 / rate
+        ok, _ = limiter.check(names[index], max_requests, window)
+        allowed += ok
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "allowed": allowed,
+        "elapsed_s": elapsed,
+        "checks_per_s": requests / elapsed,
+        "mean_us": elapsed / requests * 1e6,
+        "tracked_keys": len(limiter),
+    }
+
+def memory_per_key(keys: int, max_requests: int, window: float) -> Dict:
+    """Every key active at once, so none can be evicted; measures limiter state only"""
+    clock = SimulatedClock()
+    limiter = RateLimiter(clock=clock)
+    names = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for name in names:
+        limiter.check(name, max_requests, window)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {
+        "tracked_keys": len(limiter),
+        "bytes_per_key": used / keys,
+        "limiter": limiter,
+        "clock": clock,
+    }
+
+def hot_key(requests: int, max_requests: int, window: float, rate: float) -> Dict:
+    """One client sending far above its limit; the check stays constant time"""
+    clock = SimulatedClock()
+    limiter = RateLimiter(clock=clock)
+    allowed = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        clock.now += 1 / rate
+        ok, _ = limiter.check("abuser", max_requests, window)
+        allowed += ok
+    elapsed = time.perf_counter() - started
+    simulated = requests / rate
+    return {
+        "requests": requests,
+        "allowed": allowed,
+        "expected_allowed": int(max_requests + simulated / window * max_requests),
+        "checks_per_s": requests / elapsed,
+        "mean_us": elapsed / requests * 1e6,
+    }
+
+async def shared_backend(processes: int, keys: int, requests: int, max_requests: int, window: float, redis_url: str) -> Dict:
+    """Round-robin requests over `processes` backends sharing one store; the limit must hold globally"""
+    store = None if redis_url else InProcessRedis()
+    backends = [RedisRateLimitBackend(redis_url, client=store) for _ in range(processes)]
+    names = [f"shared-{i}" for i in range(keys)]
+    allowed = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        ok, _ = await backends[i % processes].is_allowed(names[i % keys], max_requests, window)
+        allowed += ok
+    elapsed = time.perf_counter() - started
+    round_trips = sum(backend.round_trips for backend in backends)
+    for backend in backends:
+        await backend.close()
+    return {
+        "processes": processes,
+        "keys": keys,
+        "requests": requests,
+        "allowed": allowed,
+        "allowed_max": int(keys * max_requests * (1 + elapsed / window)),
+        "allowed_without_sharing": min(requests, processes * keys * max_requests),
+        "round_trips": round_trips,
+        "round_trips_per_request": round_trips / requests,
+        "checks_per_s": requests / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory rate limiter")
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--rate", type=float, default=50_000.0, help="Simulated arrivals per second")
+    parser.add_argument("--processes", type=int, default=4, help="Processes sharing the Redis backend")
+    parser.add_argument("--redis-url", default="", help="Use a real Redis instead of InProcessRedis")
+    parser.add_argument("--output", default="rate_limiter.json")
+    args = parser.parse_args()
+
+    spread = distinct_keys(args.keys, args.requests, args.limit, args.window, args.rate)
+    memory = memory_per_key(args.keys, args.limit, args.window)
+    limiter, clock = memory.pop("limiter"), memory.pop("clock")
+
+    # Let every key go idle for longer than a window; one request advances the wheel
+    clock.now += args.window + 2
+    before = len(limiter)
+    started = time.perf_counter()
+    limiter.check("wake", args.limit, args.window)
+    eviction = {
+        "keys_before": before,
+        "keys_after": len(limiter),
+        "sweep_ms": (time.perf_counter() - started) * 1000,
+    }
+
+    report = {
+        "keys": args.keys,
+        "limit": args.limit,
+        "window_s": args.window,
+        "distinct_keys": spread,
+        "memory": memory,
+        "hot_key": hot_key(args.requests, args.limit, args.window, args.rate),
+        "eviction": eviction,
+        "shared": asyncio.run(shared_backend(
+            args.processes, 1000, args.requests // 5, args.limit, args.window, args.redis_url
+        )),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{spread['checks_per_s']:.0f} checks/s over {args.keys} keys, "
+          f"{memory['bytes_per_key']:.0f} B/key, evicted {before - eviction['keys_after'] + 1} idle keys "
+          f"in {eviction['sweep_ms']:.1f} ms; shared backend {report['shared']['round_trips_per_request']:.3f} "
+          f"round trips/request -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
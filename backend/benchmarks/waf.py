@@ -0,0 +1,148 @@
+"""
+Per-request overhead of the WAF middleware.
+
+Calls WAFMiddleware directly as an ASGI app, in front of a minimal app that
+reads the body and answers 200, so the numbers are the firewall's cost
+alone: no server, network or routing. Each scenario is timed with and
+without the middleware, and the JSON report gives the difference. Every
+scenario also has the status the WAF must answer, so legitimate payloads
+that trip a rule (or attacks that slip through) fail the run.
+
+    python -m backend.benchmarks.waf --iterations 20000 --output results.json
+"""
+
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from backend.security.waf import WAFMiddleware
+
+async def echo_app(scope, receive, send):
+    """Read the whole body, then answer 200"""
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+def payment_body() -> bytes:
+    return json.dumps({
+        "amount": "125.50",
+        "currency": "PI",
+        "memo": "Invoice 2291 for consulting or support, paid in full",
+        "account_id": str(uuid.uuid4()),
+        "metadata": {"order_id": str(uuid.uuid4()), "signature": "c2lnbmF0dXJlLWJ5dGVz==", "channel": "mobile"},
+    }).encode()
+
+def legitimate_body() -> bytes:
+    """Payment data that reads like the old query-string rules' targets"""
+    return json.dumps({
+        "amount": "500",
+        "currency": "USD",
+        "memo": "rent or deposit = 500",
+        "metadata": {
+            "reference": "Moon1=",
+            "bank": "Credit union, select plan B",
+            "document": "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==",
+            "note": "Paid on=time; order #7 = settled",
+        },
+    }).encode()
+
+def batch_body(entities: int) -> bytes:
+    return json.dumps({"entities": [
+        {"name": f"Customer {i} Holdings Ltd", "country": "GB", "entity_type": "organization"}
+        for i in range(entities)
+    ]}).encode()
+
+SCENARIOS: Dict[str, Tuple[str, str, str, bytes, int]] = {
+    # name: (method, path, query string, body, expected status)
+    "get_clean": ("GET", "/api/v1/compliance/alerts", urlencode({"status": "open", "severity": "high", "limit": 50, "cursor": "MjAyNi0xMC0xOVQxMjowMDowMHxhYmM"}), b"", 200),
+    "get_legitimate": ("GET", "/api/v1/ledger/accounts", urlencode({"q": "rent or deposit = 500", "ref": "Moon1="}), b"", 200),
+    "post_payment": ("POST", "/api/v1/payments/pi/create", "", payment_body(), 200),
+    "post_legitimate": ("POST", "/api/v1/payments/pi/create", "", legitimate_body(), 200),
+    "post_batch_64k": ("POST", "/api/v1/compliance/sanctions/screen/batch", "", batch_body(900), 200),
+    "get_attack": ("GET", "/api/v1/ledger/accounts", urlencode({"q": "1' or '1'='1"}), b"", 400),
+    "post_attack": ("POST", "/api/v1/payments/pi/create", "", json.dumps({"amount": "1", "memo": "<script>alert(1)</script>"}).encode(), 400),
+    "post_handler_attack": ("POST", "/api/v1/payments/pi/create", "", json.dumps({"memo": "<img src=x onerror=alert(1)>"}).encode(), 400),
+    "post_union_attack": ("POST", "/api/v1/payments/pi/create", "", json.dumps({"memo": "x' UNION SELECT password FROM users--"}).encode(), 400),
+}
+
+async def run_once(app, method: str, path: str, query: str, body: bytes, chunk: int) -> int:
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [
+            (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64)"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    }
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+    messages = [{"type": "http.request", "body": part, "more_body": i < len(chunks) - 1} for i, part in enumerate(chunks)]
+    pending = iter(messages)
+    status: List[int] = []
+
+    async def receive():
+        return next(pending, {"type": "http.disconnect"})
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+async def time_scenario(app, scenario: Tuple[str, str, str, bytes, int], iterations: int, chunk: int) -> Tuple[float, int]:
+    method, path, query, body, _ = scenario
+    status = await run_once(app, method, path, query, body, chunk)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await run_once(app, method, path, query, body, chunk)
+    return (time.perf_counter() - started) / iterations, status
+
+async def run(iterations: int, chunk: int, max_body_size: Optional[int]) -> Dict:
+    waf = WAFMiddleware(echo_app, **({"max_body_size": max_body_size} if max_body_size else {}))
+    report = {}
+    for name, scenario in SCENARIOS.items():
+        bare, _ = await time_scenario(echo_app, scenario, iterations, chunk)
+        guarded, status = await time_scenario(waf, scenario, iterations, chunk)
+        report[name] = {
+            "body_bytes": len(scenario[3]),
+            "status": status,
+            "expected_status": scenario[4],
+            "bare_us": bare * 1e6,
+            "waf_us": guarded * 1e6,
+            "overhead_us": (guarded - bare) * 1e6,
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure WAF per-request overhead")
+    parser.add_argument("--iterations", type=int, default=5_000)
+    parser.add_argument("--chunk", type=int, default=65_536, help="Body bytes per ASGI message")
+    parser.add_argument("--max-body-size", type=int, help="Defaults to WAF_MAX_BODY_SIZE")
+    parser.add_argument("--output", default="waf.json")
+    args = parser.parse_args()
+
+    report = {"iterations": args.iterations, "scenarios": asyncio.run(run(args.iterations, args.chunk, args.max_body_size))}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["scenarios"].items():
+        print(f"{name:20} {result['body_bytes']:>7} B  status {result['status']}  overhead {result['overhead_us']:8.1f} us")
+    print(f"-> {args.output}")
+
+    wrong = [name for name, result in report["scenarios"].items() if result["status"] != result["expected_status"]]
+    if wrong:
+        raise SystemExit(f"Unexpected WAF status for: {', '.join(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
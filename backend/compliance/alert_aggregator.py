@@ -0,0 +1,204 @@
+import asyncio
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select, insert, update
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.compliance.models import ComplianceAlert
+from backend.compliance.service import ComplianceService, alert_dedup_key
+from backend.observability.metrics import track_compliance_alert
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+class _PendingAlert:
+    """Occurrences of one alert key since the last flush"""
+
+    __slots__ = ("alert_type", "severity", "description", "user_id", "transaction_id", "count", "first_seen", "last_seen")
+
+    def __init__(self, alert_type, severity, description, user_id, transaction_id, at):
+        self.alert_type = alert_type
+        self.severity = severity
+        self.description = description
+        self.user_id = user_id
+        self.transaction_id = transaction_id
+        self.count = 0
+        self.first_seen = at
+        self.last_seen = at
+
+class AlertAggregator:
+    """
+    Coalesces repeated compliance alerts. Occurrences are keyed by
+    (alert_type, user_id, transaction_id) and folded in memory; a periodic
+    flush turns each key into one write. A key with an open alert last seen
+    within `window` bumps that alert's occurrence_count and last_seen_at,
+    escalating its severity if needed; otherwise a new alert is opened.
+    """
+
+    def __init__(self, window: float = 3600.0, flush_interval: float = 1.0, max_pending: int = 10_000):
+        self.window = timedelta(seconds=window)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, _PendingAlert] = {}
+        # dedup key -> (alert id, severity, last seen) for alerts this process has open
+        self._open: Dict[str, Tuple[str, str, datetime]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.occurrences = 0
+        self.opened = 0
+
+    def record(
+        self,
+        alert_type: str,
+        severity: str,
+        description: str,
+        user_id: Optional[str] = None,
+        transaction_id: Optional[str] = None,
+        at: Optional[datetime] = None
+    ):
+        """Note one occurrence; written at the next flush"""
+        at = at or datetime.utcnow()
+        key = alert_dedup_key(alert_type, user_id, transaction_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingAlert(alert_type, severity, description, user_id, transaction_id, at)
+        elif SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(pending.severity, 0):
+            pending.severity = severity
+            pending.description = description
+        pending.count += 1
+        pending.last_seen = max(pending.last_seen, at)
+        self.occurrences += 1
+
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Alert aggregation flush error: {e}")
+
+    async def flush(self) -> int:
+        """Write everything recorded so far; returns the number of alerts opened"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                return await self._write(pending)
+            except Exception:
+                # Put the occurrences back so the next flush retries them
+                for key, item in pending.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        self._pending[key] = item
+                    else:
+                        current.count += item.count
+                        current.first_seen = min(current.first_seen, item.first_seen)
+                raise
+
+    async def _write(self, pending: Dict[str, _PendingAlert]) -> int:
+        now = datetime.utcnow()
+        cutoff = now - self.window
+        self._open = {key: alert for key, alert in self._open.items() if alert[2] >= cutoff}
+
+        async with AsyncSessionLocal() as session:
+            # Open alerts another process (or an earlier run) created for these keys
+            unknown = [key for key in pending if key not in self._open]
+            if unknown:
+                result = await session.execute(
+                    select(ComplianceAlert.dedup_key, ComplianceAlert.id, ComplianceAlert.severity, ComplianceAlert.last_seen_at)
+                    .where(ComplianceAlert.status == "open")
+                    .where(ComplianceAlert.dedup_key.in_(unknown))
+                    .where(ComplianceAlert.last_seen_at >= cutoff)
+                    .order_by(ComplianceAlert.last_seen_at)
+                )
+                for key, alert_id, severity, last_seen in result.all():
+                    self._open[key] = (alert_id, severity, last_seen)
+
+            new_rows = []
+            count_deltas: Counter = Counter()
+            for key, item in pending.items():
+                existing = self._open.get(key)
+                if existing is not None:
+                    alert_id, severity, last_seen = existing
+                    values: Dict[str, Any] = {
+                        "occurrence_count": ComplianceAlert.occurrence_count + item.count,
+                        "last_seen_at": max(last_seen, item.last_seen)
+                    }
+                    if SEVERITY_RANK.get(item.severity, 0) > SEVERITY_RANK.get(severity, 0):
+                        values["severity"] = item.severity
+                        values["description"] = item.description
+                        count_deltas[severity] -= 1
+                        count_deltas[item.severity] += 1
+                        severity = item.severity
+                    result = await session.execute(
+                        update(ComplianceAlert)
+                        .where(ComplianceAlert.id == alert_id)
+                        .where(ComplianceAlert.status == "open")
+                        .values(**values)
+                    )
+                    if result.rowcount:
+                        self._open[key] = (alert_id, severity, values["last_seen_at"])
+                        continue
+                    # Resolved since we last saw it: undo the escalation and open a new alert
+                    if "severity" in values:
+                        count_deltas[existing[1]] += 1
+                        count_deltas[item.severity] -= 1
+
+                alert_id = str(uuid.uuid4())
+                new_rows.append({
+                    "id": alert_id,
+                    "alert_type": item.alert_type,
+                    "severity": item.severity,
+                    "user_id": item.user_id,
+                    "transaction_id": item.transaction_id,
+                    "description": item.description,
+                    "status": "open",
+                    "dedup_key": key,
+                    "occurrence_count": item.count,
+                    "last_seen_at": item.last_seen,
+                    "created_at": item.first_seen
+                })
+                count_deltas[item.severity] += 1
+                self._open[key] = (alert_id, item.severity, item.last_seen)
+
+            for start in range(0, len(new_rows), 1000):
+                await session.execute(insert(ComplianceAlert), new_rows[start:start + 1000])
+            await ComplianceService.adjust_open_alert_counts(session, count_deltas)
+            await session.commit()
+
+        for row in new_rows:
+            track_compliance_alert(row["alert_type"], row["severity"])
+        self.opened += len(new_rows)
+        return len(new_rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window.total_seconds(),
+            "pending": len(self._pending),
+            "occurrences": self.occurrences,
+            "opened": self.opened
+        }
+
+
+# Initialize global aggregator
+alert_aggregator = AlertAggregator(settings.ALERT_AGGREGATION_WINDOW, settings.ALERT_FLUSH_INTERVAL)
@@ -0,0 +1,317 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import zlib
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.compliance.models import AuditLog
+from backend.compliance.audit_chain import check_link
+
+SEGMENT_MAGIC = b"TEOSAUD1"
+EPOCH = datetime(1970, 1, 1)
+
+# sequence and timestamp (microseconds since the epoch) are stored as
+# little-endian int64 arrays; every other column as a JSON array
+VALUE_COLUMNS = (
+    "id", "event_type", "user_id", "action", "resource_type", "resource_id",
+    "resource", "details", "ip_address", "user_agent", "hash", "signature",
+    "previous_hash", "batch_id", "merkle_proof",
+)
+
+class ArchiveSegment(BaseModel):
+    """Manifest entry for one sealed, immutable audit segment"""
+    file: str
+    row_count: int
+    min_sequence: int
+    max_sequence: int
+    min_timestamp: datetime
+    max_timestamp: datetime
+    first_previous_hash: Optional[str]
+    last_hash: str
+    content_sha256: str  # Over all compressed column blobs
+    previous_chain_hash: Optional[str]
+    chain_hash: str  # Links this segment to the previous one
+    sealed_at: datetime
+
+def _to_micros(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+def _from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(micros))
+
+def segment_chain_hash(previous_chain_hash: Optional[str], content_sha256: str, first_previous_hash: Optional[str], last_hash: str) -> str:
+    data = f"{previous_chain_hash}|{content_sha256}|{first_previous_hash}|{last_hash}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+class AuditArchive:
+    """
+    Cold storage for sealed audit log ranges.
+    Each segment is a columnar file (zlib-compressed columns behind a JSON
+    header) covering a contiguous sequence range. A manifest keeps the
+    min/max timestamp and sequence of every segment, so range queries open
+    only the segments they overlap. Segment chain hashes link segments in order.
+
+    The root must be storage every worker shares, since sealing purges the
+    shared database. Each process rereads the manifest whenever another one
+    has replaced it, and seals are serialized through a lock file.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._manifest_path = self.root / "manifest.json"
+        self._lock_path = self.root / "manifest.lock"
+        self._manifest_version: Optional[tuple] = None
+        self._cached_segments: List[ArchiveSegment] = []
+
+    @property
+    def _segments(self) -> List[ArchiveSegment]:
+        """Manifest segments, reloaded when the manifest file has been replaced"""
+        try:
+            stat = self._manifest_path.stat()
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        if version != self._manifest_version:
+            self._cached_segments = self._load_manifest()
+            self._manifest_version = version
+        return self._cached_segments
+
+    def _load_manifest(self) -> List[ArchiveSegment]:
+        if not self._manifest_path.exists():
+            return []
+        with open(self._manifest_path) as f:
+            return [ArchiveSegment(**segment) for segment in json.load(f)["segments"]]
+
+    def _save_manifest(self, segments: List[ArchiveSegment]):
+        tmp = self._manifest_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"segments": [s.model_dump(mode="json") for s in segments]}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path)
+
+    @property
+    def last_sequence(self) -> int:
+        return self._segments[-1].max_sequence if self._segments else 0
+
+    @property
+    def last_hash(self) -> Optional[str]:
+        return self._segments[-1].last_hash if self._segments else None
+
+    def segments(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after_sequence: int = 0
+    ) -> List[ArchiveSegment]:
+        """Segments overlapping the time range and sequences after after_sequence"""
+        return [
+            s for s in self._segments
+            if s.max_sequence > after_sequence
+            and (start is None or s.max_timestamp >= start)
+            and (end is None or s.min_timestamp <= end)
+        ]
+
+    def write_segment(self, entries: List[Any]) -> ArchiveSegment:
+        """Seal a contiguous, already verified run of entries into a new segment"""
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return self._write_segment(entries)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_segment(self, entries: List[Any]) -> ArchiveSegment:
+        segments = self._segments
+        last_sequence = segments[-1].max_sequence if segments else 0
+        if entries[0].sequence != last_sequence + 1:
+            raise ValueError(f"Refusing to seal from sequence {entries[0].sequence}: the archive now ends at {last_sequence}")
+
+        blobs: Dict[str, bytes] = {}
+        blobs["sequence"] = zlib.compress(np.array([e.sequence for e in entries], dtype="<i8").tobytes())
+        blobs["timestamp"] = zlib.compress(np.array([_to_micros(e.timestamp) for e in entries], dtype="<i8").tobytes())
+        for column in VALUE_COLUMNS:
+            blobs[column] = zlib.compress(json.dumps([getattr(e, column) for e in entries]).encode())
+
+        content = hashlib.sha256()
+        columns = {}
+        offset = 0
+        for name, blob in blobs.items():
+            content.update(blob)
+            columns[name] = {"offset": offset, "length": len(blob)}
+            offset += len(blob)
+
+        previous_chain_hash = segments[-1].chain_hash if segments else None
+        segment = ArchiveSegment(
+            file=f"{entries[0].sequence:012d}-{entries[-1].sequence:012d}.seg",
+            row_count=len(entries),
+            min_sequence=entries[0].sequence,
+            max_sequence=entries[-1].sequence,
+            min_timestamp=min(e.timestamp for e in entries),
+            max_timestamp=max(e.timestamp for e in entries),
+            first_previous_hash=entries[0].previous_hash,
+            last_hash=entries[-1].hash,
+            content_sha256=content.hexdigest(),
+            previous_chain_hash=previous_chain_hash,
+            chain_hash=segment_chain_hash(previous_chain_hash, content.hexdigest(), entries[0].previous_hash, entries[-1].hash),
+            sealed_at=datetime.utcnow()
+        )
+
+        header = json.dumps({"segment": segment.model_dump(mode="json"), "columns": columns}).encode()
+        path = self.root / segment.file
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(SEGMENT_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            for blob in blobs.values():
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        self._save_manifest(segments + [segment])
+        return segment
+
+    def _open(self, segment: ArchiveSegment):
+        with open(self.root / segment.file, "rb") as f:
+            if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                raise ValueError(f"{segment.file} is not an audit segment")
+            header = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+            body = f.read()
+
+        if hashlib.sha256(body).hexdigest() != segment.content_sha256:
+            raise ValueError(f"{segment.file} content does not match its sealed digest")
+
+        def blob(name: str) -> bytes:
+            column = header["columns"][name]
+            return zlib.decompress(body[column["offset"]:column["offset"] + column["length"]])
+
+        return blob
+
+    def read_segment(self, segment: ArchiveSegment) -> List[SimpleNamespace]:
+        """Decode a segment into entry objects after checking its content digest"""
+        blob = self._open(segment)
+        data: Dict[str, List[Any]] = {
+            "sequence": np.frombuffer(blob("sequence"), dtype="<i8").tolist(),
+            "timestamp": [_from_micros(m) for m in np.frombuffer(blob("timestamp"), dtype="<i8")],
+        }
+        for column in VALUE_COLUMNS:
+            data[column] = json.loads(blob(column))
+
+        names = list(data)
+        return [SimpleNamespace(**dict(zip(names, values))) for values in zip(*data.values())]
+
+    def read_entries(
+        self,
+        segment: ArchiveSegment,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after_sequence: int = 0
+    ) -> List[SimpleNamespace]:
+        """Entries of one segment within the time range and after after_sequence"""
+        return [
+            entry for entry in self.read_segment(segment)
+            if entry.sequence > after_sequence
+            and (start is None or entry.timestamp >= start)
+            and (end is None or entry.timestamp <= end)
+        ]
+
+    def iter_entries(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after_sequence: int = 0
+    ) -> Iterator[SimpleNamespace]:
+        """Archived entries in sequence order, reading only overlapping segments"""
+        for segment in self.segments(start, end, after_sequence):
+            yield from self.read_entries(segment, start, end, after_sequence)
+
+    def get_entry(self, sequence: int) -> Optional[SimpleNamespace]:
+        for segment in self._segments:
+            if segment.min_sequence <= sequence <= segment.max_sequence:
+                return next((e for e in self.read_segment(segment) if e.sequence == sequence), None)
+        return None
+
+    def find_entry(self, log_id: str) -> Optional[SimpleNamespace]:
+        """Look an entry up by id, decoding only the id column of segments that miss"""
+        for segment in reversed(self._segments):
+            if log_id in json.loads(self._open(segment)("id")):
+                return next(e for e in self.read_segment(segment) if e.id == log_id)
+        return None
+
+    def verify_segments(self) -> Optional[Dict[str, Any]]:
+        """Check that segment chain hashes link up; returns the first break"""
+        previous_chain_hash = None
+        previous_segment = None
+        for segment in self._segments:
+            expected = segment_chain_hash(previous_chain_hash, segment.content_sha256, segment.first_previous_hash, segment.last_hash)
+            if segment.previous_chain_hash != previous_chain_hash or segment.chain_hash != expected:
+                return {"sequence": segment.min_sequence, "log_id": None, "reason": f"Archive segment {segment.file} chain hash mismatch"}
+            if previous_segment and (
+                segment.min_sequence != previous_segment.max_sequence + 1
+                or segment.first_previous_hash != previous_segment.last_hash
+            ):
+                return {"sequence": segment.min_sequence, "log_id": None, "reason": f"Archive segment {segment.file} does not follow {previous_segment.file}"}
+            previous_chain_hash = segment.chain_hash
+            previous_segment = segment
+        return None
+
+    async def seal_day(self, db: AsyncSession, day: date, purge: bool = True) -> Optional[ArchiveSegment]:
+        """
+        Seal every live entry up to the end of `day` that is not archived yet.
+        Segments follow sequence order, so a segment ends at the last entry
+        stamped before midnight. The run is chain-verified before it is
+        written, and only then removed from the live table.
+        """
+        cutoff = datetime.combine(day + timedelta(days=1), time.min)
+        if cutoff > datetime.utcnow():
+            raise ValueError("Only completed days can be sealed")
+
+        last_sequence = (await db.execute(
+            select(func.max(AuditLog.sequence))
+            .where(AuditLog.sequence > self.last_sequence)
+            .where(AuditLog.timestamp < cutoff)
+        )).scalar()
+        if not last_sequence:
+            return None
+
+        result = await db.stream_scalars(
+            select(AuditLog)
+            .where(AuditLog.sequence > self.last_sequence)
+            .where(AuditLog.sequence <= last_sequence)
+            .order_by(AuditLog.sequence.asc())
+            .execution_options(yield_per=5000)
+        )
+        entries = [entry async for entry in result]
+
+        expected_sequence, previous_hash = self.last_sequence + 1, self.last_hash
+        for entry in entries:
+            reason = check_link(entry, expected_sequence, previous_hash)
+            if reason:
+                raise ValueError(f"Refusing to seal sequence {entry.sequence}: {reason}")
+            expected_sequence += 1
+            previous_hash = entry.hash
+        if expected_sequence - 1 != last_sequence:
+            raise ValueError(f"Refusing to seal: entries {expected_sequence}-{last_sequence} are missing")
+
+        segment = await asyncio.to_thread(self.write_segment, entries)
+
+        if purge:
+            await db.execute(
+                delete(AuditLog)
+                .where(AuditLog.sequence >= segment.min_sequence)
+                .where(AuditLog.sequence <= segment.max_sequence)
+            )
+            await db.commit()
+
+        return segment
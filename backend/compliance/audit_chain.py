@@ -0,0 +1,26 @@
+import hashlib
+import json
+from typing import Optional
+from backend.compliance.models import AuditLog
+
+def calculate_entry_hash(log: AuditLog) -> str:
+    """Calculate SHA-256 hash of log entry"""
+    data = f"{log.timestamp.isoformat()}|{log.event_type}|{log.user_id}|{log.action}|{log.resource_type}|{log.resource_id}|{json.dumps(log.details)}|{log.previous_hash}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+# Columns needed to recompute an entry hash and check its chain link
+AUDIT_HASH_COLUMNS = (
+    AuditLog.id, AuditLog.sequence, AuditLog.timestamp, AuditLog.event_type,
+    AuditLog.user_id, AuditLog.action, AuditLog.resource_type, AuditLog.resource_id,
+    AuditLog.details, AuditLog.previous_hash, AuditLog.hash,
+)
+
+def check_link(row, expected_sequence: int, previous_hash: Optional[str]) -> Optional[str]:
+    """Return why an entry breaks the chain, or None if it links correctly"""
+    if row.sequence != expected_sequence:
+        return f"Sequence gap: expected {expected_sequence}, found {row.sequence}"
+    if row.previous_hash != previous_hash:
+        return "Chain broken: previous_hash does not match the preceding entry"
+    if calculate_entry_hash(row) != row.hash:
+        return "Hash mismatch: entry contents were modified"
+    return None
@@ -1,15 +1,288 @@
+import asyncio
+import csv
 import hashlib
 import json
-from typing import Any, Dict, Optional
+import uuid
+import zlib
+from io import StringIO
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from backend.compliance.models import AuditLog
-from backend.core.security import sign_message
+from sqlalchemy import event, select, update, or_
+from sqlalchemy.exc import IntegrityError
+from backend.compliance.models import AuditLog, AuditBatch, AuditChainCheckpoint
+from backend.compliance.schemas import AuditChainBreak, AuditChainVerification
+from backend.compliance.merkle import build_merkle_tree, verify_merkle_proof
+from backend.compliance.audit_chain import AUDIT_HASH_COLUMNS, calculate_entry_hash, check_link
+from backend.compliance.audit_archive import AuditArchive
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.security import sign_message, verify_signature
+
+CSV_EXPORT_HEADER = [
+    "ID", "Timestamp", "Event Type", "User ID", "Action",
+    "Resource Type", "Resource ID", "IP Address", "Hash", "Signature"
+]
+
+def export_record(log: AuditLog) -> Dict[str, Any]:
+    """JSON export representation of an audit log entry"""
+    return {
+        "id": log.id,
+        "timestamp": log.timestamp.isoformat(),
+        "event_type": log.event_type,
+        "user_id": log.user_id,
+        "action": log.action,
+        "resource_type": log.resource_type,
+        "resource_id": log.resource_id,
+        "details": log.details,
+        "ip_address": log.ip_address,
+        "hash": log.hash,
+        "signature": log.signature,
+        "previous_hash": log.previous_hash
+    }
+
+def export_csv_row(log: AuditLog) -> List[Any]:
+    """CSV export row matching CSV_EXPORT_HEADER"""
+    return [
+        log.id,
+        log.timestamp.isoformat(),
+        log.event_type,
+        log.user_id,
+        log.action,
+        log.resource_type,
+        log.resource_id,
+        log.ip_address,
+        log.hash,
+        log.signature
+    ]
+
+class AuditLogAppender:
+    """
+    Single writer for the audit chain.
+    Entries are queued by callers and appended by one background task that
+    keeps the chain head in memory, assigns sequence numbers and flushes
+    whole batches in a single commit.
+    
+    Each flushed batch is hashed into a Merkle tree and only the root is
+    signed; every entry stores its inclusion proof under that root.
+    """
+
+    def __init__(self, max_batch: int = 500, max_delay: float = 0.05, archive: Optional[AuditArchive] = None):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.archive = archive
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._head: Optional[Tuple[int, Optional[str]]] = None  # (sequence, hash)
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued so far and stop the writer"""
+        if not self._task:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, entry: AuditLog) -> asyncio.Future:
+        """Queue an entry; the returned future resolves once it is committed"""
+        if not self._task or self._task.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((entry, future))
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[AuditLog, asyncio.Future]], retries: int = 3):
+        error: Optional[Exception] = None
+
+        for _ in range(retries):
+            try:
+                await self._write(batch)
+            except IntegrityError as e:
+                # Another process extended the chain first; reload the head and rebase
+                self._head = None
+                error = e
+                continue
+            except Exception as e:
+                self._head = None
+                error = e
+                break
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        print(f"Audit log flush error: {error}")
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _write(self, batch: List[Tuple[AuditLog, asyncio.Future]]):
+        async with AsyncSessionLocal() as session:
+            if self._head is None:
+                self._head = await self._load_head(session)
+            sequence, previous_hash = self._head
+
+            entries = [entry for entry, _ in batch]
+            for entry in entries:
+                sequence += 1
+                entry.sequence = sequence
+                entry.previous_hash = previous_hash
+                entry.hash = calculate_entry_hash(entry)
+                previous_hash = entry.hash
+
+            # One signature per batch instead of one per entry
+            root, proofs = build_merkle_tree([entry.hash for entry in entries])
+            audit_batch = AuditBatch(
+                id=str(uuid.uuid4()),
+                merkle_root=root,
+                signature=sign_message(root),
+                first_sequence=entries[0].sequence,
+                last_sequence=entries[-1].sequence,
+                size=len(entries)
+            )
+            for entry, proof in zip(entries, proofs):
+                entry.batch_id = audit_batch.id
+                entry.merkle_proof = proof
+                entry.signature = audit_batch.signature
+
+            # The unique sequence index rejects the batch if the chain forked
+            session.add(audit_batch)
+            session.add_all(entries)
+            await session.commit()
+
+        self._head = (sequence, previous_hash)
+
+    async def _load_head(self, session: AsyncSession) -> Tuple[int, Optional[str]]:
+        """Read the chain head; only needed at startup or after a conflict"""
+        result = await session.execute(
+            select(AuditLog.sequence, AuditLog.hash)
+            .where(AuditLog.sequence.is_not(None))
+            .order_by(AuditLog.sequence.desc())
+            .limit(1)
+        )
+        latest = result.first()
+        head = (latest.sequence, latest.hash) if latest else (0, None)
+        
+        # Everything may have been sealed into the archive and purged from the table
+        if self.archive and self.archive.last_sequence > head[0]:
+            head = (self.archive.last_sequence, self.archive.last_hash)
+        
+        # First start on a table written before sequencing: continue the existing chain
+        if head == (0, None):
+            head = await self._sequence_legacy_entries(session)
+        return head
+    
+    async def _sequence_legacy_entries(self, session: AsyncSession, batch_size: int = 5000) -> Tuple[int, Optional[str]]:
+        """
+        One-time backfill numbering unsequenced rows in the order they were
+        chained (timestamp, then id). The hash does not cover the sequence,
+        so existing hashes stay valid and new entries link to the legacy head.
+        """
+        sequence, previous_hash = 0, None
+        while True:
+            result = await session.execute(
+                select(AuditLog.id, AuditLog.hash)
+                .where(AuditLog.sequence.is_(None))
+                .order_by(AuditLog.timestamp.asc(), AuditLog.id.asc())
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return sequence, previous_hash
+            
+            await session.execute(
+                update(AuditLog),
+                [{"id": row.id, "sequence": sequence + offset} for offset, row in enumerate(rows, start=1)]
+            )
+            await session.commit()
+            sequence += len(rows)
+            previous_hash = rows[-1].hash
 
 class AuditLogService:
     """Append-only signed audit log service for compliance"""
     
+    def __init__(self, appender: Optional[AuditLogAppender] = None, archive: Optional[AuditArchive] = None):
+        self.archive = archive
+        self.appender = appender or AuditLogAppender(archive=archive)
+    
+    async def iter_entries(
+        self,
+        db: AsyncSession,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after_sequence: int = 0,
+        columns: Optional[Tuple] = None,
+        include_unsequenced: bool = False,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Any]:
+        """
+        Entries in chain order across sealed archive segments and the live table.
+        Archive segments outside the time range are never opened; live rows are
+        streamed from a server-side cursor. `columns` limits the live select,
+        and include_unsequenced adds entries written before sequencing existed.
+        """
+        archived_through = 0
+        if self.archive:
+            archived_through = self.archive.last_sequence
+            for segment in self.archive.segments(start_date, end_date, after_sequence):
+                for entry in await asyncio.to_thread(self.archive.read_entries, segment, start_date, end_date, after_sequence):
+                    yield entry
+        
+        query = select(*columns) if columns else select(AuditLog)
+        sequenced = AuditLog.sequence > max(after_sequence, archived_through)
+        query = query.where(or_(sequenced, AuditLog.sequence.is_(None)) if include_unsequenced else sequenced)
+        if start_date:
+            query = query.where(AuditLog.timestamp >= start_date)
+        if end_date:
+            query = query.where(AuditLog.timestamp <= end_date)
+        query = query.order_by(AuditLog.sequence.asc().nulls_first()).execution_options(yield_per=batch_size)
+        
+        rows = await (db.stream(query) if columns else db.stream_scalars(query))
+        try:
+            async for row in rows:
+                yield row
+        finally:
+            await rows.close()
+    
+    async def _get_by_sequence(self, db: AsyncSession, sequence: int) -> Optional[Any]:
+        if self.archive and sequence <= self.archive.last_sequence:
+            return await asyncio.to_thread(self.archive.get_entry, sequence)
+        result = await db.execute(select(AuditLog).where(AuditLog.sequence == sequence))
+        return result.scalar_one_or_none()
+    
     async def log_event(
         self,
         db: AsyncSession,
@@ -20,18 +293,24 @@ class AuditLogService:
         resource_id: Optional[str] = None,
         details: Optional[Dict[str, Any]] = None,
         ip_address: Optional[str] = None,
-        user_agent: Optional[str] = None
+        user_agent: Optional[str] = None,
+        wait: bool = True
     ) -> AuditLog:
         """
         Create an append-only audit log entry with cryptographic signature
         Previous log hash creates chain for tamper detection
-        """
         
-        # Get previous log entry to create chain
-        previous_hash = await self._get_latest_hash(db)
+        Entries are written by the appender in its own transaction. If `db` has
+        an open transaction, the entry is only queued once `db` commits and is
+        dropped if it rolls back, so it never outlives the business write it
+        records; the call then returns without waiting. Otherwise, with
+        wait=True this returns once the entry is durable; with wait=False it
+        returns immediately and the hash and sequence are filled in on flush.
+        """
         
         # Create log entry
         log_entry = AuditLog(
+            id=str(uuid.uuid4()),
             event_type=event_type,
             user_id=user_id,
             action=action,
@@ -40,43 +319,213 @@ class AuditLogService:
             details=details or {},
             ip_address=ip_address,
             user_agent=user_agent,
-            previous_hash=previous_hash,
             timestamp=datetime.utcnow()
         )
         
-        # Calculate hash of this entry
-        log_entry.hash = self._calculate_hash(log_entry)
+        # Chain position, hash and signature are assigned by the single writer
+        if db is not None and db.in_transaction():
+            self._submit_on_commit(db, log_entry)
+            return log_entry
         
-        # Sign the entry
-        log_entry.signature = sign_message(log_entry.hash)
-        
-        db.add(log_entry)
-        await db.commit()
-        await db.refresh(log_entry)
+        durable = self.appender.submit(log_entry)
+        if wait:
+            await durable
         
         return log_entry
     
-    async def verify_chain(self, db: AsyncSession) -> bool:
-        """Verify integrity of audit log chain"""
+    def _submit_on_commit(self, db: AsyncSession, log_entry: AuditLog):
+        """Hand the entry to the appender when the caller's transaction commits"""
+        state = {"done": False}
+        
+        def committed(session):
+            if not state["done"]:
+                state["done"] = True
+                self.appender.submit(log_entry)
+        
+        def rolled_back(session):
+            state["done"] = True
+        
+        event.listen(db.sync_session, "after_commit", committed, once=True)
+        event.listen(db.sync_session, "after_rollback", rolled_back, once=True)
+    
+    async def verify_chain(
+        self,
+        db: AsyncSession,
+        full: bool = False,
+        verified_by: Optional[str] = None,
+        batch_size: int = 5000
+    ) -> AuditChainVerification:
+        """
+        Verify integrity of audit log chain.
+        By default only entries appended since the last checkpoint are checked;
+        full=True rescans from the first entry. Rows are streamed from a
+        server-side cursor, so memory stays constant, and the first broken link
+        is reported exactly. A new checkpoint is stored after a clean pass.
+        
+        Rows still without a sequence (written before sequencing and not yet
+        backfilled by the appender) are always checked too, as their own chain
+        in timestamp order.
+        """
+        checkpoint = None if full else await self._latest_checkpoint(db)
+        start_sequence, previous_hash = (checkpoint.sequence, checkpoint.hash) if checkpoint else (0, None)
+        checked_at = datetime.utcnow()
+        legacy_checked = 0
+        
+        def outcome(verified_through, checked, broken_at=None):
+            return AuditChainVerification(
+                chain_valid=broken_at is None,
+                mode="incremental" if checkpoint else "full",
+                verified_from=start_sequence + 1,
+                verified_through=verified_through,
+                entries_checked=legacy_checked + checked,
+                broken_at=broken_at,
+                checked_at=checked_at
+            )
+        
+        # The checkpointed entry itself must not have changed since it was verified
+        if checkpoint:
+            try:
+                anchor = await self._get_by_sequence(db, checkpoint.sequence)
+            except ValueError:
+                anchor = None
+            if not anchor or anchor.hash != checkpoint.hash or calculate_entry_hash(anchor) != anchor.hash:
+                return outcome(None, 0, AuditChainBreak(
+                    sequence=checkpoint.sequence,
+                    log_id=anchor.id if anchor else None,
+                    reason="Checkpointed entry is missing or was modified"
+                ))
+        elif self.archive:
+            broken = self.archive.verify_segments()
+            if broken:
+                return outcome(None, 0, AuditChainBreak(**broken))
+        
+        legacy_checked, legacy_break = await self._verify_unsequenced(db, batch_size)
+        if legacy_break:
+            return outcome(None, 0, legacy_break)
+        
+        expected_sequence = start_sequence + 1
+        checked = 0
+        entries = self.iter_entries(db, after_sequence=start_sequence, columns=AUDIT_HASH_COLUMNS, batch_size=batch_size)
+        try:
+            async for row in entries:
+                reason = check_link(row, expected_sequence, previous_hash)
+                if reason:
+                    return outcome(expected_sequence - 1 if expected_sequence > 1 else None, checked,
+                                   AuditChainBreak(sequence=row.sequence, log_id=row.id, reason=reason))
+                
+                previous_hash = row.hash
+                expected_sequence += 1
+                checked += 1
+        except ValueError as e:
+            # An archive segment failed its content digest
+            return outcome(expected_sequence - 1 if expected_sequence > 1 else None, checked,
+                           AuditChainBreak(sequence=expected_sequence, log_id=None, reason=str(e)))
+        finally:
+            await entries.aclose()
+        
+        last_sequence = expected_sequence - 1
+        if checked:
+            await self.record_checkpoint(
+                db, last_sequence, previous_hash, checked,
+                mode="incremental" if checkpoint else "full",
+                verified_by=verified_by
+            )
+        
+        return outcome(last_sequence or None, checked)
+    
+    async def _verify_unsequenced(self, db: AsyncSession, batch_size: int) -> Tuple[int, Optional[AuditChainBreak]]:
+        """Check the legacy rows that have no sequence yet, linked by timestamp order"""
+        query = (
+            select(*AUDIT_HASH_COLUMNS)
+            .where(AuditLog.sequence.is_(None))
+            .order_by(AuditLog.timestamp.asc(), AuditLog.id.asc())
+            .execution_options(yield_per=batch_size)
+        )
+        checked = 0
+        previous_hash = None
+        rows = await db.stream(query)
+        try:
+            async for row in rows:
+                reason = None
+                if checked and row.previous_hash != previous_hash:
+                    reason = "Chain broken: previous_hash does not match the preceding entry"
+                elif calculate_entry_hash(row) != row.hash:
+                    reason = "Hash mismatch: entry contents were modified"
+                if reason:
+                    return checked, AuditChainBreak(sequence=None, log_id=row.id, reason=reason)
+                
+                previous_hash = row.hash
+                checked += 1
+        finally:
+            await rows.close()
+        return checked, None
+    
+    async def record_checkpoint(
+        self,
+        db: AsyncSession,
+        sequence: int,
+        hash: str,
+        entries_checked: int,
+        mode: str,
+        verified_by: Optional[str] = None
+    ) -> AuditChainCheckpoint:
+        """Store the last verified chain position"""
+        checkpoint = AuditChainCheckpoint(
+            id=str(uuid.uuid4()),
+            sequence=sequence,
+            hash=hash,
+            entries_checked=entries_checked,
+            mode=mode,
+            verified_by=verified_by
+        )
+        db.add(checkpoint)
+        await db.commit()
+        return checkpoint
+    
+    async def _latest_checkpoint(self, db: AsyncSession) -> Optional[AuditChainCheckpoint]:
         result = await db.execute(
-            select(AuditLog).order_by(AuditLog.timestamp.asc())
+            select(AuditChainCheckpoint)
+            .order_by(AuditChainCheckpoint.sequence.desc())
+            .limit(1)
         )
-        logs = result.scalars().all()
-        
-        for i, log in enumerate(logs):
-            # Verify hash
-            calculated_hash = self._calculate_hash(log)
-            if calculated_hash != log.hash:
-                print(f"Hash mismatch at log {log.id}")
-                return False
-            
-            # Verify chain
-            if i > 0:
-                if log.previous_hash != logs[i-1].hash:
-                    print(f"Chain broken at log {log.id}")
-                    return False
+        return result.scalar_one_or_none()
+    
+    async def get_inclusion_proof(self, db: AsyncSession, log_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an entry's Merkle inclusion proof and verify it end to end"""
+        log = await db.get(AuditLog, log_id)
+        if not log and self.archive:
+            log = await asyncio.to_thread(self.archive.find_entry, log_id)
+        if not log:
+            return None
+        
+        audit_batch = await db.get(AuditBatch, log.batch_id) if log.batch_id else None
+        if not audit_batch:
+            return {
+                "log_id": log.id,
+                "sequence": log.sequence,
+                "hash": log.hash,
+                "batch_id": None,
+                "verified": False,
+                "reason": "Entry is not covered by a signed batch"
+            }
         
-        return True
+        hash_valid = calculate_entry_hash(log) == log.hash
+        proof_valid = verify_merkle_proof(log.hash, log.merkle_proof or [], audit_batch.merkle_root)
+        signature_valid = verify_signature(audit_batch.merkle_root, audit_batch.signature)
+        
+        return {
+            "log_id": log.id,
+            "sequence": log.sequence,
+            "hash": log.hash,
+            "batch_id": audit_batch.id,
+            "merkle_root": audit_batch.merkle_root,
+            "root_signature": audit_batch.signature,
+            "proof": log.merkle_proof,
+            "hash_valid": hash_valid,
+            "proof_valid": proof_valid,
+            "signature_valid": signature_valid,
+            "verified": hash_valid and proof_valid and signature_valid
+        }
     
     async def export_logs(
         self,
@@ -86,80 +535,105 @@ class AuditLogService:
         format: str = "json"
     ) -> str:
         """Export audit logs for regulatory reporting"""
-        result = await db.execute(
-            select(AuditLog)
-            .where(AuditLog.timestamp >= start_date)
-            .where(AuditLog.timestamp <= end_date)
-            .order_by(AuditLog.timestamp.asc())
-        )
-        logs = result.scalars().all()
+        logs = [
+            log async for log in self.iter_entries(db, start_date, end_date, include_unsequenced=True)
+        ]
         
         if format == "json":
-            return json.dumps([
-                {
-                    "id": log.id,
-                    "timestamp": log.timestamp.isoformat(),
-                    "event_type": log.event_type,
-                    "user_id": log.user_id,
-                    "action": log.action,
-                    "resource_type": log.resource_type,
-                    "resource_id": log.resource_id,
-                    "details": log.details,
-                    "ip_address": log.ip_address,
-                    "hash": log.hash,
-                    "signature": log.signature,
-                    "previous_hash": log.previous_hash
-                }
-                for log in logs
-            ], indent=2)
+            return json.dumps([export_record(log) for log in logs], indent=2)
         
         elif format == "csv":
-            import csv
-            from io import StringIO
-            
             output = StringIO()
             writer = csv.writer(output)
             
             # Header
-            writer.writerow([
-                "ID", "Timestamp", "Event Type", "User ID", "Action",
-                "Resource Type", "Resource ID", "IP Address", "Hash", "Signature"
-            ])
+            writer.writerow(CSV_EXPORT_HEADER)
             
             # Data rows
             for log in logs:
-                writer.writerow([
-                    log.id,
-                    log.timestamp.isoformat(),
-                    log.event_type,
-                    log.user_id,
-                    log.action,
-                    log.resource_type,
-                    log.resource_id,
-                    log.ip_address,
-                    log.hash,
-                    log.signature
-                ])
+                writer.writerow(export_csv_row(log))
             
             return output.getvalue()
         
         return ""
     
-    def _calculate_hash(self, log: AuditLog) -> str:
-        """Calculate SHA-256 hash of log entry"""
-        data = f"{log.timestamp.isoformat()}|{log.event_type}|{log.user_id}|{log.action}|{log.resource_type}|{log.resource_id}|{json.dumps(log.details)}|{log.previous_hash}"
-        return hashlib.sha256(data.encode()).hexdigest()
-    
-    async def _get_latest_hash(self, db: AsyncSession) -> Optional[str]:
-        """Get hash of the most recent audit log entry"""
-        result = await db.execute(
-            select(AuditLog)
-            .order_by(AuditLog.timestamp.desc())
-            .limit(1)
-        )
-        latest = result.scalar_one_or_none()
-        return latest.hash if latest else None
+    async def stream_export(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        format: str = "ndjson",
+        compress: bool = False,
+        batch_size: int = 1000,
+        chunk_size: int = 64 * 1024
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream audit logs as NDJSON or CSV chunks, optionally gzip-compressed.
+        Archived segments are read one at a time and live rows are paged from a
+        server-side cursor on a dedicated session, so memory stays flat
+        regardless of the date range. The stream ends with a
+        summary line carrying the record count and a SHA-256 over all record
+        bytes (and the CSV header) that precede it.
+        """
+        digest = hashlib.sha256()
+        compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip container
+        buffer: List[bytes] = []
+        buffered = 0
+        record_count = 0
+        
+        def encode(chunk: bytes) -> bytes:
+            return compressor.compress(chunk) if compressor else chunk
+        
+        def csv_line(values: List[Any]) -> bytes:
+            line = StringIO()
+            csv.writer(line).writerow(values)
+            return line.getvalue().encode()
+        
+        if format == "csv":
+            header = csv_line(CSV_EXPORT_HEADER)
+            digest.update(header)
+            buffer.append(header)
+            buffered += len(header)
+        
+        async with AsyncSessionLocal() as session:
+            logs = self.iter_entries(
+                session, start_date, end_date, include_unsequenced=True, batch_size=batch_size
+            )
+            
+            async for log in logs:
+                if format == "csv":
+                    line = csv_line(export_csv_row(log))
+                else:
+                    line = json.dumps(export_record(log), separators=(",", ":")).encode() + b"\n"
+                
+                digest.update(line)
+                buffer.append(line)
+                buffered += len(line)
+                record_count += 1
+                
+                if buffered >= chunk_size:
+                    chunk = encode(b"".join(buffer))
+                    buffer, buffered = [], 0
+                    if chunk:
+                        yield chunk
+        
+        summary = {
+            "record_count": record_count,
+            "sha256": digest.hexdigest(),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "generated_at": datetime.utcnow().isoformat()
+        }
+        if format == "csv":
+            buffer.append(f"# summary {json.dumps(summary)}\n".encode())
+        else:
+            buffer.append(json.dumps({"summary": summary}).encode() + b"\n")
+        
+        tail = encode(b"".join(buffer))
+        if compressor:
+            tail += compressor.flush()
+        yield tail
 
 
 # Initialize global service
-audit_log_service = AuditLogService()
+audit_archive = AuditArchive(settings.AUDIT_ARCHIVE_PATH) if settings.AUDIT_ARCHIVE_PATH else None
+audit_log_service = AuditLogService(archive=audit_archive)
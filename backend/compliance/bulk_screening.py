@@ -0,0 +1,213 @@
+import asyncio
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.database import AsyncSessionLocal
+from backend.compliance.models import SanctionCheck, SanctionScreeningJob
+from backend.compliance.schemas import SanctionCheckResult, SanctionScreeningRequest
+from backend.compliance.sanctions import SanctionsScreeningService, sanctions_service
+from backend.compliance.audit_log import audit_log_service
+
+class BulkScreeningJob:
+    """In-process progress of one bulk screening batch; mirrored to SanctionScreeningJob"""
+
+    def __init__(self, total: int, created_by: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.status = "running"  # running, completed, failed, cancelled
+        self.total = total
+        self.processed = 0
+        self.risk_counts: Counter = Counter()
+        self.list_version: Optional[str] = None
+        self.created_by = created_by
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "risk_counts": dict(self.risk_counts),
+            "list_version": self.list_version,
+            "created_by": self.created_by,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+
+class BulkSanctionsScreener:
+    """
+    Screens large batches of names in chunks. Each chunk is screened with
+    bounded concurrency, its SanctionCheck rows are inserted in one statement,
+    and its results are handed back before the next chunk starts. A batch
+    writes one audit entry summarizing the whole run.
+    
+    Job progress is stored in sanction_screening_jobs and committed with each
+    chunk's checks, so any worker can answer a poll. A running job whose
+    heartbeat is older than `stale_after` seconds lost its worker (e.g. a
+    restart) and is reported as failed; resubmit it to screen the rest.
+    """
+
+    def __init__(
+        self,
+        service: SanctionsScreeningService,
+        chunk_size: int = 500,
+        concurrency: int = 20,
+        stale_after: float = 600.0
+    ):
+        self.service = service
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.stale_after = stale_after
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _screen_chunk(self, chunk: List[SanctionScreeningRequest], index, slots: asyncio.Semaphore) -> List[SanctionCheckResult]:
+        _, remote, _ = self.service.providers.plan(index)
+        if not remote:
+            # Local screening is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(
+                lambda: [self.service.screen_local(index, e.name, e.country, e.entity_type) for e in chunk]
+            )
+
+        async def screen(entity: SanctionScreeningRequest) -> SanctionCheckResult:
+            async with slots:
+                return await self.service.screen(entity.name, entity.country, entity.entity_type, index=index)
+
+        return await asyncio.gather(*(screen(e) for e in chunk))
+
+    async def run(self, entities: List[SanctionScreeningRequest], job: BulkScreeningJob) -> AsyncIterator[List[SanctionCheckResult]]:
+        """Screen, record and yield results chunk by chunk; `job` must already be stored"""
+        # Pin the index so a list reload mid-batch cannot mix versions
+        index = self.service.lists.index
+        job.list_version = index.version if index else None
+        slots = asyncio.Semaphore(self.concurrency)
+
+        try:
+            async with AsyncSessionLocal() as session:
+                for start in range(0, len(entities), self.chunk_size):
+                    results = await self._screen_chunk(entities[start:start + self.chunk_size], index, slots)
+                    rows = [self.service.check_record(r, job.created_by, job.id) for r in results]
+                    await session.execute(insert(SanctionCheck), rows)
+
+                    for result, row in zip(results, rows):
+                        result.check_id = row["id"]
+                        job.risk_counts[result.risk_level] += 1
+                    job.processed += len(results)
+                    await self._save(session, job, heartbeat=True)
+                    await session.commit()
+                    yield results
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Bulk sanctions screening {job.id} failed: {e}")
+            raise
+        finally:
+            if job.status == "running":
+                job.status = "cancelled"  # Consumer went away, e.g. the client disconnected
+            job.finished_at = datetime.utcnow()
+            await self._finish(job)
+            await self._audit(job, index)
+
+    async def _create(self, job: BulkScreeningJob):
+        async with AsyncSessionLocal() as session:
+            session.add(SanctionScreeningJob(
+                id=job.id,
+                status=job.status,
+                total=job.total,
+                processed=0,
+                risk_counts={},
+                created_by=job.created_by,
+                started_at=job.started_at,
+                heartbeat_at=job.started_at
+            ))
+            await session.commit()
+
+    async def _save(self, session: AsyncSession, job: BulkScreeningJob, heartbeat: bool = False):
+        values = {
+            "status": job.status,
+            "processed": job.processed,
+            "risk_counts": dict(job.risk_counts),
+            "list_version": job.list_version,
+            "error": job.error,
+            "finished_at": job.finished_at
+        }
+        if heartbeat:
+            values["heartbeat_at"] = datetime.utcnow()
+        await session.execute(update(SanctionScreeningJob).where(SanctionScreeningJob.id == job.id).values(**values))
+
+    async def _finish(self, job: BulkScreeningJob):
+        try:
+            async with AsyncSessionLocal() as session:
+                await self._save(session, job)
+                await session.commit()
+        except Exception as e:
+            print(f"Bulk sanctions screening {job.id} status update error: {e}")
+
+    async def _audit(self, job: BulkScreeningJob, index):
+        try:
+            await audit_log_service.log_event(
+                db=None,
+                event_type="sanctions_batch_screening",
+                user_id=job.created_by,
+                action="screen_entities_batch",
+                resource_type="sanctions",
+                resource_id=job.id,
+                details={
+                    "status": job.status,
+                    "total": job.total,
+                    "processed": job.processed,
+                    "risk_counts": dict(job.risk_counts),
+                    "list_version": job.list_version,
+                    "lists": self.service.providers.sources,
+                    "error": job.error
+                }
+            )
+        except Exception as e:
+            print(f"Bulk sanctions screening {job.id} audit error: {e}")
+
+    async def stream(self, entities: List[SanctionScreeningRequest], created_by: Optional[str] = None) -> AsyncIterator[bytes]:
+        """NDJSON: one result per line in input order, then a summary line"""
+        job = BulkScreeningJob(len(entities), created_by)
+        await self._create(job)
+        try:
+            async for results in self.run(entities, job):
+                yield b"".join(r.model_dump_json().encode() + b"\n" for r in results)
+        except Exception:
+            pass  # Recorded on the job; reported in the summary line
+        yield json.dumps({"summary": job.summary()}, default=str).encode() + b"\n"
+
+    async def submit(self, entities: List[SanctionScreeningRequest], created_by: Optional[str] = None) -> BulkScreeningJob:
+        """Store a job, start its batch in the background and return it for polling"""
+        job = BulkScreeningJob(len(entities), created_by)
+        await self._create(job)
+        task = asyncio.create_task(self._drain(entities, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _drain(self, entities: List[SanctionScreeningRequest], job: BulkScreeningJob):
+        try:
+            async for _ in self.run(entities, job):
+                pass
+        except Exception:
+            pass  # Recorded on the job
+
+    async def get_job(self, db: AsyncSession, job_id: str) -> Optional[SanctionScreeningJob]:
+        job = await db.get(SanctionScreeningJob, job_id)
+        if job and job.status == "running" and job.heartbeat_at < datetime.utcnow() - timedelta(seconds=self.stale_after):
+            job.status = "failed"
+            job.error = "Interrupted: the worker running this batch stopped"
+            job.finished_at = datetime.utcnow()
+            await db.commit()
+        return job
+
+
+# Initialize global bulk screener
+bulk_screener = BulkSanctionsScreener(sanctions_service)
@@ -0,0 +1,205 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from backend.core.config import settings
+from backend.compliance.models import AuditLog
+from backend.compliance.schemas import AuditChainBreak, AuditChainVerification
+from backend.compliance.audit_chain import AUDIT_HASH_COLUMNS, check_link
+from backend.compliance.audit_archive import ArchiveSegment, AuditArchive
+from backend.compliance.audit_log import audit_log_service
+
+class _RangeScan:
+    """
+    Link checks for one contiguous sequence range. The first entry's
+    previous_hash is taken on trust here and reported so the parent can
+    check it against the preceding range's last hash.
+    """
+
+    def __init__(self, start: int, end: int):
+        self.expected_sequence = start
+        self.previous_hash = None
+        self.outcome: Dict[str, Any] = {
+            "start": start,
+            "end": end,
+            "first_previous_hash": None,
+            "last_hash": None,
+            "checked": 0,
+            "broken_at": None
+        }
+
+    def feed(self, row) -> bool:
+        """Check the next entry; False once the range is broken"""
+        if self.expected_sequence == self.outcome["start"]:
+            self.outcome["first_previous_hash"] = self.previous_hash = row.previous_hash
+
+        reason = check_link(row, self.expected_sequence, self.previous_hash)
+        if reason:
+            self.outcome["broken_at"] = {"sequence": row.sequence, "log_id": row.id, "reason": reason}
+            return False
+
+        self.previous_hash = row.hash
+        self.expected_sequence += 1
+        self.outcome["checked"] += 1
+        return True
+
+    def finish(self) -> Dict[str, Any]:
+        if not self.outcome["broken_at"]:
+            self.outcome["last_hash"] = self.previous_hash
+            if self.expected_sequence <= self.outcome["end"]:
+                self.outcome["broken_at"] = {
+                    "sequence": self.expected_sequence,
+                    "log_id": None,
+                    "reason": f"Sequence gap: entries {self.expected_sequence}-{self.outcome['end']} are missing"
+                }
+        return self.outcome
+
+def _verify_range(database_url: str, start: int, end: int, batch_size: int) -> Dict[str, Any]:
+    """Process pool entry point: hash-verify one live sequence range"""
+    return asyncio.run(_verify_range_async(database_url, start, end, batch_size))
+
+async def _verify_range_async(database_url: str, start: int, end: int, batch_size: int) -> Dict[str, Any]:
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    scan = _RangeScan(start, end)
+
+    try:
+        async with engine.connect() as conn:
+            rows = await conn.stream(
+                select(*AUDIT_HASH_COLUMNS)
+                .where(AuditLog.sequence.between(start, end))
+                .order_by(AuditLog.sequence.asc())
+                .execution_options(yield_per=batch_size)
+            )
+            async for row in rows:
+                if not scan.feed(row):
+                    break
+            await rows.close()
+    finally:
+        await engine.dispose()
+
+    return scan.finish()
+
+def _verify_segment(archive_root: str, segment: Dict[str, Any]) -> Dict[str, Any]:
+    """Process pool entry point: hash-verify one sealed archive segment"""
+    segment = ArchiveSegment(**segment)
+    scan = _RangeScan(segment.min_sequence, segment.max_sequence)
+    try:
+        entries = AuditArchive(archive_root).read_segment(segment)
+    except ValueError as e:
+        scan.outcome["broken_at"] = {"sequence": segment.min_sequence, "log_id": None, "reason": str(e)}
+        return scan.outcome
+
+    for entry in entries:
+        if not scan.feed(entry):
+            break
+    return scan.finish()
+
+class ParallelChainVerifier:
+    """
+    Full audit-chain verification spread over a process pool.
+    The chain is split into sequence ranges that are hash-verified
+    independently; adjacent ranges are then stitched together by checking
+    each range's first previous_hash against its predecessor's last hash.
+    Sealed archive segments are verified as ranges of their own.
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        workers: Optional[int] = None,
+        range_size: int = 1_000_000,
+        batch_size: int = 10_000
+    ):
+        self.database_url = database_url or settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+        self.workers = workers or os.cpu_count() or 1
+        self.range_size = range_size
+        self.batch_size = batch_size
+
+    def plan(self, first_sequence: int, last_sequence: int) -> List[Tuple[int, int]]:
+        return [
+            (start, min(start + self.range_size - 1, last_sequence))
+            for start in range(first_sequence, last_sequence + 1, self.range_size)
+        ]
+
+    async def verify(self, db: AsyncSession, verified_by: Optional[str] = None) -> AuditChainVerification:
+        checked_at = datetime.utcnow()
+        archive = audit_log_service.archive
+        archived_through = archive.last_sequence if archive else 0
+
+        if archive:
+            broken = archive.verify_segments()
+            if broken:
+                return AuditChainVerification(
+                    chain_valid=False,
+                    mode="full",
+                    verified_from=1,
+                    verified_through=None,
+                    entries_checked=0,
+                    broken_at=AuditChainBreak(**broken),
+                    checked_at=checked_at
+                )
+
+        last_sequence = (await db.execute(select(func.max(AuditLog.sequence)))).scalar() or 0
+        last_sequence = max(last_sequence, archived_through)
+
+        loop = asyncio.get_running_loop()
+        # spawn avoids forking a process that is running an event loop and DB pool
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            tasks = [
+                loop.run_in_executor(pool, _verify_segment, str(archive.root), segment.model_dump())
+                for segment in (archive.segments() if archive else [])
+            ]
+            tasks += [
+                loop.run_in_executor(pool, _verify_range, self.database_url, start, end, self.batch_size)
+                for start, end in self.plan(archived_through + 1, last_sequence)
+            ]
+            results = await asyncio.gather(*tasks)
+
+        broken_at = None
+        verified_through = None
+        checked = 0
+        previous_hash = None
+
+        for result in results:
+            if result["checked"] and result["first_previous_hash"] != previous_hash:
+                broken_at = AuditChainBreak(
+                    sequence=result["start"],
+                    log_id=None,
+                    reason="Chain broken: previous_hash does not match the preceding entry"
+                )
+                break
+
+            checked += result["checked"]
+            if result["broken_at"]:
+                broken_at = AuditChainBreak(**result["broken_at"])
+                break
+
+            verified_through = result["end"]
+            previous_hash = result["last_hash"]
+
+        if broken_at is None and checked:
+            await audit_log_service.record_checkpoint(
+                db, last_sequence, previous_hash, checked, mode="full", verified_by=verified_by
+            )
+
+        if broken_at and broken_at.sequence > 1:
+            verified_through = broken_at.sequence - 1
+
+        return AuditChainVerification(
+            chain_valid=broken_at is None,
+            mode="full",
+            verified_from=1,
+            verified_through=verified_through,
+            entries_checked=checked,
+            broken_at=broken_at,
+            checked_at=checked_at
+        )
+
+
+# Initialize global verifier
+parallel_chain_verifier = ParallelChainVerifier()
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, insert
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.compliance.models import KYCRecord, SanctionCheck
+from backend.compliance.alert_aggregator import alert_aggregator
+from backend.compliance.name_matching import normalize_name, name_tokens, name_similarity
+from backend.compliance.sanctions_index import NameIndex, SanctionsEntry, SanctionsIndex, SanctionsListStore, match_record, sanctions_lists
+from backend.compliance.audit_log import audit_log_service
+
+class DeltaRescreener:
+    """
+    Rescreens the customer base after a sanctions list update, looking only
+    at list entries that were added or changed since the last run.
+    Customer names are loaded into a NameIndex and each changed entry is run
+    as a query against it, the reverse of normal screening. Only customers
+    whose n-gram/phonetic overlap is plausible are scored with Jaro-Winkler.
+    Entry fingerprints from the last completed run are kept in a baseline file.
+    """
+
+    def __init__(
+        self,
+        lists: SanctionsListStore,
+        baseline_path: str,
+        threshold: float = 0.85,
+        batch_size: int = 10_000,
+        max_candidates: int = 5_000
+    ):
+        self.lists = lists
+        self.baseline_path = Path(baseline_path) if baseline_path else None
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_candidates = max_candidates
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[Tuple[bool, Optional[str]]] = None  # (full, triggered_by) of a queued follow-up run
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> bool:
+        return self._pending is not None
+
+    def _load_baseline(self) -> Optional[Dict[str, str]]:
+        if not self.baseline_path or not self.baseline_path.exists():
+            return None
+        with open(self.baseline_path) as f:
+            return json.load(f)["fingerprints"]
+
+    def _save_baseline(self, index: SanctionsIndex):
+        if not self.baseline_path:
+            return
+        self.baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.baseline_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "version": index.version,
+                "fingerprints": {e.uid: e.fingerprint() for e in index.entries}
+            }, f)
+        os.replace(tmp, self.baseline_path)
+
+    def changed_entries(self, index: SanctionsIndex, baseline: Dict[str, str]) -> List[SanctionsEntry]:
+        return [e for e in index.entries if baseline.get(e.uid) != e.fingerprint()]
+
+    async def _load_customers(self):
+        kyc_ids, user_ids, names, normalized = [], [], [], []
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(
+                select(KYCRecord.id, KYCRecord.user_id, KYCRecord.full_name, KYCRecord.name_normalized)
+                .execution_options(yield_per=self.batch_size)
+            )
+            async for row in result:
+                kyc_ids.append(row.id)
+                user_ids.append(row.user_id)
+                names.append(row.full_name)
+                # Stored on write; rows the backfill has not reached yet are normalized here
+                normalized.append(row.name_normalized if row.name_normalized is not None else normalize_name(row.full_name))
+
+        customers = await asyncio.to_thread(NameIndex, normalized, True)
+        return kyc_ids, user_ids, names, customers
+
+    def match_customers(self, customers: NameIndex, entries: List[SanctionsEntry]) -> Dict[int, List[Dict[str, Any]]]:
+        """Customer position -> matches against the given entries"""
+        hits: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for entry in entries:
+            best: Dict[int, tuple] = {}
+            for text in [entry.name] + entry.aliases:
+                normalized = normalize_name(text)
+                tokens = name_tokens(normalized)
+                for customer in customers.candidates(normalized, limit=self.max_candidates):
+                    score = name_similarity(tokens, name_tokens(customers.normalized[customer]))
+                    if score >= self.threshold and score > best.get(customer, (0.0,))[0]:
+                        best[customer] = (score, text)
+
+            for customer, (score, text) in best.items():
+                hits[customer].append(match_record(entry, text, score))
+        return hits
+
+    async def _record(self, run_id: str, index: SanctionsIndex, hits, kyc_ids, user_ids, names):
+        now = datetime.utcnow()
+        checks, alerts = [], []
+        for customer, matches in hits.items():
+            matches.sort(key=lambda m: m["match_score"], reverse=True)
+            risk_level = "high" if any(m["match_score"] > 0.9 for m in matches) else "medium"
+            checks.append({
+                "id": str(uuid.uuid4()),
+                "entity_name": names[customer],
+                "entity_type": "individual",
+                "risk_level": risk_level,
+                "matches": matches,
+                "lists_checked": index.lists_checked,
+                "lists_failed": [],
+                "list_version": index.version,
+                "checked_by": "delta_rescreen",
+                "batch_id": run_id,
+                "screened_at": now,
+                "cache_hit": False,
+                "created_at": now
+            })
+            alerts.append({
+                "alert_type": "sanctions_match",
+                "severity": risk_level,
+                "user_id": user_ids[customer],
+                "description": (
+                    f"KYC record {kyc_ids[customer]} ({names[customer]}) matches updated sanctions entries: "
+                    + ", ".join(f"{m['entry_id']} {m['matched_name']} ({m['match_score']:.2f})" for m in matches)
+                ),
+                "at": now
+            })
+
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(checks), 1000):
+                await session.execute(insert(SanctionCheck), checks[start:start + 1000])
+            await session.commit()
+
+        # A customer already under an open match alert gets its count bumped, not a second alert
+        for alert in alerts:
+            alert_aggregator.record(**alert)
+        await alert_aggregator.flush()
+
+    async def run(self, full: bool = False, triggered_by: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        index = self.lists.index
+        if not index:
+            return None
+
+        run_id = str(uuid.uuid4())
+        summary: Dict[str, Any] = {
+            "id": run_id,
+            "list_version": index.version,
+            "full": full,
+            "started_at": datetime.utcnow().isoformat(),
+            "status": "running"
+        }
+        self.last_run = summary
+
+        try:
+            baseline = await asyncio.to_thread(self._load_baseline)
+            if baseline is None and not full:
+                # First run: nothing to diff against; later updates are diffed against this
+                await asyncio.to_thread(self._save_baseline, index)
+                summary["status"] = "baseline_recorded"
+                return summary
+
+            changed = index.entries if full else self.changed_entries(index, baseline)
+            summary["entries_changed"] = len(changed)
+            summary["customers_screened"] = 0
+            summary["customers_matched"] = 0
+
+            if changed:
+                kyc_ids, user_ids, names, customers = await self._load_customers()
+                hits = await asyncio.to_thread(self.match_customers, customers, changed)
+                await self._record(run_id, index, hits, kyc_ids, user_ids, names)
+                summary["customers_screened"] = len(kyc_ids)
+                summary["customers_matched"] = len(hits)
+
+            await asyncio.to_thread(self._save_baseline, index)
+            summary["status"] = "completed"
+        except Exception as e:
+            summary["status"] = "failed"
+            summary["error"] = str(e)
+            print(f"Sanctions delta rescreen {run_id} failed: {e}")
+        finally:
+            summary["finished_at"] = datetime.utcnow().isoformat()
+
+        await audit_log_service.log_event(
+            db=None,
+            event_type="sanctions_delta_rescreen",
+            user_id=triggered_by,
+            action="rescreen_customers",
+            resource_type="sanctions",
+            resource_id=run_id,
+            details=summary
+        )
+        return summary
+
+    def submit(self, full: bool = False, triggered_by: Optional[str] = None, queue: bool = False) -> bool:
+        """
+        Start a background run unless one is already going. With queue=True a
+        busy rescreener instead remembers the request and starts a follow-up
+        run when the current one finishes; repeated requests fold into one.
+        Returns whether a run started now.
+        """
+        if self.running:
+            if queue:
+                self._pending = (full or (self._pending is not None and self._pending[0]), triggered_by)
+            return False
+        self._task = asyncio.create_task(self._run_queued(full, triggered_by))
+        return True
+
+    async def _run_queued(self, full: bool, triggered_by: Optional[str]):
+        while True:
+            await self.run(full, triggered_by)
+            if self._pending is None:
+                return
+            # A list version loaded mid-run was not in this run's index
+            (full, triggered_by), self._pending = self._pending, None
+
+    async def stop(self):
+        self._pending = None
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+# Initialize global rescreener
+delta_rescreener = DeltaRescreener(sanctions_lists, settings.SANCTIONS_RESCREEN_BASELINE)
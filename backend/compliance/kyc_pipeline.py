@@ -0,0 +1,364 @@
+import asyncio
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import select, insert, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.compliance.models import KYCRecord, KYCJob, SanctionCheck
+from backend.compliance.schemas import KYCVerificationRequest
+from backend.compliance.sanctions import SanctionsScreeningService, sanctions_service
+from backend.compliance.alert_aggregator import alert_aggregator
+from backend.compliance.audit_log import audit_log_service
+
+PRIORITIES = {"premium": 0, "standard": 1}
+
+# Delivers a notification to a user: (user_id, notification) -> None
+Notifier = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Accepted identity documents and the shape of their numbers
+ID_NUMBER_PATTERNS = {
+    "passport": re.compile(r"^[A-Z0-9]{6,9}$"),
+    "national_id": re.compile(r"^[0-9]{8,20}$"),
+    "drivers_license": re.compile(r"^[A-Z0-9-]{5,20}$"),
+}
+
+MINIMUM_AGE = 18
+
+class KYCVerificationPipeline:
+    """
+    Persisted job queue for KYC verification. Requests commit a KYCRecord
+    and a KYCJob together and return; workers lease due jobs with SKIP
+    LOCKED and run sanctions screening, document checks and the decision,
+    saving progress after each stage. Premium jobs sort ahead of standard
+    ones, and a few reserved workers take only premium jobs so a large
+    campaign cannot delay them. A worker that dies leaves its lease to
+    expire, after which any worker picks the job up again. Users are told
+    about finished jobs through the notifier passed to start().
+    """
+
+    def __init__(
+        self,
+        sanctions: SanctionsScreeningService,
+        workers: int = 8,
+        premium_workers: int = 2,
+        max_attempts: int = 5,
+        batch_size: int = 5,
+        lease: timedelta = timedelta(seconds=60),
+        poll_interval: float = 1.0,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0
+    ):
+        self.sanctions = sanctions
+        self.workers = workers
+        self.premium_workers = premium_workers
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._notifier: Optional[Notifier] = None
+
+    def _parse_date_of_birth(self, value: str) -> datetime:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid date_of_birth: {value}")
+
+    def _job(self, record_id: str, user_id: str, priority: str, submitted_by: Optional[str]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "id": str(uuid.uuid4()),
+            "kyc_record_id": record_id,
+            "user_id": user_id,
+            "priority": PRIORITIES[priority],
+            "status": "queued",
+            "progress": 0,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "submitted_by": submitted_by,
+            "created_at": now
+        }
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        requests: List[KYCVerificationRequest],
+        submitted_by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Add KYC records and their jobs to the caller's session; returns the job rows"""
+        now = datetime.utcnow()
+        records, jobs = [], []
+        for request in requests:
+            record_id = str(uuid.uuid4())
+            records.append({
+                "id": record_id,
+                "user_id": request.user_id,
+                "full_name": request.full_name,
+                "date_of_birth": self._parse_date_of_birth(request.date_of_birth),
+                "nationality": request.nationality.strip().upper(),
+                "id_type": request.id_type.strip().lower(),
+                "id_number": request.id_number.strip().upper(),
+                "verification_status": "pending",
+                "created_at": now
+            })
+            jobs.append(self._job(record_id, request.user_id, request.priority, submitted_by))
+
+        for start in range(0, len(records), 1000):
+            await db.execute(insert(KYCRecord), records[start:start + 1000])
+            await db.execute(insert(KYCJob), jobs[start:start + 1000])
+        return jobs
+
+    def notify(self):
+        """Wake idle workers after new jobs have been committed"""
+        self._wakeup.set()
+
+    async def start(self, notifier: Optional[Notifier] = None):
+        self._notifier = notifier
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(premium_only=False)) for _ in range(self.workers)]
+        self._tasks += [asyncio.create_task(self._worker(premium_only=True)) for _ in range(self.premium_workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, premium_only: bool):
+        while not self._stopping:
+            try:
+                claimed = await self._claim(premium_only)
+            except Exception as e:
+                print(f"KYC pipeline claim error: {e}")
+                claimed = []
+
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            for job in claimed:
+                try:
+                    await self._run(job)
+                except Exception as e:
+                    await self._record_failure(job, e)
+
+    async def _claim(self, premium_only: bool) -> List[KYCJob]:
+        """Lease a batch of due jobs, premium first"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            query = (
+                select(KYCJob)
+                .where(KYCJob.status.in_(ACTIVE_STATUSES))
+                .where(KYCJob.next_attempt_at <= now)
+                .where(or_(KYCJob.locked_until.is_(None), KYCJob.locked_until < now))
+                .order_by(KYCJob.priority, KYCJob.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            if premium_only:
+                query = query.where(KYCJob.priority == PRIORITIES["premium"])
+            result = await session.execute(query)
+            claimed = result.scalars().all()
+            for job in claimed:
+                job.status = "running"
+                job.stage = "sanctions"
+                job.started_at = job.started_at or now
+                job.locked_until = now + self.lease
+            await session.commit()
+        return claimed
+
+    async def _save_stage(self, session: AsyncSession, job_id: str, stage: str, progress: int) -> KYCJob:
+        """Record progress and renew the lease"""
+        job = await session.get(KYCJob, job_id)
+        job.stage = stage
+        job.progress = progress
+        job.locked_until = datetime.utcnow() + self.lease
+        return job
+
+    def check_documents(self, record: KYCRecord) -> List[str]:
+        """Problems with the submitted identity details; empty when they pass"""
+        issues = []
+        pattern = ID_NUMBER_PATTERNS.get(record.id_type or "")
+        if pattern is None:
+            issues.append(f"unsupported id_type {record.id_type}")
+        elif not pattern.match(record.id_number or ""):
+            issues.append(f"id_number does not look like a {record.id_type}")
+
+        if not record.nationality or not re.fullmatch(r"[A-Z]{2,3}", record.nationality):
+            issues.append("nationality must be an ISO 3166 country code")
+
+        if record.date_of_birth is None:
+            issues.append("missing date_of_birth")
+        else:
+            today = datetime.utcnow().date()
+            born = record.date_of_birth.date()
+            age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+            if born > today:
+                issues.append("date_of_birth is in the future")
+            elif age < MINIMUM_AGE:
+                issues.append(f"applicant is under {MINIMUM_AGE}")
+        return issues
+
+    async def _document_in_use(self, session: AsyncSession, record: KYCRecord) -> bool:
+        """Whether another user already verified with the same document"""
+        result = await session.execute(
+            select(KYCRecord.id)
+            .where(KYCRecord.id_type == record.id_type)
+            .where(KYCRecord.id_number == record.id_number)
+            .where(KYCRecord.user_id != record.user_id)
+            .where(KYCRecord.verification_status == "verified")
+            .limit(1)
+        )
+        return result.first() is not None
+
+    async def _possible_duplicate(self, session: AsyncSession, record: KYCRecord) -> Optional[str]:
+        """Another verified user with a phonetically identical name and the same date of birth"""
+        if not record.name_phonetic or record.date_of_birth is None:
+            return None
+        result = await session.execute(
+            select(KYCRecord.user_id)
+            .where(KYCRecord.name_phonetic == record.name_phonetic)
+            .where(KYCRecord.date_of_birth == record.date_of_birth)
+            .where(KYCRecord.user_id != record.user_id)
+            .where(KYCRecord.verification_status == "verified")
+            .limit(1)
+        )
+        return result.scalar()
+
+    def _decide(self, risk_level: str, lists_failed: List[str], issues: List[str]) -> str:
+        if risk_level == "high":
+            return "rejected"
+        if risk_level != "clear" or lists_failed or issues:
+            return "manual_review"
+        return "verified"
+
+    async def _run(self, job: KYCJob):
+        async with AsyncSessionLocal() as session:
+            record = await session.get(KYCRecord, job.kyc_record_id)
+            if record is None:
+                raise LookupError(f"KYC record {job.kyc_record_id} not found")
+
+            # Stage 1: sanctions screening, once per job; a retry reuses the committed check
+            check = await session.get(SanctionCheck, job.sanction_check_id) if job.sanction_check_id else None
+            if check is None:
+                screening = await self.sanctions.screen(record.full_name, record.nationality, "individual")
+                check = SanctionCheck(**self.sanctions.check_record(screening, "kyc_pipeline"))
+                session.add(check)
+            stage = await self._save_stage(session, job.id, "documents", 50)
+            stage.sanction_check_id = check.id
+            await session.commit()
+            lists_failed = check.lists_failed or []
+
+            # Stage 2: document checks, then the decision
+            issues = self.check_documents(record)
+            if not issues and await self._document_in_use(session, record):
+                issues.append("document already verified for another user")
+            duplicate = await self._possible_duplicate(session, record)
+            if duplicate:
+                issues.append(f"possible duplicate identity of user {duplicate}")
+
+            now = datetime.utcnow()
+            decision = self._decide(check.risk_level, lists_failed, issues)
+            record.verification_status = decision
+            record.verified_at = now if decision == "verified" else None
+
+            row = await self._save_stage(session, job.id, "done", 100)
+            row.status = "completed"
+            row.locked_until = None
+            row.last_error = None
+            row.finished_at = now
+            row.result = {
+                "verification_status": decision,
+                "risk_level": check.risk_level,
+                "sanction_check_id": check.id,
+                "lists_failed": lists_failed,
+                "document_issues": issues
+            }
+            await session.commit()
+
+        # The decision is committed; a failing side effect must not send the job back to the queue
+        try:
+            if check.risk_level != "clear":
+                alert_aggregator.record(
+                    alert_type="sanctions_match",
+                    severity=check.risk_level,
+                    description=f"KYC record {record.id} ({record.full_name}) matched {len(check.matches or [])} sanctions entries",
+                    user_id=record.user_id
+                )
+
+            await audit_log_service.log_event(
+                db=None,
+                event_type="kyc_verification",
+                user_id=job.submitted_by,
+                action="verify_kyc",
+                resource_type="kyc_record",
+                resource_id=record.id,
+                details={"job_id": job.id, "subject_user_id": record.user_id, **row.result}
+            )
+        except Exception as e:
+            print(f"KYC job {job.id} completed but its alert or audit event failed: {e}")
+        await self._notify_user(row)
+
+    async def _record_failure(self, job: KYCJob, error: Exception):
+        print(f"KYC job {job.id} error: {error}")
+        async with AsyncSessionLocal() as session:
+            row = await session.get(KYCJob, job.id)
+            if row is None or row.status == "completed":
+                # Only work after the committed decision failed; verifying again would duplicate it
+                return
+            row.attempts += 1
+            row.last_error = str(error)
+            row.locked_until = None
+
+            if row.attempts >= self.max_attempts or isinstance(error, LookupError):
+                row.status = "failed"
+                row.finished_at = datetime.utcnow()
+            else:
+                row.status = "queued"
+                delay = min(self.base_backoff * 2 ** (row.attempts - 1), self.max_backoff)
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            await session.commit()
+
+        if row.status == "failed":
+            await self._notify_user(row)
+
+    async def _notify_user(self, job: KYCJob):
+        if self._notifier is None:
+            return
+        try:
+            await self._notifier(job.user_id, {
+                "type": "kyc_verification",
+                "job_id": job.id,
+                "kyc_record_id": job.kyc_record_id,
+                "status": job.status,
+                "verification_status": (job.result or {}).get("verification_status")
+            })
+        except Exception as e:
+            print(f"KYC job {job.id} notification error: {e}")
+
+    async def get_job(self, db: AsyncSession, job_id: str) -> Optional[KYCJob]:
+        return await db.get(KYCJob, job_id)
+
+
+# Initialize global pipeline
+kyc_pipeline = KYCVerificationPipeline(
+    sanctions_service,
+    workers=settings.KYC_WORKERS,
+    premium_workers=settings.KYC_PREMIUM_WORKERS,
+    max_attempts=settings.KYC_MAX_ATTEMPTS
+)
@@ -0,0 +1,53 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+# Domain separation keeps a leaf from being passed off as an interior node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def _hash_leaf(entry_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(entry_hash)).digest()
+
+def _hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def build_merkle_tree(leaves: List[str]) -> Tuple[str, List[List[Dict[str, str]]]]:
+    """
+    Build a Merkle tree over hex-encoded entry hashes.
+    Returns the hex root and, for each leaf, its inclusion proof as a list of
+    {"side": "left" | "right", "hash": ...} siblings from the leaf upwards.
+    An odd node at the end of a level is promoted unchanged.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+
+    level = [_hash_leaf(leaf) for leaf in leaves]
+    proofs: List[List[Dict[str, str]]] = [[] for _ in leaves]
+    positions = list(range(len(leaves)))
+
+    while len(level) > 1:
+        next_level = [
+            _hash_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append({
+                    "side": "left" if sibling < position else "right",
+                    "hash": level[sibling].hex()
+                })
+            positions[leaf] = position // 2
+
+        level = next_level
+
+    return level[0].hex(), proofs
+
+def verify_merkle_proof(entry_hash: str, proof: List[Dict[str, str]], root: str) -> bool:
+    """Recompute the root from an entry hash and its inclusion proof"""
+    node = _hash_leaf(entry_hash)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = _hash_node(sibling, node) if step["side"] == "left" else _hash_node(node, sibling)
+    return node.hex() == root
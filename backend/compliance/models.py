@@ -1,6 +1,20 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, BigInteger, Integer, Index, text, event
 from datetime import datetime
 from backend.core.database import Base
+from backend.compliance.name_matching import name_keys
+
+def _name_key_default(source: str, field: str):
+    """Insert default deriving `field` from the row's `source` name; covers bulk inserts"""
+    def default(context):
+        return name_keys(context.get_current_parameters().get(source))[field]
+    return default
+
+def _keep_name_keys(model, source: str):
+    """Recompute the stored name keys whenever the ORM sets `source`"""
+    @event.listens_for(getattr(model, source), "set")
+    def update_keys(target, value, oldvalue, initiator):
+        for field, key in name_keys(value).items():
+            setattr(target, field, key)
 
 class KYCRecord(Base):
     __tablename__ = "kyc_records"
@@ -8,18 +22,72 @@ class KYCRecord(Base):
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
+    name_normalized = Column(String, default=_name_key_default("full_name", "name_normalized"))
+    name_sorted = Column(String, default=_name_key_default("full_name", "name_sorted"))
+    name_phonetic = Column(String, default=_name_key_default("full_name", "name_phonetic"))
     date_of_birth = Column(DateTime)
     nationality = Column(String)
     id_type = Column(String)
     id_number = Column(String)
-    verification_status = Column(String, default="pending")
+    verification_status = Column(String, default="pending")  # pending, verified, manual_review, rejected
     verified_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_kyc_records_id_document", "id_type", "id_number"),
+        Index("ix_kyc_records_name_sorted", "name_sorted"),
+        Index("ix_kyc_records_name_phonetic_dob", "name_phonetic", "date_of_birth"),
+    )
+
+_keep_name_keys(KYCRecord, "full_name")
+
+class KYCJob(Base):
+    """Persisted state of one asynchronous KYC verification"""
+    __tablename__ = "kyc_jobs"
+    
+    id = Column(String, primary_key=True)
+    kyc_record_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=1)  # 0 premium, 1 standard; lower runs first
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    stage = Column(String)  # sanctions, documents, done
+    progress = Column(Integer, nullable=False, default=0)  # percent
+    result = Column(JSON)
+    sanction_check_id = Column(String)  # screening committed by an earlier attempt; reused on retry
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = Column(DateTime)  # lease held by the worker running this job
+    last_error = Column(Text)
+    submitted_by = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_kyc_jobs_due", "status", "priority", "next_attempt_at"),
+    )
+
+class SanctionScreeningJob(Base):
+    """Persisted progress of one bulk sanctions screening batch"""
+    __tablename__ = "sanction_screening_jobs"
+    
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="running")  # running, completed, failed, cancelled
+    total = Column(Integer, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    risk_counts = Column(JSON)
+    list_version = Column(String)
+    created_by = Column(String)
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # last progress commit by the running worker
+    finished_at = Column(DateTime)
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     
     id = Column(String, primary_key=True)
+    sequence = Column(BigInteger, unique=True, index=True)  # Monotonic position in the chain
     event_type = Column(String, nullable=False)
     user_id = Column(String)
     action = Column(String, nullable=False)
@@ -30,10 +98,34 @@ class AuditLog(Base):
     ip_address = Column(String)
     user_agent = Column(String)
     hash = Column(String, nullable=False)  # SHA-256 hash of entry
-    signature = Column(String, nullable=False)  # Cryptographic signature
+    signature = Column(String, nullable=False)  # Signature of the batch Merkle root
     previous_hash = Column(String)  # Hash of previous entry for chain
+    batch_id = Column(String, index=True)  # AuditBatch whose root covers this entry
+    merkle_proof = Column(JSON)  # Inclusion proof of hash under the batch root
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+class AuditBatch(Base):
+    __tablename__ = "audit_batches"
+    
+    id = Column(String, primary_key=True)
+    merkle_root = Column(String, nullable=False)
+    signature = Column(String, nullable=False)  # Signature of merkle_root
+    first_sequence = Column(BigInteger, nullable=False)
+    last_sequence = Column(BigInteger, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class AuditChainCheckpoint(Base):
+    __tablename__ = "audit_chain_checkpoints"
+    
+    id = Column(String, primary_key=True)
+    sequence = Column(BigInteger, nullable=False, index=True)  # Last verified entry
+    hash = Column(String, nullable=False)  # Hash of the last verified entry
+    entries_checked = Column(BigInteger, nullable=False)
+    mode = Column(String, nullable=False)  # incremental, full
+    verified_by = Column(String)
+    verified_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class ComplianceAlert(Base):
     __tablename__ = "compliance_alerts"
     
@@ -44,19 +136,55 @@ class ComplianceAlert(Base):
     transaction_id = Column(String)
     description = Column(Text)
     status = Column(String, default="open")
+    dedup_key = Column(String)  # alert_type|user_id|transaction_id; repeats fold into one open alert
+    occurrence_count = Column(Integer, default=1, nullable=False)
+    last_seen_at = Column(DateTime, default=datetime.utcnow)
     resolved_by = Column(String)
     resolved_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # The alert queue pages newest-first through open alerts, optionally for one user
+        Index(
+            "ix_compliance_alerts_open_created", "created_at", "id",
+            postgresql_where=text("status = 'open'"), sqlite_where=text("status = 'open'")
+        ),
+        Index(
+            "ix_compliance_alerts_open_user", "user_id", "created_at", "id",
+            postgresql_where=text("status = 'open'"), sqlite_where=text("status = 'open'")
+        ),
+        Index("ix_compliance_alerts_status_created", "status", "created_at", "id"),
+        Index(
+            "ix_compliance_alerts_open_dedup", "dedup_key",
+            postgresql_where=text("status = 'open'"), sqlite_where=text("status = 'open'")
+        ),
+    )
+
+class ComplianceAlertCount(Base):
+    __tablename__ = "compliance_alert_counts"
+    
+    severity = Column(String, primary_key=True)
+    open_count = Column(BigInteger, nullable=False, default=0)  # Kept in step with alert inserts and resolutions
 
 class SanctionCheck(Base):
     __tablename__ = "sanction_checks"
     
     id = Column(String, primary_key=True)
     entity_name = Column(String, nullable=False)
+    name_normalized = Column(String, default=_name_key_default("entity_name", "name_normalized"))
+    name_sorted = Column(String, default=_name_key_default("entity_name", "name_sorted"), index=True)
+    name_phonetic = Column(String, default=_name_key_default("entity_name", "name_phonetic"), index=True)
     entity_type = Column(String, nullable=False)  # individual, organization
     country = Column(String)
     risk_level = Column(String, nullable=False)  # clear, medium, high
     matches = Column(JSON)  # List of matches from various lists
     lists_checked = Column(JSON)  # Which lists were checked (OFAC, EU, UN)
+    lists_failed = Column(JSON)  # Lists that could not be checked
+    list_version = Column(String)  # Local list version, if screened offline
     checked_by = Column(String)
+    batch_id = Column(String, index=True)  # Bulk screening batch, if any
+    screened_at = Column(DateTime)  # When the lists were actually screened; earlier than created_at on a cache hit
+    cache_hit = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+_keep_name_keys(SanctionCheck, "entity_name")
@@ -0,0 +1,515 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event, select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.ledger.models import Account, Transaction
+from backend.compliance.models import ComplianceAlert
+from backend.compliance.service import alert_dedup_key
+from backend.compliance.alert_aggregator import alert_aggregator
+from backend.compliance.audit_log import audit_log_service
+
+# Status of alerts recorded by a replay; the alert queue and open counts only cover "open"
+REPLAY_ALERT_STATUS = "backtest"
+
+# Ledger transaction type -> direction of the money for the account
+DIRECTIONS = {
+    "deposit": "in",
+    "withdrawal": "out",
+    "transfer": "out",
+}
+
+class TransactionEvent:
+    """One ledger posting as seen by the monitoring rules"""
+
+    __slots__ = ("transaction_id", "account_id", "user_id", "type", "direction", "amount", "counterparty", "timestamp")
+
+    def __init__(
+        self,
+        transaction_id: str,
+        account_id: Optional[str],
+        user_id: Optional[str],
+        type: str,
+        amount: float,
+        from_address: Optional[str],
+        to_address: Optional[str],
+        created_at: datetime
+    ):
+        self.transaction_id = transaction_id
+        self.account_id = account_id
+        self.user_id = user_id
+        self.type = type
+        self.direction = DIRECTIONS.get(type)
+        self.amount = amount
+        self.counterparty = from_address if self.direction == "in" else to_address
+        self.timestamp = created_at.replace(tzinfo=timezone.utc).timestamp()
+
+    @classmethod
+    def from_transaction(cls, transaction: Transaction, user_id: Optional[str]) -> "TransactionEvent":
+        return cls(
+            transaction.id,
+            transaction.account_id,
+            user_id,
+            getattr(transaction.type, "value", transaction.type),
+            float(transaction.amount),
+            transaction.from_address,
+            transaction.to_address,
+            transaction.created_at or datetime.utcnow()
+        )
+
+class SlidingWindow:
+    """Timestamps and values inside the last `span` seconds, with a running total"""
+
+    __slots__ = ("span", "times", "values", "total")
+
+    def __init__(self, span: float):
+        self.span = span
+        self.times: deque = deque()
+        self.values: deque = deque()
+        self.total = 0.0
+
+    def expire(self, now: float):
+        cutoff = now - self.span
+        times, values = self.times, self.values
+        while times and times[0] <= cutoff:
+            times.popleft()
+            self.total -= values.popleft()
+        if not times:
+            self.total = 0.0  # Drop accumulated float error
+
+    def add(self, now: float, value: float = 1.0):
+        self.expire(now)
+        self.times.append(now)
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def count(self) -> int:
+        return len(self.times)
+
+    @property
+    def last(self) -> float:
+        return self.times[-1] if self.times else float("-inf")
+
+class MonitoringRule(ABC):
+    """
+    One AML rule with its own per-key state. `scope` picks the key: the
+    posting's user or its account. evaluate() is called for every posting and
+    returns (severity, description) when the rule fires.
+    """
+
+    name: str = ""
+    scope: str = "account"  # account, user
+
+    def __init__(self, window: float, dedup_window: Optional[float] = None):
+        self.window = window
+        self.dedup_window = dedup_window or window  # Repeat firings for a key are suppressed this long
+        self._state: Dict[str, Any] = {}
+
+    @abstractmethod
+    def evaluate(self, key: str, event: TransactionEvent) -> Optional[Tuple[str, str]]:
+        pass
+
+    def last_seen(self, state) -> float:
+        return state.last
+
+    def evict(self, now: float) -> int:
+        """Forget keys with no activity inside the window"""
+        cutoff = now - self.window
+        idle = [key for key, state in self._state.items() if self.last_seen(state) <= cutoff]
+        for key in idle:
+            del self._state[key]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+class VelocityRule(MonitoringRule):
+    """Unusually many postings by one user in a short period"""
+
+    name = "velocity"
+    scope = "user"
+
+    def __init__(self, window: float = 3600.0, max_count: int = 20):
+        super().__init__(window)
+        self.max_count = max_count
+
+    def evaluate(self, key: str, event: TransactionEvent) -> Optional[Tuple[str, str]]:
+        window = self._state.get(key)
+        if window is None:
+            window = self._state[key] = SlidingWindow(self.window)
+        window.add(event.timestamp)
+
+        if window.count > self.max_count:
+            return "medium", f"{window.count} transactions within {self.window / 60:g} minutes"
+        return None
+
+class StructuringRule(MonitoringRule):
+    """Repeated postings just below the reporting threshold"""
+
+    name = "structuring"
+    scope = "account"
+
+    def __init__(self, window: float = 86400.0, threshold: float = 10_000.0, margin: float = 0.1, min_count: int = 3):
+        super().__init__(window)
+        self.threshold = threshold
+        self.floor = threshold * (1 - margin)
+        self.min_count = min_count
+
+    def evaluate(self, key: str, event: TransactionEvent) -> Optional[Tuple[str, str]]:
+        if not self.floor <= event.amount < self.threshold:
+            return None
+
+        window = self._state.get(key)
+        if window is None:
+            window = self._state[key] = SlidingWindow(self.window)
+        window.add(event.timestamp, event.amount)
+
+        if window.count >= self.min_count:
+            return "high", (
+                f"{window.count} transactions between {self.floor:g} and {self.threshold:g} "
+                f"totalling {window.total:.2f} within {self.window / 3600:g} hours"
+            )
+        return None
+
+class RapidInOutRule(MonitoringRule):
+    """Funds leaving an account soon after they arrived"""
+
+    name = "rapid_in_out"
+    scope = "account"
+
+    def __init__(self, window: float = 86400.0, ratio: float = 0.9, min_amount: float = 1_000.0):
+        super().__init__(window)
+        self.ratio = ratio
+        self.min_amount = min_amount
+
+    def last_seen(self, state) -> float:
+        return max(state[0].last, state[1].last)
+
+    def evaluate(self, key: str, event: TransactionEvent) -> Optional[Tuple[str, str]]:
+        if event.direction is None:
+            return None
+
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = (SlidingWindow(self.window), SlidingWindow(self.window))
+        inflow, outflow = state
+
+        if event.direction == "in":
+            inflow.add(event.timestamp, event.amount)
+            return None
+
+        outflow.add(event.timestamp, event.amount)
+        inflow.expire(event.timestamp)
+        if inflow.total >= self.min_amount and outflow.total >= self.ratio * inflow.total:
+            return "high", (
+                f"{outflow.total:.2f} paid out against {inflow.total:.2f} received "
+                f"within {self.window / 3600:g} hours"
+            )
+        return None
+
+class NewCounterpartyRule(MonitoringRule):
+    """A burst of payments to or from counterparties the user has not used before"""
+
+    name = "new_counterparty_burst"
+    scope = "user"
+
+    def __init__(self, window: float = 3600.0, max_new: int = 5, memory: float = 90 * 86400.0, max_known: int = 1_000):
+        super().__init__(memory, dedup_window=window)
+        self.burst_window = window
+        self.max_new = max_new
+        self.max_known = max_known
+
+    def last_seen(self, state) -> float:
+        return state[2]
+
+    def evaluate(self, key: str, event: TransactionEvent) -> Optional[Tuple[str, str]]:
+        counterparty = event.counterparty
+        if not counterparty:
+            return None
+
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = [{}, SlidingWindow(self.burst_window), event.timestamp]
+        known, new, _ = state
+        state[2] = event.timestamp
+
+        if counterparty in known:
+            return None
+        known[counterparty] = None
+        if len(known) > self.max_known:
+            del known[next(iter(known))]  # Forget the oldest counterparty
+
+        new.add(event.timestamp)
+        if new.count > self.max_new:
+            return "medium", f"{new.count} new counterparties within {self.burst_window / 60:g} minutes"
+        return None
+
+def default_rules() -> List[MonitoringRule]:
+    return [
+        VelocityRule(),
+        StructuringRule(threshold=settings.AML_REPORTING_THRESHOLD),
+        RapidInOutRule(),
+        NewCounterpartyRule(),
+    ]
+
+class TransactionMonitor:
+    """
+    Streaming AML rules engine over ledger postings. Every posting is run
+    through each rule in memory; state is sliding windows per user or
+    account, keyed by event time so live monitoring and replay behave the
+    same. A rule that fires again for the same key within its dedup window
+    is suppressed, so one burst raises one alert.
+    
+    Rule windows live in process memory, so the thresholds only hold when
+    all postings go through one worker process; with N workers each sees a
+    share of the postings and a burst has to be up to N times larger to fire.
+    """
+
+    def __init__(self, rules: Optional[List[MonitoringRule]] = None, sweep_every: int = 100_000, max_accounts: int = 100_000):
+        self.rules = rules if rules is not None else default_rules()
+        self.sweep_every = sweep_every
+        self.max_accounts = max_accounts
+        self._alerted: Dict[Tuple[str, str], float] = {}
+        self._seen = 0
+        self._account_users: Dict[str, str] = {}
+        self.events = 0
+        self.alerts: Counter = Counter()
+
+    def observe(self, event: TransactionEvent) -> List[Dict[str, Any]]:
+        """Run one posting through every rule; returns the alerts it raises"""
+        now = event.timestamp
+        alerts = []
+        for rule in self.rules:
+            key = event.user_id if rule.scope == "user" else event.account_id
+            if key is None:
+                continue
+            finding = rule.evaluate(key, event)
+            if finding is None:
+                continue
+
+            dedup_key = (rule.name, key)
+            if now - self._alerted.get(dedup_key, float("-inf")) < rule.dedup_window:
+                continue
+            self._alerted[dedup_key] = now
+            self.alerts[rule.name] += 1
+
+            severity, description = finding
+            alerts.append({
+                "alert_type": f"aml_{rule.name}",
+                "severity": severity,
+                "user_id": event.user_id,
+                "transaction_id": event.transaction_id,
+                "description": f"{rule.scope.capitalize()} {key}: {description}"
+            })
+
+        self.events += 1
+        self._seen += 1
+        if self._seen >= self.sweep_every:
+            self.sweep(now)
+        return alerts
+
+    def sweep(self, now: float):
+        """Drop idle keys and expired alert suppressions"""
+        self._seen = 0
+        for rule in self.rules:
+            rule.evict(now)
+        windows = {rule.name: rule.dedup_window for rule in self.rules}
+        expired = [k for k, at in self._alerted.items() if now - at >= windows.get(k[0], 0.0)]
+        for k in expired:
+            del self._alerted[k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "alerts": dict(self.alerts),
+            "keys": {rule.name: len(rule) for rule in self.rules},
+            "suppressions": len(self._alerted)
+        }
+
+    async def _user_for(self, db: AsyncSession, account_id: Optional[str]) -> Optional[str]:
+        if not account_id:
+            return None
+        user_id = self._account_users.get(account_id)
+        if user_id is None:
+            account = await db.get(Account, account_id)
+            if account is None:
+                return None
+            user_id = self._account_users[account_id] = account.user_id
+            if len(self._account_users) > self.max_accounts:
+                del self._account_users[next(iter(self._account_users))]  # Forget the oldest account
+        return user_id
+
+    async def check_transaction(
+        self,
+        db: AsyncSession,
+        transaction: Transaction,
+        user_id: Optional[str] = None
+    ):
+        """
+        Monitor a posting once `db` commits it; alerts go through the aggregator.
+        A posting that rolls back never reaches the rule windows.
+        """
+        try:
+            if user_id is None:
+                user_id = await self._user_for(db, transaction.account_id)
+            posting = TransactionEvent.from_transaction(transaction, user_id)
+        except Exception as e:
+            # Monitoring must never block a posting
+            print(f"Transaction monitoring error for {transaction.id}: {e}")
+            return
+
+        if db.in_transaction():
+            state = {"done": False}
+
+            def committed(session):
+                if not state["done"]:
+                    state["done"] = True
+                    self._observe_committed(posting)
+
+            def rolled_back(session):
+                state["done"] = True
+
+            event.listen(db.sync_session, "after_commit", committed, once=True)
+            event.listen(db.sync_session, "after_rollback", rolled_back, once=True)
+        else:
+            self._observe_committed(posting)
+
+    def _observe_committed(self, posting: TransactionEvent):
+        try:
+            for alert in self.observe(posting):
+                alert_aggregator.record(**alert)
+        except Exception as e:
+            print(f"Transaction monitoring error for {posting.transaction_id}: {e}")
+
+class MonitoringReplay:
+    """
+    Runs a fresh rules engine over historical transactions in created_at
+    order, e.g. to backtest a rule change. Rows are streamed with plain
+    column selects; alerts are only written when `record` is set, with
+    status REPLAY_ALERT_STATUS so they stay out of the live alert queue,
+    each partition's alerts in their own transaction.
+    """
+
+    def __init__(self, batch_size: int = 20_000):
+        self.batch_size = batch_size
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        record: bool = False,
+        triggered_by: Optional[str] = None
+    ) -> Dict[str, Any]:
+        run_id = str(uuid.uuid4())
+        monitor = TransactionMonitor()
+        summary: Dict[str, Any] = {
+            "id": run_id,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "record": record,
+            "started_at": datetime.utcnow().isoformat(),
+            "status": "running"
+        }
+        if record:
+            summary["recorded_alerts"] = 0
+        self.last_run = summary
+        started = asyncio.get_running_loop().time()
+
+        query = (
+            select(
+                Transaction.id, Transaction.account_id, Account.user_id, Transaction.type,
+                Transaction.amount, Transaction.from_address, Transaction.to_address, Transaction.created_at
+            )
+            .join(Account, Account.id == Transaction.account_id, isouter=True)
+            .order_by(Transaction.created_at, Transaction.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        if since:
+            query = query.where(Transaction.created_at >= since)
+        if until:
+            query = query.where(Transaction.created_at < until)
+
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(query)
+                async for rows in result.partitions():
+                    alerts = await asyncio.to_thread(self._observe_rows, monitor, rows)
+                    if record and alerts:
+                        await self._record_alerts(alerts)
+                        summary["recorded_alerts"] += len(alerts)
+            summary["status"] = "completed"
+        except Exception as e:
+            summary["status"] = "failed"
+            summary["error"] = str(e)
+            print(f"Transaction monitoring replay {run_id} failed: {e}")
+        finally:
+            elapsed = asyncio.get_running_loop().time() - started
+            summary.update(monitor.stats())
+            summary["seconds"] = round(elapsed, 3)
+            summary["finished_at"] = datetime.utcnow().isoformat()
+
+        await audit_log_service.log_event(
+            db=None,
+            event_type="transaction_monitoring_replay",
+            user_id=triggered_by,
+            action="replay_transactions",
+            resource_type="transactions",
+            resource_id=run_id,
+            details=summary
+        )
+        return summary
+
+    async def _record_alerts(self, alerts: List[Dict[str, Any]]):
+        """Write one partition's alerts in a transaction of their own"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                insert(ComplianceAlert),
+                [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "status": REPLAY_ALERT_STATUS,
+                        "dedup_key": alert_dedup_key(a["alert_type"], a["user_id"], a["transaction_id"]),
+                        "occurrence_count": 1,
+                        "last_seen_at": now,
+                        "created_at": now,
+                        **a
+                    }
+                    for a in alerts
+                ]
+            )
+            await session.commit()
+
+    def _observe_rows(self, monitor: TransactionMonitor, rows) -> List[Dict[str, Any]]:
+        alerts = []
+        observe = monitor.observe
+        for row in rows:
+            alerts.extend(observe(TransactionEvent(
+                row[0], row[1], row[2], getattr(row[3], "value", row[3]),
+                float(row[4]), row[5], row[6], row[7]
+            )))
+        return alerts
+
+    def submit(self, **kwargs) -> bool:
+        """Start a background replay unless one is already going"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run(**kwargs))
+        return True
+
+
+# Initialize global monitor and replay runner
+transaction_monitor = TransactionMonitor()
+monitoring_replay = MonitoringReplay()
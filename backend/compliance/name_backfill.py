@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import select, update
+from backend.core.database import AsyncSessionLocal
+from backend.compliance.models import KYCRecord, SanctionCheck
+from backend.compliance.name_matching import name_keys
+
+# Model -> column the stored name keys are derived from
+NAME_SOURCES = (
+    (KYCRecord, "full_name"),
+    (SanctionCheck, "entity_name"),
+)
+
+class NameKeyBackfill:
+    """
+    Fills name_normalized, name_sorted and name_phonetic on rows written
+    before those columns existed. Rows are read in primary key order, one
+    batch per transaction, so the job can stop at any point and resume.
+    """
+
+    def __init__(self, batch_size: int = 5_000):
+        self.batch_size = batch_size
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def backfill(self, model, source: str) -> int:
+        name_column = getattr(model, source)
+        updated = 0
+        after = ""
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(model.id, name_column)
+                    .where(model.name_normalized.is_(None))
+                    .where(model.id > after)
+                    .order_by(model.id)
+                    .limit(self.batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    return updated
+
+                keys = await asyncio.to_thread(lambda: [{"id": row_id, **name_keys(name)} for row_id, name in rows])
+                await session.execute(update(model), keys)
+                await session.commit()
+
+            updated += len(rows)
+            after = rows[-1][0]
+
+    async def run(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"started_at": datetime.utcnow().isoformat(), "status": "running"}
+        self.last_run = summary
+        try:
+            for model, source in NAME_SOURCES:
+                summary[model.__tablename__] = await self.backfill(model, source)
+            summary["status"] = "completed"
+        except Exception as e:
+            summary["status"] = "failed"
+            summary["error"] = str(e)
+            print(f"Name key backfill failed: {e}")
+        summary["finished_at"] = datetime.utcnow().isoformat()
+        return summary
+
+    def submit(self) -> bool:
+        """Start a background backfill unless one is already going"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run())
+        return True
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+# Initialize global backfill
+name_key_backfill = NameKeyBackfill()
+
+
+if __name__ == "__main__":
+    print(asyncio.run(NameKeyBackfill().run()))
@@ -0,0 +1,147 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+# Honorifics and legal-form words that carry no identity
+STOP_WORDS = {
+    "mr", "mrs", "ms", "dr", "sheikh", "haji", "hajji",
+    "ltd", "llc", "inc", "co", "corp", "plc", "gmbh", "sa", "jsc", "ooo", "the", "of",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def normalize_name(name: str) -> str:
+    """Fold accents and case, drop punctuation and stop words, collapse whitespace"""
+    folded = unicodedata.normalize("NFKD", name)
+    folded = "".join(c for c in folded if not unicodedata.combining(c)).lower()
+    return " ".join(t for t in _NON_ALNUM.sub(" ", folded).split() if t not in STOP_WORDS)
+
+def name_tokens(normalized: str) -> List[str]:
+    return normalized.split()
+
+def ngrams(normalized: str, n: int = 3) -> List[str]:
+    """Character n-grams of the space-padded name; word boundaries are n-grams too"""
+    padded = f" {normalized} "
+    return list({padded[i:i + n] for i in range(len(padded) - n + 1)})
+
+_PHONETIC_RULES = (
+    (re.compile(r"^(kn|gn|pn|ae|wr)"), lambda m: m.group(1)[1]),
+    (re.compile(r"^x"), lambda m: "s"),
+    (re.compile(r"^wh"), lambda m: "w"),
+    (re.compile(r"sch"), lambda m: "sk"),
+    (re.compile(r"(?:sh|ch|sio|tio|tia)"), lambda m: "x" + m.group(0)[2:]),
+    (re.compile(r"ph"), lambda m: "f"),
+    (re.compile(r"th"), lambda m: "0"),
+    (re.compile(r"dg(?=[eiy])"), lambda m: "j"),
+    (re.compile(r"gh(?![aeiou])"), lambda m: ""),
+    (re.compile(r"ck"), lambda m: "k"),
+    (re.compile(r"c(?=[eiy])"), lambda m: "s"),
+    (re.compile(r"g(?=[eiy])"), lambda m: "j"),
+    (re.compile(r"[cgq]"), lambda m: "k"),
+    (re.compile(r"x"), lambda m: "ks"),
+    (re.compile(r"z"), lambda m: "s"),
+    (re.compile(r"d"), lambda m: "t"),
+    (re.compile(r"v"), lambda m: "f"),
+    (re.compile(r"(?<=[^aeiou])h"), lambda m: ""),
+    (re.compile(r"[wyh](?![aeiou])"), lambda m: ""),
+)
+
+@lru_cache(maxsize=1 << 18)
+def phonetic_key(token: str, length: int = 6) -> str:
+    """
+    Simplified Metaphone: spelling variants of a token share a key.
+    A leading vowel is kept as "a", other vowels are dropped and repeated
+    consonants collapse.
+    """
+    word = "".join(c for c in token if c.isalpha())
+    if not word:
+        return ""
+    for pattern, replace in _PHONETIC_RULES:
+        word = pattern.sub(replace, word)
+    if not word:
+        return ""
+
+    key = "a" if word[0] in "aeiou" else ""
+    for c in word:
+        if c in "aeiou" or (key and key[-1] == c):
+            continue
+        key += c
+    return key[:length]
+
+def name_keys(name: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Stored lookup keys for a name: the normalized form, its tokens sorted
+    (word order independent) and the sorted phonetic keys of its tokens.
+    """
+    if name is None:
+        return {"name_normalized": None, "name_sorted": None, "name_phonetic": None}
+    normalized = normalize_name(name)
+    tokens = sorted(name_tokens(normalized))
+    return {
+        "name_normalized": normalized,
+        "name_sorted": " ".join(tokens),
+        "name_phonetic": " ".join(sorted(k for k in map(phonetic_key, tokens) if k))
+    }
+
+def jaro_winkler(a: str, b: str, prefix_scale: float = 0.1) -> float:
+    """Jaro-Winkler over the UTF-8 bytes; normalized names are plain ASCII"""
+    if a == b:
+        return 1.0
+    a_bytes, b_bytes = a.encode(), b.encode()
+    len_a, len_b = len(a_bytes), len(b_bytes)
+    if not len_a or not len_b:
+        return 0.0
+
+    window = max(max(len_a, len_b) // 2 - 1, 0)
+    # Matched bytes in b are blanked out so bytearray.find skips them
+    unmatched_b = bytearray(b_bytes)
+    matches_a = []
+    positions_b = []
+    for i, c in enumerate(a_bytes):
+        j = unmatched_b.find(c, max(0, i - window), i + window + 1)
+        if j >= 0:
+            unmatched_b[j] = 0
+            matches_a.append(c)
+            positions_b.append(j)
+
+    m = len(matches_a)
+    if not m:
+        return 0.0
+    positions_b.sort()
+    transpositions = sum(x != b_bytes[j] for x, j in zip(matches_a, positions_b)) / 2
+    jaro = (m / len_a + m / len_b + (m - transpositions) / m) / 3
+
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+@lru_cache(maxsize=1 << 16)
+def _token_similarity(a: str, b: str) -> float:
+    # List names reuse a small vocabulary of tokens, so pairs repeat constantly
+    return jaro_winkler(a, b)
+
+def name_similarity(query: Sequence[str], candidate: Sequence[str]) -> float:
+    """
+    Score two token lists in [0, 1]. Takes the better of a token-level
+    best-match average and, when the names split into a different number of
+    tokens ("binladen" vs "bin laden"), the whole-name Jaro-Winkler. Word
+    order and extra middle names cost little.
+    """
+    if not query or not candidate:
+        return 0.0
+
+    shorter, longer = (query, candidate) if len(query) <= len(candidate) else (candidate, query)
+    best = [max(_token_similarity(s, l) for l in longer) for s in shorter]
+    # Weight by token length so initials do not dominate
+    weights = [len(s) for s in shorter]
+    token_score = sum(b * w for b, w in zip(best, weights)) / sum(weights)
+    # Unmatched extra tokens on the longer side cost a little
+    token_score *= 0.9 + 0.1 * len(shorter) / len(longer)
+
+    if len(query) == len(candidate):
+        return token_score
+    return max(token_score, jaro_winkler(" ".join(sorted(query)), " ".join(sorted(candidate))))
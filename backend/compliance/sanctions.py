@@ -1,121 +1,145 @@
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from datetime import datetime
-import httpx
+import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.core.config import settings
 from backend.compliance.models import SanctionCheck
 from backend.compliance.schemas import SanctionCheckResult
+from backend.compliance.sanctions_index import SanctionsIndex, SanctionsListStore, sanctions_lists
+from backend.compliance.sanctions_providers import ScreeningOutcome, SanctionsProviderRegistry, sanctions_providers
+from backend.compliance.screening_cache import ScreeningResultCache, screening_cache
 
 class SanctionsScreeningService:
     """Automated sanctions screening against OFAC, EU, and UN lists"""
     
-    def __init__(self):
-        self.ofac_api_url = settings.OFAC_API_URL or "https://api.trade.gov/consolidated_screening_list/search"
-        self.eu_sanctions_url = settings.EU_SANCTIONS_URL or "https://webgate.ec.europa.eu/fsd/fsf"
+    def __init__(
+        self,
+        lists: SanctionsListStore = sanctions_lists,
+        providers: SanctionsProviderRegistry = sanctions_providers,
+        cache: ScreeningResultCache = screening_cache
+    ):
+        self.lists = lists
+        self.providers = providers
+        self.cache = cache
         
     async def screen_entity(
         self, 
         name: str, 
         country: Optional[str] = None,
         entity_type: str = "individual",
-        db: Optional[AsyncSession] = None
+        db: Optional[AsyncSession] = None,
+        checked_by: Optional[str] = None
     ) -> SanctionCheckResult:
         """
         Screen entity against OFAC, EU, and UN sanctions lists
         Returns match status and risk level
         """
-        matches = []
+        result = await self.screen(name, country, entity_type)
         
-        # Screen against OFAC
-        ofac_matches = await self._check_ofac(name, country)
-        matches.extend(ofac_matches)
+        # Store in database for audit trail
+        if db:
+            sanction_check = SanctionCheck(**self.check_record(result, checked_by))
+            db.add(sanction_check)
+            await db.commit()
+            result.check_id = sanction_check.id
         
-        # Screen against EU sanctions
-        eu_matches = await self._check_eu_sanctions(name, country)
-        matches.extend(eu_matches)
+        return result
+    
+    async def screen(
+        self,
+        name: str,
+        country: Optional[str] = None,
+        entity_type: str = "individual",
+        index: Optional[SanctionsIndex] = None
+    ) -> SanctionCheckResult:
+        """Screen without persisting; every registered list is queried concurrently"""
+        index = index or self.lists.index
+        version, key = self._cache_version(index), self.cache.key(name, country, entity_type)
+        cached = self.cache.get(version, key)
+        if cached:
+            return self._from_cache(cached, name)
         
+        outcome = await self.providers.screen(name, country, index)
+        result = self._result(name, country, entity_type, outcome)
+        self._remember(version, key, result)
+        return result
+    
+    def screen_local(
+        self,
+        index: SanctionsIndex,
+        name: str,
+        country: Optional[str] = None,
+        entity_type: str = "individual"
+    ) -> SanctionCheckResult:
+        """Screen against one local index only; synchronous and CPU-bound"""
+        version, key = self._cache_version(index), self.cache.key(name, country, entity_type)
+        cached = self.cache.get(version, key)
+        if cached:
+            return self._from_cache(cached, name)
+        
+        result = self._result(name, country, entity_type, self.providers.screen_local(name, index))
+        self._remember(version, key, result)
+        return result
+    
+    def _cache_version(self, index: Optional[SanctionsIndex]) -> str:
+        # Lists served by remote APIs carry no version; their entries age out by TTL
+        return index.version if index else "remote"
+    
+    def _remember(self, version: str, key, result: SanctionCheckResult):
+        # Incomplete screenings are retried next time rather than served from cache
+        if not result.lists_failed:
+            self.cache.put(version, key, result.model_copy())
+    
+    def _from_cache(self, cached: SanctionCheckResult, name: str) -> SanctionCheckResult:
+        # Keep the original checked_at: the lists were screened then, not now
+        return cached.model_copy(update={"entity_name": name, "cache_hit": True, "check_id": None})
+    
+    def _result(
+        self,
+        name: str,
+        country: Optional[str],
+        entity_type: str,
+        outcome: ScreeningOutcome
+    ) -> SanctionCheckResult:
         # Determine risk level
         risk_level = "clear"
-        if matches:
-            risk_level = "high" if any(m.get("match_score", 0) > 0.9 for m in matches) else "medium"
+        if outcome.matches:
+            risk_level = "high" if any(m.get("match_score", 0) > 0.9 for m in outcome.matches) else "medium"
         
-        result = SanctionCheckResult(
+        return SanctionCheckResult(
             entity_name=name,
             entity_type=entity_type,
             country=country,
             risk_level=risk_level,
-            matches=matches,
+            matches=outcome.matches,
             checked_at=datetime.utcnow(),
-            lists_checked=["OFAC", "EU", "UN"]
+            lists_checked=outcome.lists_checked,
+            lists_failed=outcome.lists_failed,
+            list_version=outcome.list_version
         )
-        
-        # Store in database for audit trail
-        if db:
-            sanction_check = SanctionCheck(
-                entity_name=name,
-                entity_type=entity_type,
-                country=country,
-                risk_level=risk_level,
-                matches=matches,
-                lists_checked=["OFAC", "EU", "UN"]
-            )
-            db.add(sanction_check)
-            await db.commit()
-        
-        return result
     
-    async def _check_ofac(self, name: str, country: Optional[str]) -> List[dict]:
-        """Check against OFAC Specially Designated Nationals (SDN) list"""
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                params = {"name": name, "sources": "SDN"}
-                if country:
-                    params["countries"] = country
-                    
-                response = await client.get(self.ofac_api_url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return [
-                        {
-                            "list": "OFAC SDN",
-                            "name": result.get("name"),
-                            "match_score": result.get("score", 0),
-                            "programs": result.get("programs", []),
-                            "remarks": result.get("remarks")
-                        }
-                        for result in data.get("results", [])
-                    ]
-        except Exception as e:
-            print(f"OFAC screening error: {e}")
-        
-        return []
-    
-    async def _check_eu_sanctions(self, name: str, country: Optional[str]) -> List[dict]:
-        """Check against EU sanctions list"""
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                params = {"name": name}
-                
-                # Note: This is a placeholder - actual EU API may require authentication
-                response = await client.get(self.eu_sanctions_url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return [
-                        {
-                            "list": "EU Sanctions",
-                            "name": result.get("name"),
-                            "match_score": result.get("score", 0),
-                            "regulation": result.get("regulation"),
-                            "remarks": result.get("remarks")
-                        }
-                        for result in data.get("results", [])
-                    ]
-        except Exception as e:
-            print(f"EU sanctions screening error: {e}")
-        
-        return []
+    def check_record(
+        self,
+        result: SanctionCheckResult,
+        checked_by: Optional[str] = None,
+        batch_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Column values of the SanctionCheck row recording a result"""
+        return {
+            "id": result.check_id or str(uuid.uuid4()),
+            "entity_name": result.entity_name,
+            "entity_type": result.entity_type,
+            "country": result.country,
+            "risk_level": result.risk_level,
+            "matches": result.matches,
+            "lists_checked": result.lists_checked,
+            "lists_failed": result.lists_failed,
+            "list_version": result.list_version,
+            "checked_by": checked_by,
+            "batch_id": batch_id,
+            "screened_at": result.checked_at,
+            "cache_hit": result.cache_hit,
+            "created_at": datetime.utcnow()
+        }
 
 
 # Initialize global service
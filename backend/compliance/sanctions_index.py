@@ -0,0 +1,383 @@
+import asyncio
+import csv
+import hashlib
+import json
+from array import array
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, List, Optional
+import numpy as np
+from backend.core.config import settings
+from backend.compliance.name_matching import normalize_name, name_tokens, ngrams, phonetic_key, name_similarity
+
+# Files looked for in the sanctions list directory, as published by each authority
+OFAC_SDN_FILE = "sdn.csv"
+OFAC_ALT_FILE = "alt.csv"
+OFAC_ADD_FILE = "add.csv"
+EU_FILE = "eu_sanctions.csv"
+UN_FILE = "un_consolidated.xml"
+LIST_FILES = (OFAC_SDN_FILE, OFAC_ALT_FILE, OFAC_ADD_FILE, EU_FILE, UN_FILE)
+
+class SanctionsEntry:
+    """One designated person or organization and all of its listed names"""
+    __slots__ = ("uid", "source", "list_name", "entity_type", "name", "aliases", "countries", "programs", "remarks")
+
+    def __init__(
+        self,
+        uid: str,
+        source: str,
+        list_name: str,
+        entity_type: str,
+        name: str,
+        aliases: Optional[List[str]] = None,
+        countries: Optional[List[str]] = None,
+        programs: Optional[List[str]] = None,
+        remarks: Optional[str] = None
+    ):
+        self.uid = uid
+        self.source = source  # OFAC, EU, UN
+        self.list_name = list_name
+        self.entity_type = entity_type  # individual, organization, vessel, aircraft
+        self.name = name
+        self.aliases = aliases or []
+        self.countries = countries or []
+        self.programs = programs or []
+        self.remarks = remarks
+
+    def fingerprint(self) -> str:
+        """Digest of everything that affects matching, to detect changed entries"""
+        data = json.dumps([self.entity_type, self.name, sorted(self.aliases), sorted(self.countries), sorted(self.programs)])
+        return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+def match_record(entry: SanctionsEntry, matched_name: str, score: float) -> Dict[str, Any]:
+    """How a match against a list entry is reported in screening results"""
+    return {
+        "list": entry.list_name,
+        "entry_id": entry.uid,
+        "name": entry.name,
+        "matched_name": matched_name,
+        "match_score": round(score, 4),
+        "entity_type": entry.entity_type,
+        "countries": entry.countries,
+        "programs": entry.programs,
+        "remarks": entry.remarks
+    }
+
+def _ofac_value(value: str) -> str:
+    value = value.strip()
+    return "" if value == "-0-" else value
+
+def load_ofac(directory: Path) -> List[SanctionsEntry]:
+    """OFAC SDN in the legacy CSV layout: sdn.csv plus optional alt.csv and add.csv"""
+    entries: Dict[str, SanctionsEntry] = {}
+    with open(directory / OFAC_SDN_FILE, newline="", encoding="utf-8-sig") as f:
+        for row in csv.reader(f):
+            if len(row) < 12 or not _ofac_value(row[1]):
+                continue
+            sdn_type = _ofac_value(row[2]).lower()
+            entries[row[0].strip()] = SanctionsEntry(
+                uid=f"OFAC:{row[0].strip()}",
+                source="OFAC",
+                list_name="OFAC SDN",
+                entity_type=sdn_type or "organization",
+                name=_ofac_value(row[1]),
+                programs=[p for p in _ofac_value(row[3]).replace("] [", "; ").strip("[]").split("; ") if p],
+                remarks=_ofac_value(row[11]) or None
+            )
+
+    if (directory / OFAC_ALT_FILE).exists():
+        with open(directory / OFAC_ALT_FILE, newline="", encoding="utf-8-sig") as f:
+            for row in csv.reader(f):
+                if len(row) >= 4 and row[0].strip() in entries and _ofac_value(row[3]):
+                    entries[row[0].strip()].aliases.append(_ofac_value(row[3]))
+
+    if (directory / OFAC_ADD_FILE).exists():
+        with open(directory / OFAC_ADD_FILE, newline="", encoding="utf-8-sig") as f:
+            for row in csv.reader(f):
+                if len(row) >= 5 and row[0].strip() in entries:
+                    country = _ofac_value(row[4])
+                    entry = entries[row[0].strip()]
+                    if country and country not in entry.countries:
+                        entry.countries.append(country)
+
+    return list(entries.values())
+
+def load_eu(path: Path) -> List[SanctionsEntry]:
+    """EU consolidated financial sanctions list, semicolon-separated CSV (one row per alias/address)"""
+    entries: Dict[str, SanctionsEntry] = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            logical_id = (row.get("Entity_LogicalId") or "").strip()
+            whole_name = (row.get("NameAlias_WholeName") or "").strip()
+            if not logical_id:
+                continue
+
+            entry = entries.get(logical_id)
+            if entry is None:
+                subject_type = (row.get("Entity_SubjectType_ClassificationCode") or row.get("Entity_SubjectType") or "").lower()
+                entry = entries[logical_id] = SanctionsEntry(
+                    uid=f"EU:{logical_id}",
+                    source="EU",
+                    list_name="EU Sanctions",
+                    entity_type="individual" if subject_type in ("person", "p") else "organization",
+                    name=whole_name,
+                    remarks=(row.get("Entity_Remark") or "").strip() or None
+                )
+
+            if whole_name and not entry.name:
+                entry.name = whole_name
+            elif whole_name and whole_name != entry.name and whole_name not in entry.aliases:
+                entry.aliases.append(whole_name)
+
+            programme = (row.get("Entity_Regulation_Programme") or "").strip()
+            if programme and programme not in entry.programs:
+                entry.programs.append(programme)
+            for column in ("Citizenship_CountryIso2Code", "Address_CountryIso2Code"):
+                country = (row.get(column) or "").strip()
+                if country and country not in entry.countries:
+                    entry.countries.append(country)
+
+    return [e for e in entries.values() if e.name]
+
+def _texts(element: ET.Element, path: str) -> List[str]:
+    return [e.text.strip() for e in element.findall(path) if e.text and e.text.strip()]
+
+def load_un(path: Path) -> List[SanctionsEntry]:
+    """UN Security Council consolidated list XML"""
+    entries = []
+    root = ET.parse(path).getroot()
+    for kind, tag in (("individual", "INDIVIDUAL"), ("organization", "ENTITY")):
+        for element in root.iter(tag):
+            name = " ".join(_texts(element, "FIRST_NAME") + _texts(element, "SECOND_NAME") + _texts(element, "THIRD_NAME") + _texts(element, "FOURTH_NAME"))
+            if not name:
+                continue
+            reference = (_texts(element, "REFERENCE_NUMBER") or _texts(element, "DATAID"))[0]
+            countries = _texts(element, "NATIONALITY/VALUE") + _texts(element, f"{tag}_ADDRESS/COUNTRY")
+            entries.append(SanctionsEntry(
+                uid=f"UN:{reference}",
+                source="UN",
+                list_name="UN Consolidated",
+                entity_type=kind,
+                name=name,
+                aliases=_texts(element, f"{tag}_ALIAS/ALIAS_NAME"),
+                countries=list(dict.fromkeys(countries)),
+                programs=_texts(element, "UN_LIST_TYPE"),
+                remarks=(_texts(element, "COMMENTS1") or [None])[0]
+            ))
+    return entries
+
+def list_files_version(directory: Path) -> Optional[str]:
+    """Content hash over every list file present; None when there are none"""
+    digest = hashlib.sha256()
+    found = False
+    for name in LIST_FILES:
+        path = directory / name
+        if path.exists():
+            found = True
+            digest.update(name.encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16] if found else None
+
+class _Postings:
+    """Inverted index from string keys to name ids, frozen into CSR arrays"""
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self._keys = array("i")
+        self._owners = array("i")
+
+    def add(self, name_id: int, keys: Iterable[str]):
+        for key in keys:
+            self._keys.append(self.vocabulary.setdefault(key, len(self.vocabulary)))
+            self._owners.append(name_id)
+
+    def freeze(self):
+        keys = np.frombuffer(self._keys, dtype=np.int32) if self._keys else np.zeros(0, dtype=np.int32)
+        owners = np.frombuffer(self._owners, dtype=np.int32) if self._owners else np.zeros(0, dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        self.owners = owners[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=len(self.vocabulary))))).astype(np.int64)
+        del self._keys, self._owners
+
+    def lookup(self, keys: Iterable[str]) -> List[np.ndarray]:
+        found = []
+        for key in keys:
+            k = self.vocabulary.get(key)
+            if k is not None:
+                found.append(self.owners[self.offsets[k]:self.offsets[k + 1]])
+        return found
+
+class NameIndex:
+    """
+    Character trigram, token and phonetic-key postings over a list of names.
+    A query counts shared keys per name with one bincount per key family
+    and returns the names whose combined overlap is plausible. Postings are
+    packed into numpy arrays so millions of names stay compact.
+    """
+
+    def __init__(self, names: Iterable[str], normalized: bool = False):
+        self.normalized: List[str] = []
+        grams, tokens, phonetics = _Postings(), _Postings(), _Postings()
+        gram_counts = array("i")
+
+        for name_id, name in enumerate(names):
+            normalized_name = name if normalized else normalize_name(name)
+            self.normalized.append(normalized_name)
+            name_grams = ngrams(normalized_name) if normalized_name else []
+            gram_counts.append(len(name_grams))
+            grams.add(name_id, name_grams)
+            name_token_set = set(name_tokens(normalized_name))
+            tokens.add(name_id, name_token_set)
+            phonetics.add(name_id, {phonetic_key(t) for t in name_token_set} - {""})
+
+        for postings in (grams, tokens, phonetics):
+            postings.freeze()
+        self._grams, self._tokens, self._phonetics = grams, tokens, phonetics
+        self.gram_counts = np.array(gram_counts, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def _shared(self, postings: _Postings, keys: Iterable[str]) -> Optional[np.ndarray]:
+        hits = postings.lookup(keys)
+        if not hits:
+            return None
+        return np.bincount(np.concatenate(hits), minlength=len(self)).astype(np.float32)
+
+    def candidates(self, normalized: str, limit: Optional[int] = 20, min_score: float = 0.3) -> List[int]:
+        """Name ids most likely to match, by trigram Dice plus token and phonetic overlap"""
+        if not len(self) or not normalized:
+            return []
+        tokens = set(name_tokens(normalized))
+        query_grams = ngrams(normalized)
+        query_keys = {phonetic_key(t) for t in tokens} - {""}
+
+        score = np.zeros(len(self), dtype=np.float32)
+        shared = self._shared(self._grams, query_grams)
+        if shared is not None:
+            score += 2 * shared / (len(query_grams) + self.gram_counts)
+        shared = self._shared(self._tokens, tokens)
+        if shared is not None:
+            score += 0.25 * shared / len(tokens)
+        shared = self._shared(self._phonetics, query_keys)
+        if shared is not None:
+            score += 0.5 * shared / len(query_keys)
+
+        plausible = np.flatnonzero(score >= min_score)
+        if limit and len(plausible) > limit:
+            plausible = plausible[np.argpartition(score[plausible], -limit)[-limit:]]
+        return plausible.tolist()
+
+class SanctionsIndex:
+    """
+    Immutable in-memory index over the loaded sanctions lists.
+    Every listed name and alias goes into a NameIndex; a query scores only
+    the few best candidates it returns with Jaro-Winkler.
+    """
+
+    def __init__(self, entries: List[SanctionsEntry], version: str, loaded_at: Optional[datetime] = None):
+        self.entries = entries
+        self.version = version
+        self.loaded_at = loaded_at or datetime.utcnow()
+
+        name_entry: List[int] = []
+        self.name_texts: List[str] = []
+        for entry_id, entry in enumerate(entries):
+            seen = set()
+            for text in [entry.name] + entry.aliases:
+                normalized = normalize_name(text)
+                if not normalized or normalized in seen:
+                    continue
+                seen.add(normalized)
+                name_entry.append(entry_id)
+                self.name_texts.append(text)
+
+        self.name_entry = np.array(name_entry, dtype=np.int32)
+        self.names = NameIndex(self.name_texts)
+
+    @property
+    def lists_checked(self) -> List[str]:
+        return sorted({e.source for e in self.entries})
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = defaultdict(int)
+        for entry in self.entries:
+            counts[entry.list_name] += 1
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "entries": dict(counts),
+            "names_indexed": len(self.name_entry),
+            "lists_checked": self.lists_checked
+        }
+
+    def search(
+        self,
+        name: str,
+        threshold: float = 0.85,
+        limit: int = 10,
+        sources: Optional[Collection[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Best-scoring listed names at or above threshold, one match per designated entry"""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        tokens = name_tokens(normalized)
+
+        best: Dict[int, tuple] = {}
+        for name_id in self.names.candidates(normalized):
+            score = name_similarity(tokens, name_tokens(self.names.normalized[name_id]))
+            entry_id = int(self.name_entry[name_id])
+            if sources is not None and self.entries[entry_id].source not in sources:
+                continue
+            if score >= threshold and score > best.get(entry_id, (0.0,))[0]:
+                best[entry_id] = (score, name_id)
+
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [self.match(entry_id, score, name_id) for entry_id, (score, name_id) in ranked]
+
+    def match(self, entry_id: int, score: float, name_id: int) -> Dict[str, Any]:
+        return match_record(self.entries[entry_id], self.name_texts[name_id], score)
+
+class SanctionsListStore:
+    """
+    Holds the current SanctionsIndex. Reloads build a complete new index off
+    the event loop and then replace the reference in one assignment, so a
+    screening always sees either the old lists or the new ones.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory) if directory else None
+        self.index: Optional[SanctionsIndex] = None
+        self._reload_lock = asyncio.Lock()
+
+    def build(self, version: str) -> SanctionsIndex:
+        entries: List[SanctionsEntry] = []
+        if (self.directory / OFAC_SDN_FILE).exists():
+            entries += load_ofac(self.directory)
+        if (self.directory / EU_FILE).exists():
+            entries += load_eu(self.directory / EU_FILE)
+        if (self.directory / UN_FILE).exists():
+            entries += load_un(self.directory / UN_FILE)
+        return SanctionsIndex(entries, version)
+
+    async def reload(self) -> Optional[SanctionsIndex]:
+        """Rebuild from the list directory if its files changed; returns the current index"""
+        if not self.directory or not self.directory.is_dir():
+            return self.index
+
+        async with self._reload_lock:
+            version = await asyncio.to_thread(list_files_version, self.directory)
+            if version is None or (self.index and self.index.version == version):
+                return self.index
+
+            self.index = await asyncio.to_thread(self.build, version)
+            return self.index
+
+
+# Initialize global list store
+sanctions_lists = SanctionsListStore(settings.SANCTIONS_LIST_DIR)
@@ -0,0 +1,262 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from backend.core.config import settings
+from backend.compliance.sanctions_index import SanctionsIndex, sanctions_lists
+
+class ScreeningOutcome:
+    """Matches from every list plus which lists were and were not checked"""
+
+    def __init__(self):
+        self.matches: List[Dict[str, Any]] = []
+        self.lists_checked: List[str] = []
+        self.lists_failed: List[str] = []
+        self.list_version: Optional[str] = None
+
+class SanctionsProvider(ABC):
+    """One source of sanctions matches for a single list (OFAC, EU, UN, ...)"""
+
+    def __init__(self, source: str, deadline: Optional[float] = None):
+        self.source = source
+        self.deadline = deadline or settings.SANCTIONS_PROVIDER_DEADLINE
+
+    def available(self, index: Optional[SanctionsIndex]) -> bool:
+        """Whether this provider can serve its list right now"""
+        return True
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def search(self, name: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        """Matches for name; raises if the list could not be checked"""
+        pass
+
+class LocalListProvider(SanctionsProvider):
+    """
+    Serves a list from the in-memory sanctions index. The registry searches
+    all local lists in one index pass, so search() is only a fallback.
+    """
+
+    def __init__(self, source: str, lists):
+        super().__init__(source)
+        self.lists = lists
+
+    def available(self, index: Optional[SanctionsIndex]) -> bool:
+        return index is not None and self.source in index.lists_checked
+
+    async def search(self, name: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        return self.lists.index.search(name, sources=(self.source,))
+
+class HTTPSanctionsProvider(SanctionsProvider):
+    """
+    Remote screening API behind one pooled client for the life of the app.
+    Requests are hedged: if the first attempt has not answered after
+    hedge_after seconds, or fails with a retryable error, another is sent
+    and the first good response wins.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        url: str,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        max_attempts: int = 3
+    ):
+        super().__init__(source, deadline)
+        self.url = url
+        self.hedge_after = hedge_after or settings.SANCTIONS_HEDGE_AFTER
+        self.max_attempts = max_attempts
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.deadline,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+        return self._client
+
+    async def start(self):
+        self.client
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status in (408, 429)
+        return True
+
+    async def _get(self, params: Dict[str, str]) -> Dict[str, Any]:
+        response = await self.client.get(self.url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def _hedged_get(self, params: Dict[str, str]) -> Dict[str, Any]:
+        in_flight = {asyncio.create_task(self._get(params))}
+        launched = 1
+        error: Optional[Exception] = None
+        try:
+            while in_flight:
+                can_hedge = launched < self.max_attempts
+                done, in_flight = await asyncio.wait(
+                    in_flight,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    if not self._is_retryable(error):
+                        raise error
+
+                # Slow (nothing finished) or failed: send another attempt
+                if can_hedge:
+                    in_flight.add(asyncio.create_task(self._get(params)))
+                    launched += 1
+            raise error
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+class OFACProvider(HTTPSanctionsProvider):
+    """OFAC Specially Designated Nationals (SDN) via the trade.gov screening API"""
+
+    def __init__(self, url: Optional[str] = None, **kwargs):
+        super().__init__("OFAC", url or settings.OFAC_API_URL or "https://api.trade.gov/consolidated_screening_list/search", **kwargs)
+
+    async def search(self, name: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        params = {"name": name, "sources": "SDN"}
+        if country:
+            params["countries"] = country
+
+        data = await self._hedged_get(params)
+        return [
+            {
+                "list": "OFAC SDN",
+                "name": result.get("name"),
+                "match_score": result.get("score", 0),
+                "programs": result.get("programs", []),
+                "remarks": result.get("remarks")
+            }
+            for result in data.get("results", [])
+        ]
+
+class EUSanctionsProvider(HTTPSanctionsProvider):
+    """EU sanctions list"""
+
+    def __init__(self, url: Optional[str] = None, **kwargs):
+        super().__init__("EU", url or settings.EU_SANCTIONS_URL or "https://webgate.ec.europa.eu/fsd/fsf", **kwargs)
+
+    async def search(self, name: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        # Note: This is a placeholder - actual EU API may require authentication
+        data = await self._hedged_get({"name": name})
+        return [
+            {
+                "list": "EU Sanctions",
+                "name": result.get("name"),
+                "match_score": result.get("score", 0),
+                "regulation": result.get("regulation"),
+                "remarks": result.get("remarks")
+            }
+            for result in data.get("results", [])
+        ]
+
+class SanctionsProviderRegistry:
+    """
+    Ordered providers per list. For each list the first available provider
+    is used, so a loaded local copy takes precedence over the remote API.
+    Local lists are searched in one index pass; remote providers run
+    concurrently, each under its own deadline. A list whose provider is
+    unavailable, fails or runs out of time is reported in lists_failed.
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+        self._providers: Dict[str, List[SanctionsProvider]] = {}
+
+    def register(self, provider: SanctionsProvider):
+        self._providers.setdefault(provider.source, []).append(provider)
+
+    @property
+    def sources(self) -> List[str]:
+        return list(self._providers)
+
+    async def start(self):
+        for providers in self._providers.values():
+            for provider in providers:
+                await provider.start()
+
+    async def stop(self):
+        for providers in self._providers.values():
+            for provider in providers:
+                await provider.stop()
+
+    def plan(self, index: Optional[SanctionsIndex]) -> Tuple[List[str], List[SanctionsProvider], List[str]]:
+        """Split the lists into (searched locally, remote providers, unavailable)"""
+        local, remote, unavailable = [], [], []
+        for source, providers in self._providers.items():
+            provider = next((p for p in providers if p.available(index)), None)
+            if provider is None:
+                unavailable.append(source)
+            elif isinstance(provider, LocalListProvider):
+                local.append(source)
+            else:
+                remote.append(provider)
+        return local, remote, unavailable
+
+    def screen_local(self, name: str, index: Optional[SanctionsIndex]) -> ScreeningOutcome:
+        """Synchronous screening for when plan() has no remote providers"""
+        local, remote, unavailable = self.plan(index)
+        outcome = ScreeningOutcome()
+        if local:
+            outcome.matches = index.search(name, threshold=self.threshold, sources=local)
+            outcome.lists_checked = local
+            outcome.list_version = index.version
+        outcome.lists_failed = unavailable + [p.source for p in remote]
+        return outcome
+
+    async def _search_remote(self, provider: SanctionsProvider, name: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(provider.search(name, country), timeout=provider.deadline)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no answer within {provider.deadline}s")
+
+    async def screen(self, name: str, country: Optional[str], index: Optional[SanctionsIndex]) -> ScreeningOutcome:
+        local, remote, unavailable = self.plan(index)
+        outcome = self.screen_local(name, index) if local else ScreeningOutcome()
+        outcome.lists_failed = list(unavailable)
+
+        results = await asyncio.gather(
+            *(self._search_remote(p, name, country) for p in remote),
+            return_exceptions=True
+        )
+        for provider, result in zip(remote, results):
+            if isinstance(result, BaseException):
+                print(f"{provider.source} sanctions screening error: {result}")
+                outcome.lists_failed.append(provider.source)
+            else:
+                outcome.matches.extend(result)
+                outcome.lists_checked.append(provider.source)
+
+        return outcome
+
+
+# Initialize global registry; local copies of a list win over its remote API
+sanctions_providers = SanctionsProviderRegistry()
+sanctions_providers.register(LocalListProvider("OFAC", sanctions_lists))
+sanctions_providers.register(OFACProvider())
+sanctions_providers.register(LocalListProvider("EU", sanctions_lists))
+sanctions_providers.register(EUSanctionsProvider())
+sanctions_providers.register(LocalListProvider("UN", sanctions_lists))
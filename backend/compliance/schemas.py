@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
@@ -13,6 +13,20 @@ class AuditLogResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AuditChainBreak(BaseModel):
+    sequence: Optional[int]
+    log_id: Optional[str]
+    reason: str
+
+class AuditChainVerification(BaseModel):
+    chain_valid: bool
+    mode: str  # incremental, full
+    verified_from: int  # First sequence checked
+    verified_through: Optional[int]  # Last sequence known good
+    entries_checked: int
+    broken_at: Optional[AuditChainBreak] = None
+    checked_at: datetime
+
 class ComplianceAlertResponse(BaseModel):
     id: str
     alert_type: str
@@ -21,11 +35,17 @@ class ComplianceAlertResponse(BaseModel):
     transaction_id: Optional[str]
     description: str
     status: str
+    occurrence_count: int = 1  # Times this alert fired within the aggregation window
+    last_seen_at: Optional[datetime] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class ComplianceAlertPage(BaseModel):
+    alerts: List[ComplianceAlertResponse]
+    next_cursor: Optional[str]  # Pass back as `cursor` for the next page; null on the last page
+
 class KYCVerificationRequest(BaseModel):
     user_id: str
     full_name: str
@@ -33,6 +53,28 @@ class KYCVerificationRequest(BaseModel):
     nationality: str
     id_type: str
     id_number: str
+    priority: str = Field("standard", pattern="^(standard|premium)$")
+
+class KYCBatchVerificationRequest(BaseModel):
+    requests: List[KYCVerificationRequest] = Field(..., min_length=1, max_length=100_000)
+
+class KYCJobResponse(BaseModel):
+    id: str
+    kyc_record_id: str
+    user_id: str
+    priority: int  # 0 premium, 1 standard
+    status: str  # queued, running, completed, failed
+    stage: Optional[str]
+    progress: int
+    result: Optional[Dict[str, Any]]
+    attempts: int
+    last_error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
 
 class SanctionCheckResult(BaseModel):
     entity_name: str
@@ -42,17 +84,50 @@ class SanctionCheckResult(BaseModel):
     matches: List[Dict[str, Any]]
     checked_at: datetime
     lists_checked: List[str]
+    lists_failed: List[str] = []  # Lists that could not be checked (provider down or too slow)
+    list_version: Optional[str] = None  # Local sanctions list version screened against
+    check_id: Optional[str] = None  # SanctionCheck row, once recorded
+    cache_hit: bool = False  # Reused an earlier screening; checked_at is when it ran
 
 class SanctionScreeningRequest(BaseModel):
     name: str
     country: Optional[str] = None
     entity_type: str = "individual"
 
+class SanctionBatchScreeningRequest(BaseModel):
+    entities: List[SanctionScreeningRequest] = Field(..., min_length=1, max_length=500_000)
+
+class SanctionBatchJobResponse(BaseModel):
+    id: str
+    status: str  # running, completed, failed, cancelled
+    total: int
+    processed: int
+    risk_counts: Optional[Dict[str, int]]
+    list_version: Optional[str]
+    created_by: Optional[str]
+    started_at: datetime
+    finished_at: Optional[datetime]
+    error: Optional[str]
+    
+    class Config:
+        from_attributes = True
+
+class MonitoringReplayRequest(BaseModel):
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    record: bool = False  # Write the alerts raised; otherwise only count them
+
 class AuditLogExportRequest(BaseModel):
     start_date: datetime
     end_date: datetime
     format: str = "json"  # json or csv
 
+class AuditLogStreamExportRequest(BaseModel):
+    start_date: datetime
+    end_date: datetime
+    format: str = Field("ndjson", pattern="^(ndjson|csv)$")
+    gzip: bool = False
+
 class AuditLogExportResponse(BaseModel):
     data: str
     format: str
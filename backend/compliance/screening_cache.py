@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from backend.core.config import settings
+from backend.compliance.name_matching import normalize_name
+from backend.compliance.schemas import SanctionCheckResult
+
+class ScreeningResultCache:
+    """
+    Bounded LRU of screening results with a TTL.
+    Keys are the normalized name, country and entity type plus the version of
+    the sanctions lists screened against. The first lookup under a new list
+    version drops every older entry at once. Hits return the original
+    result, including when it was checked.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, SanctionCheckResult]]" = OrderedDict()
+        self._version: Optional[str] = None
+        # Bulk screening reads and writes from worker threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, name: str, country: Optional[str], entity_type: str) -> Tuple[str, str, str]:
+        return (normalize_name(name), (country or "").strip().upper(), entity_type.strip().lower())
+
+    def _switch_version(self, version: str):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, key: Tuple[str, str, str]) -> Optional[SanctionCheckResult]:
+        with self._lock:
+            self._switch_version(version)
+            cached = self._entries.get(key)
+            if cached is None or cached[0] < time.monotonic():
+                if cached is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, version: str, key: Tuple[str, str, str], result: SanctionCheckResult):
+        with self._lock:
+            self._switch_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Initialize global cache
+screening_cache = ScreeningResultCache(settings.SANCTIONS_CACHE_SIZE, settings.SANCTIONS_CACHE_TTL)
@@ -1,10 +1,30 @@
-from typing import List, Optional
-from sqlalchemy import select, desc
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, desc, func, delete, tuple_, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.compliance.models import KYCRecord, AuditLog, ComplianceAlert
+from backend.compliance.models import KYCRecord, AuditLog, ComplianceAlert, ComplianceAlertCount, SanctionCheck
+from backend.compliance.name_matching import name_keys
+import base64
 import uuid
 from datetime import datetime
 
+def alert_dedup_key(alert_type: str, user_id: Optional[str], transaction_id: Optional[str]) -> str:
+    return f"{alert_type}|{user_id or ''}|{transaction_id or ''}"
+
+def encode_alert_cursor(alert: ComplianceAlert) -> str:
+    """Opaque keyset position just after `alert` in newest-first order"""
+    raw = f"{alert.created_at.isoformat()}|{alert.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_alert_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, alert_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), alert_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
 class ComplianceService:
     """Service for compliance operations"""
     
@@ -63,21 +83,89 @@ class ComplianceService:
             severity=severity,
             user_id=user_id,
             transaction_id=transaction_id,
-            description=description
+            description=description,
+            status="open",
+            dedup_key=alert_dedup_key(alert_type, user_id, transaction_id),
+            occurrence_count=1
         )
         db.add(alert)
         await db.flush()
+        await ComplianceService.adjust_open_alert_counts(db, {severity: 1})
         return alert
     
     @staticmethod
-    async def get_open_alerts(db: AsyncSession) -> List[ComplianceAlert]:
-        """Get open compliance alerts"""
+    async def adjust_open_alert_counts(db: AsyncSession, deltas: Dict[str, int]):
+        """
+        Apply open-alert count changes per severity in the caller's transaction.
+        Each change is one upsert, so concurrent first alerts of a severity
+        cannot both insert its row; a decrement never creates a negative count.
+        """
+        insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        for severity, delta in deltas.items():
+            if not delta:
+                continue
+            await db.execute(
+                insert(ComplianceAlertCount)
+                .values(severity=severity, open_count=max(delta, 0))
+                .on_conflict_do_update(
+                    index_elements=[ComplianceAlertCount.severity],
+                    set_={"open_count": ComplianceAlertCount.open_count + delta}
+                )
+            )
+    
+    @staticmethod
+    async def get_open_alert_counts(db: AsyncSession) -> Dict[str, int]:
+        """Open alerts per severity, read from the maintained counts"""
+        result = await db.execute(select(ComplianceAlertCount.severity, ComplianceAlertCount.open_count))
+        return {severity: count for severity, count in result.all() if count}
+    
+    @staticmethod
+    async def rebuild_open_alert_counts(db: AsyncSession) -> Dict[str, int]:
+        """Recount open alerts per severity from the alerts table"""
         result = await db.execute(
-            select(ComplianceAlert)
+            select(ComplianceAlert.severity, func.count())
             .where(ComplianceAlert.status == "open")
-            .order_by(desc(ComplianceAlert.created_at))
+            .group_by(ComplianceAlert.severity)
         )
-        return result.scalars().all()
+        counts = dict(result.all())
+        await db.execute(delete(ComplianceAlertCount))
+        db.add_all(ComplianceAlertCount(severity=severity, open_count=count) for severity, count in counts.items())
+        await db.flush()
+        return counts
+    
+    @staticmethod
+    async def list_alerts(
+        db: AsyncSession,
+        status: str = "open",
+        severity: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[ComplianceAlert], Optional[str]]:
+        """One newest-first page of alerts and the cursor for the next page, if any"""
+        query = (
+            select(ComplianceAlert)
+            .where(ComplianceAlert.status == status)
+            .order_by(desc(ComplianceAlert.created_at), desc(ComplianceAlert.id))
+            .limit(limit + 1)
+        )
+        if severity:
+            query = query.where(ComplianceAlert.severity == severity)
+        if alert_type:
+            query = query.where(ComplianceAlert.alert_type == alert_type)
+        if user_id:
+            query = query.where(ComplianceAlert.user_id == user_id)
+        if cursor:
+            query = query.where(
+                tuple_(ComplianceAlert.created_at, ComplianceAlert.id) < tuple_(*decode_alert_cursor(cursor))
+            )
+        
+        alerts = (await db.execute(query)).scalars().all()
+        if len(alerts) > limit:
+            alerts = alerts[:limit]
+            return alerts, encode_alert_cursor(alerts[-1])
+        return alerts, None
     
     @staticmethod
     async def resolve_alert(
@@ -87,14 +175,55 @@ class ComplianceService:
     ) -> Optional[ComplianceAlert]:
         """Resolve compliance alert"""
         result = await db.execute(
-            select(ComplianceAlert).where(ComplianceAlert.id == alert_id)
+            select(ComplianceAlert).where(ComplianceAlert.id == alert_id).with_for_update()
         )
         alert = result.scalar_one_or_none()
         
         if alert:
+            if alert.status == "open":
+                await ComplianceService.adjust_open_alert_counts(db, {alert.severity: -1})
             alert.status = "resolved"
             alert.resolved_by = resolved_by
             alert.resolved_at = datetime.utcnow()
             await db.flush()
         
         return alert
+    
+    @staticmethod
+    async def get_batch_sanction_hits(
+        db: AsyncSession,
+        batch_id: str,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[SanctionCheck]:
+        """Get non-clear sanction checks recorded by a bulk screening batch"""
+        result = await db.execute(
+            select(SanctionCheck)
+            .where(SanctionCheck.batch_id == batch_id)
+            .where(SanctionCheck.risk_level != "clear")
+            .order_by(SanctionCheck.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return result.scalars().all()
+    
+    @staticmethod
+    async def get_sanction_checks_for_name(
+        db: AsyncSession,
+        name: str,
+        limit: int = 100
+    ) -> List[SanctionCheck]:
+        """Earlier checks of the same name in any word order, spelling variant or accent folding"""
+        keys = name_keys(name)
+        if not keys["name_sorted"]:
+            return []
+        result = await db.execute(
+            select(SanctionCheck)
+            .where(or_(
+                SanctionCheck.name_sorted == keys["name_sorted"],
+                SanctionCheck.name_phonetic == keys["name_phonetic"]
+            ))
+            .order_by(desc(SanctionCheck.created_at))
+            .limit(limit)
+        )
+        return result.scalars().all()
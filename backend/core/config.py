@@ -18,8 +18,53 @@ class Settings(BaseSettings):
     
     # API Keys
     PI_API_KEY: str = ""
+    PI_API_BASE_URL: str = ""  # defaults to https://api.minepi.com; point at the simulator for load tests
     FX_API_KEY: str = ""
     
+    # Pi payment saga
+    PI_SAGA_WORKERS: int = 4
+    PI_SAGA_MAX_ATTEMPTS: int = 8
+    
+    # FX rate history (empty disables persistence)
+    FX_HISTORY_PATH: str = "./data/fx_history"
+    
+    # Sealed audit log segments (empty disables archiving); must be shared by all workers
+    AUDIT_ARCHIVE_PATH: str = "./data/audit_archive"
+    
+    # Sanctions screening
+    OFAC_API_URL: str = ""
+    EU_SANCTIONS_URL: str = ""
+    SANCTIONS_LIST_DIR: str = "./data/sanctions"  # sdn.csv, alt.csv, add.csv, eu_sanctions.csv, un_consolidated.xml
+    SANCTIONS_PROVIDER_DEADLINE: float = 3.0  # seconds per remote list, hedges included
+    SANCTIONS_HEDGE_AFTER: float = 0.5  # seconds before a duplicate remote request is sent
+    SANCTIONS_CACHE_SIZE: int = 100_000  # screening results kept in memory
+    SANCTIONS_CACHE_TTL: float = 86400.0  # seconds; list updates invalidate earlier
+    SANCTIONS_RESCREEN_BASELINE: str = "./data/sanctions_rescreen_baseline.json"  # list entry fingerprints at the last customer rescreen
+    
+    # Transaction monitoring (rule windows are per process; thresholds assume a single worker)
+    AML_REPORTING_THRESHOLD: float = 10_000.0  # amounts just below this count towards structuring
+    
+    # KYC verification pipeline
+    KYC_WORKERS: int = 8
+    KYC_PREMIUM_WORKERS: int = 2  # extra workers that only take premium onboarding jobs
+    KYC_MAX_ATTEMPTS: int = 5
+    
+    # Compliance alerts
+    ALERT_AGGREGATION_WINDOW: float = 3600.0  # seconds a repeat folds into the open alert for the same type/user/transaction
+    ALERT_FLUSH_INTERVAL: float = 1.0  # seconds between aggregated alert writes
+    
+    # Rate limiting
+    RATE_LIMIT_BACKEND: str = "local"  # local (per process) or redis (shared by all workers and pods)
+    REDIS_URL: str = ""
+    RATE_LIMIT_LEASE_FRACTION: float = 0.02  # share of a limit a process takes from Redis per round trip
+    RATE_LIMIT_BACKEND_TIMEOUT: float = 0.1  # seconds
+    RATE_LIMIT_FAILURE_POLICY: str = "open"  # open: per-process limits while Redis is down; closed: refuse requests
+    
+    # Web application firewall
+    WAF_MAX_BODY_SIZE: int = 1_048_576  # bytes of request body buffered and inspected
+    WAF_OVERSIZE_ACTION: str = "reject"  # reject: refuse larger bodies with 413; pass: check only their first WAF_MAX_BODY_SIZE bytes
+    WAF_BATCH_MAX_BODY_SIZE: int = 67_108_864  # bytes allowed on the batch endpoints, which cap their item counts themselves
+    
     # CORS
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",
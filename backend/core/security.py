@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import hashlib
+import hmac
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -17,6 +19,14 @@ def get_password_hash(password: str) -> str:
     """Hash password"""
     return pwd_context.hash(password)
 
+def sign_message(message: str) -> str:
+    """Sign message with the application secret (HMAC-SHA256)"""
+    return hmac.new(settings.SECRET_KEY.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+def verify_signature(message: str, signature: str) -> bool:
+    """Verify a signature produced by sign_message"""
+    return hmac.compare_digest(sign_message(message), signature or "")
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -44,7 +44,7 @@ class Transaction(Base):
     to_address = Column(String)
     reference = Column(String)
     metadata = Column(String)  # JSON string
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     account = relationship("Account", back_populates="transactions")
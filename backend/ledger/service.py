@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.ledger.models import Account, Transaction, TransactionStatus
 from backend.ledger.schemas import AccountCreate, TransactionCreate
+from backend.compliance.monitoring import transaction_monitor
 import uuid
 
 class LedgerService:
@@ -53,6 +54,8 @@ class LedgerService:
         )
         db.add(transaction)
         await db.flush()
+        # Observed by the AML rules once the caller commits
+        await transaction_monitor.check_transaction(db, transaction)
         return transaction
     
     @staticmethod
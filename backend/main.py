@@ -5,13 +5,45 @@ import uvicorn
 
 from backend.api import ledger, compliance, payments, websocket
 from backend.core.config import settings
-from backend.core.database import init_db
+from backend.core.database import init_db, AsyncSessionLocal
+from backend.payments.outbox import pi_payment_saga
+from backend.compliance.audit_log import audit_log_service
+from backend.compliance.sanctions_index import sanctions_lists
+from backend.compliance.sanctions_providers import sanctions_providers
+from backend.compliance.delta_rescreen import delta_rescreener
+from backend.compliance.service import ComplianceService
+from backend.compliance.alert_aggregator import alert_aggregator
+from backend.compliance.kyc_pipeline import kyc_pipeline
+from backend.compliance.name_backfill import name_key_backfill
+from backend.security.rate_limiter import RateLimitMiddleware, rate_limiter
+from backend.security.waf import WAFMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database and services on startup"""
     await init_db()
+    async with AsyncSessionLocal() as session:
+        # Seed the open-alert counts once; afterwards every write keeps them current
+        if not await ComplianceService.get_open_alert_counts(session):
+            await ComplianceService.rebuild_open_alert_counts(session)
+            await session.commit()
+    await audit_log_service.appender.start()
+    await alert_aggregator.start()
+    name_key_backfill.submit()  # Name keys for rows written before they were stored
+    await sanctions_lists.reload()
+    delta_rescreener.submit()  # Catch up on list changes made while we were down
+    await sanctions_providers.start()
+    await pi_payment_saga.start()
+    await kyc_pipeline.start(notifier=websocket.send_notification)  # Jobs left running by a previous process are retaken once their lease expires
     yield
+    await kyc_pipeline.stop()
+    await name_key_backfill.stop()
+    await pi_payment_saga.stop()
+    await delta_rescreener.stop()
+    await alert_aggregator.stop()
+    await sanctions_providers.stop()
+    await rate_limiter.close()
+    await audit_log_service.appender.stop()
 
 app = FastAPI(
     title="TEOS Bankchain API",
@@ -20,6 +52,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Requests pass CORS, then rate limiting, then the WAF (the middleware added
+# last runs first), so 429 and WAF responses still carry CORS headers
+app.add_middleware(WAFMiddleware)
+
+# Rate limiting (shared across workers when RATE_LIMIT_BACKEND=redis)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, fx=payments.fx_service)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,153 @@
+from typing import Dict, Optional, Sequence, Tuple
+from datetime import datetime, timezone
+from pathlib import Path
+import fcntl
+import os
+import re
+import threading
+import numpy as np
+
+# One fixed-width record per snapshot: microseconds since epoch, units per base currency
+RECORD_DTYPE = np.dtype([("ts", "<i8"), ("rate", "<f8")])
+
+# ISO 4217 codes; anything else is never turned into a file name
+CURRENCY_CODE = re.compile(r"[A-Z]{3}")
+
+def to_micros(moment: datetime) -> int:
+    """Naive datetimes are treated as UTC, matching the rest of the backend"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1_000_000)
+
+class _Series:
+    """Append-only rate series for one currency, memory-mapped for reads"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._map: Optional[np.memmap] = None
+        self._mapped_size = 0
+
+    def records(self) -> np.ndarray:
+        """Current records, remapping only when the file has grown"""
+        size = self.path.stat().st_size if self.path.exists() else 0
+        size -= size % RECORD_DTYPE.itemsize  # ignore a torn trailing write
+        if size == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        if self._map is None or size != self._mapped_size:
+            self._map = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(size // RECORD_DTYPE.itemsize,))
+            self._mapped_size = size
+        return self._map
+
+    def append(self, ts: int, rate: float) -> bool:
+        """
+        Append one record unless it is not newer than the file's last one.
+        Every worker appends to the same file, so the check reads the last
+        record on disk under an exclusive lock rather than trusting a cache.
+        """
+        record = np.array([(ts, rate)], dtype=RECORD_DTYPE)
+        with open(self.path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                size = f.seek(0, os.SEEK_END)
+                # Drop a torn trailing write so this record starts on a record boundary
+                torn = size % RECORD_DTYPE.itemsize
+                if torn:
+                    size -= torn
+                    f.truncate(size)
+                if size:
+                    f.seek(size - RECORD_DTYPE.itemsize)
+                    last = np.frombuffer(f.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)[0]
+                    # Timestamps must be strictly increasing so lookups can binary search
+                    if ts <= int(last["ts"]):
+                        return False
+                f.write(record.tobytes())
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return True
+
+class FXRateHistory:
+    """
+    Persistent time series of FX snapshots, one binary file per currency.
+    All rates are quoted as units of the currency per one unit of the base currency.
+    """
+
+    def __init__(self, root: str, base_currency: str = "USD"):
+        self.base_currency = base_currency
+        self.root = Path(root) / base_currency
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._series: Dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, currency: str) -> _Series:
+        """Series for a currency that has been recorded, possibly by another process"""
+        series = self._series.get(currency)
+        if series is None:
+            path = self.root / f"{currency}.bin"
+            if not CURRENCY_CODE.fullmatch(currency) or not path.exists():
+                raise ValueError(f"Currency {currency} not supported")
+            with self._lock:
+                series = self._series.setdefault(currency, _Series(path))
+        return series
+
+    def append_snapshot(self, fetched_at: datetime, rates: Dict[str, float]) -> int:
+        """Persist one fetched snapshot; returns the number of series appended to"""
+        ts = to_micros(fetched_at)
+        written = 0
+        with self._lock:
+            for currency, rate in rates.items():
+                if currency == self.base_currency or not CURRENCY_CODE.fullmatch(currency):
+                    continue
+                series = self._series.setdefault(currency, _Series(self.root / f"{currency}.bin"))
+                written += series.append(ts, float(rate))
+        return written
+
+    def currencies(self) -> Tuple[str, ...]:
+        return tuple(sorted(p.stem for p in self.root.glob("*.bin")))
+
+    def _base_rates_as_of(self, currency: str, ts: np.ndarray) -> np.ndarray:
+        """Vectorized as-of lookup of base rates; NaN before the first snapshot"""
+        if currency == self.base_currency:
+            return np.ones(len(ts), dtype=np.float64)
+
+        records = self._get_series(currency).records()
+        result = np.full(len(ts), np.nan, dtype=np.float64)
+        if len(records) == 0:
+            return result
+
+        pos = np.searchsorted(records["ts"], ts, side="right") - 1
+        known = pos >= 0
+        result[known] = records["rate"][pos[known]]
+        return result
+
+    def rate_as_of(self, from_currency: str, to_currency: str, moment: datetime) -> Optional[float]:
+        """Cross rate that was in effect at the given moment"""
+        ts = np.array([to_micros(moment)], dtype=np.int64)
+        rate = self._base_rates_as_of(to_currency, ts)[0] / self._base_rates_as_of(from_currency, ts)[0]
+        return None if np.isnan(rate) else float(rate)
+
+    def as_of_join(
+        self,
+        timestamps: Sequence[datetime],
+        from_currencies: Sequence[str],
+        to_currencies: Sequence[str]
+    ) -> np.ndarray:
+        """
+        Bulk as-of join: the cross rate in effect at each timestamp.
+        Each currency's series is searched once for all of its rows; rows
+        with no earlier snapshot come back as NaN, and a currency that was
+        never recorded raises ValueError.
+        """
+        ts = np.fromiter((to_micros(t) for t in timestamps), dtype=np.int64, count=len(timestamps))
+        from_codes = np.asarray(from_currencies, dtype=object)
+        to_codes = np.asarray(to_currencies, dtype=object)
+
+        from_rates = np.empty(len(ts), dtype=np.float64)
+        to_rates = np.empty(len(ts), dtype=np.float64)
+
+        for codes, out in ((from_codes, from_rates), (to_codes, to_rates)):
+            for currency in set(codes.tolist()):
+                mask = codes == currency
+                out[mask] = self._base_rates_as_of(currency, ts[mask])
+
+        return to_rates / from_rates
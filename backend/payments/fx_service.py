@@ -1,37 +1,122 @@
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple
+from decimal import Decimal, ROUND_HALF_EVEN, localcontext
+import asyncio
 import httpx
+import numpy as np
 from backend.core.config import settings
+from backend.payments.fx_history import FXRateHistory
 from datetime import datetime, timedelta
 
+# ISO 4217 minor-unit exponents; anything not listed settles in cents
+MINOR_UNITS: Dict[str, int] = {
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0,
+    "KRW": 0, "PYG": 0, "RWF": 0, "UGX": 0, "VND": 0, "VUV": 0, "XAF": 0,
+    "XOF": 0, "XPF": 0,
+    "PI": 7,
+}
+DEFAULT_MINOR_UNITS = 2
+
+# Amounts must fit the ledger's Numeric(20, 8) columns
+MAX_AMOUNT = Decimal(10) ** 12
+
+def minor_units(currency: str) -> int:
+    """Number of decimal places a currency settles in"""
+    return MINOR_UNITS.get(currency, DEFAULT_MINOR_UNITS)
+
+class CrossRateTable:
+    """
+    Immutable cross-rate matrix derived from a single base-currency fetch.
+    matrix[i, j] is the amount of currency j bought by one unit of currency i.
+    """
+
+    def __init__(self, base_currency: str, base_rates: Dict[str, float], fetched_at: datetime):
+        rates = dict(base_rates)
+        rates[base_currency] = 1.0
+
+        self.base_currency = base_currency
+        self.fetched_at = fetched_at
+        self.currencies: Tuple[str, ...] = tuple(sorted(rates))
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(self.currencies)}
+
+        # Units of each currency per one unit of the base currency
+        per_base = np.array([rates[code] for code in self.currencies], dtype=np.float64)
+
+        # rate(i -> j) = per_base[j] / per_base[i]
+        self.matrix = per_base[np.newaxis, :] / per_base[:, np.newaxis]
+        self.matrix.setflags(write=False)
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.index
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """O(1) lookup of the cross rate for a currency pair"""
+        try:
+            return float(self.matrix[self.index[from_currency], self.index[to_currency]])
+        except KeyError as e:
+            raise ValueError(f"Currency {e.args[0]} not supported")
+
+    def indices(self, currencies: Sequence[str]) -> np.ndarray:
+        """Map currency codes to matrix indices"""
+        try:
+            return np.fromiter((self.index[c] for c in currencies), dtype=np.intp, count=len(currencies))
+        except KeyError as e:
+            raise ValueError(f"Currency {e.args[0]} not supported")
+
+    def rates_for(self, base_currency: str) -> Dict[str, float]:
+        """Row of the matrix as a {currency: rate} mapping"""
+        if base_currency not in self.index:
+            raise ValueError(f"Currency {base_currency} not supported")
+        row = self.matrix[self.index[base_currency]]
+        return dict(zip(self.currencies, row.tolist()))
+
 class FXService:
     """Service for foreign exchange rates"""
-    
+
     BASE_URL = "https://api.exchangerate-api.com/v4/latest"
-    
-    def __init__(self):
-        self.cache = {}
-        self.cache_expiry = {}
-    
-    async def get_rates(self, base_currency: str = "USD") -> Dict[str, float]:
-        """Get FX rates for base currency"""
-        
-        # Check cache
-        if base_currency in self.cache:
-            if datetime.now() < self.cache_expiry.get(base_currency, datetime.min):
-                return self.cache[base_currency]
-        
-        # Fetch fresh rates
+    BASE_CURRENCY = "USD"
+    CACHE_TTL = timedelta(minutes=5)
+
+    def __init__(self, history: Optional[FXRateHistory] = None):
+        self._table: Optional[CrossRateTable] = None
+        self._refresh_lock = asyncio.Lock()
+        self.history = history
+
+    async def get_table(self) -> CrossRateTable:
+        """Get the current cross-rate table, refreshing it when stale"""
+        table = self._table
+        if table and datetime.utcnow() < table.fetched_at + self.CACHE_TTL:
+            return table
+
+        # Only one coroutine refetches; the others wait and reuse its result
+        async with self._refresh_lock:
+            table = self._table
+            if table and datetime.utcnow() < table.fetched_at + self.CACHE_TTL:
+                return table
+            return await self._refresh()
+
+    async def _refresh(self) -> CrossRateTable:
+        """Fetch base rates and atomically swap in a rebuilt cross-rate table"""
         async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.BASE_URL}/{base_currency}")
+            response = await client.get(f"{self.BASE_URL}/{self.BASE_CURRENCY}")
             response.raise_for_status()
             data = response.json()
-        
-        # Cache for 5 minutes
-        self.cache[base_currency] = data["rates"]
-        self.cache_expiry[base_currency] = datetime.now() + timedelta(minutes=5)
-        
-        return data["rates"]
-    
+
+        table = CrossRateTable(self.BASE_CURRENCY, data["rates"], datetime.utcnow())
+
+        # Readers either see the old table or the new one, never a partial build
+        self._table = table
+
+        if self.history:
+            await asyncio.to_thread(self.history.append_snapshot, table.fetched_at, data["rates"])
+
+        return table
+
+    async def get_rates(self, base_currency: str = "USD") -> Dict[str, float]:
+        """Get FX rates for base currency"""
+        table = await self.get_table()
+        return table.rates_for(base_currency)
+
     async def convert(
         self,
         amount: float,
@@ -39,13 +124,58 @@ class FXService:
         to_currency: str
     ) -> float:
         """Convert amount between currencies"""
-        
+
         if from_currency == to_currency:
             return amount
-        
-        rates = await self.get_rates(from_currency)
-        
-        if to_currency not in rates:
-            raise ValueError(f"Currency {to_currency} not supported")
-        
-        return amount * rates[to_currency]
+
+        table = await self.get_table()
+
+        return amount * table.rate(from_currency, to_currency)
+
+    def rate_as_of(self, from_currency: str, to_currency: str, moment: datetime) -> Optional[float]:
+        """Historical cross rate in effect at the given moment"""
+        if not self.history:
+            raise ValueError("FX rate history is not enabled")
+        return self.history.rate_as_of(from_currency, to_currency, moment)
+
+    async def convert_batch(
+        self,
+        amounts: Sequence[Decimal],
+        from_currencies: Sequence[str],
+        to_currencies: Sequence[str]
+    ) -> Tuple[List[Decimal], List[float]]:
+        """
+        Convert many amounts in one vectorized pass over the cross-rate table.
+        Rates are gathered from the table in one vectorized pass; each amount is
+        then multiplied and rounded half-even to the minor unit of the target
+        currency in Decimal, so rounding is exact. Amounts (or results) whose
+        magnitude reaches MAX_AMOUNT are rejected. Returns (converted_amounts, rates).
+        """
+        if not (len(amounts) == len(from_currencies) == len(to_currencies)):
+            raise ValueError("amounts, from_currencies and to_currencies must have the same length")
+
+        if not amounts:
+            return [], []
+
+        table = await self.get_table()
+
+        from_idx = table.indices(from_currencies)
+        to_idx = table.indices(to_currencies)
+        rates = table.matrix[from_idx, to_idx]
+
+        rate_list = rates.tolist()
+        quanta = {e: Decimal(1).scaleb(-e) for e in set(MINOR_UNITS.values()) | {DEFAULT_MINOR_UNITS}}
+
+        converted = []
+        with localcontext() as context:
+            # Wide enough that amount * Decimal(rate) is exact; the quantize is the only rounding
+            context.prec = 1_000
+            for position, (amount, rate, to_currency) in enumerate(zip(amounts, rate_list, to_currencies)):
+                amount = Decimal(amount)
+                if not amount.is_finite() or abs(amount) >= MAX_AMOUNT:
+                    raise ValueError(f"Amount at position {position} is out of range")
+                value = (amount * Decimal(rate)).quantize(quanta[minor_units(to_currency)], rounding=ROUND_HALF_EVEN)
+                if abs(value) >= MAX_AMOUNT:
+                    raise ValueError(f"Converted amount at position {position} is out of range")
+                converted.append(value)
+        return converted, rate_list
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Numeric, Integer, DateTime, Text, JSON, Index, ForeignKey, Enum as SQLEnum
+from datetime import datetime
+import enum
+from backend.core.database import Base
+
+class PiPaymentState(str, enum.Enum):
+    PENDING = "pending"  # recorded locally, not yet sent to Pi
+    CREATED = "created"  # payment exists on the Pi side
+    APPROVED = "approved"  # approved, waiting for the blockchain txid
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class PiPaymentOutbox(Base):
+    """Outbox record driving one Pi payment through create -> approve -> complete"""
+    __tablename__ = "pi_payment_outbox"
+
+    id = Column(String, primary_key=True)
+    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=False)
+    user_id = Column(String)
+    state = Column(SQLEnum(PiPaymentState), default=PiPaymentState.PENDING, nullable=False)
+    amount = Column(Numeric(20, 8), nullable=False)
+    memo = Column(String)
+    payment_metadata = Column(JSON)
+    pi_payment_id = Column(String, index=True)
+    txid = Column(String)
+    create_requested_at = Column(DateTime)  # set before the first create call; retries look the payment up on Pi first
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = Column(DateTime)  # lease held by the worker currently driving this row
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_pi_payment_outbox_due", "state", "next_attempt_at"),
+    )
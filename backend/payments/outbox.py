@@ -0,0 +1,292 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from decimal import Decimal
+import asyncio
+import json
+import uuid
+import httpx
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.ledger.models import Transaction, TransactionType, TransactionStatus
+from backend.ledger.service import LedgerService
+from backend.payments.models import PiPaymentOutbox, PiPaymentState
+from backend.payments.pi_service import PiNetworkService
+from backend.compliance.monitoring import transaction_monitor
+
+ACTIVE_STATES = (PiPaymentState.PENDING, PiPaymentState.CREATED, PiPaymentState.APPROVED)
+
+# Ledger status mirrored from each saga state
+LEDGER_STATUS = {
+    PiPaymentState.PENDING: TransactionStatus.PENDING,
+    PiPaymentState.CREATED: TransactionStatus.PENDING,
+    PiPaymentState.APPROVED: TransactionStatus.APPROVED,
+    PiPaymentState.COMPLETED: TransactionStatus.COMPLETED,
+    PiPaymentState.FAILED: TransactionStatus.FAILED,
+}
+
+class PiPaymentSaga:
+    """
+    Transactional outbox worker pool for Pi payments.
+    Requests commit a ledger row and an outbox row together and return; workers
+    then drive each payment through create -> approve -> complete against Pi,
+    retrying with exponential backoff. No DB session is held during Pi calls.
+    A worker renews its lease on a row before every Pi call and stops driving
+    the row if another worker has taken it over. A create that may already
+    have reached Pi is looked up by outbox id before it is sent again, so a
+    retry never opens a second Pi payment.
+    """
+
+    def __init__(
+        self,
+        pi_service: PiNetworkService,
+        workers: int = 4,
+        max_attempts: int = 8,
+        batch_size: int = 10,
+        lease: timedelta = timedelta(seconds=60),
+        poll_interval: float = 1.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0
+    ):
+        self.pi_service = pi_service
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        amount: Decimal,
+        currency: str,
+        memo: str,
+        metadata: Dict,
+        user_id: Optional[str] = None,
+        account_id: Optional[str] = None
+    ) -> PiPaymentOutbox:
+        """Add the ledger transaction and its outbox record to the caller's session"""
+        outbox_id = str(uuid.uuid4())
+
+        transaction = Transaction(
+            id=str(uuid.uuid4()),
+            account_id=account_id,
+            type=TransactionType.TRANSFER,
+            status=TransactionStatus.PENDING,
+            amount=amount,
+            currency=currency,
+            reference=outbox_id,
+            metadata=json.dumps(metadata)
+        )
+        outbox = PiPaymentOutbox(
+            id=outbox_id,
+            transaction_id=transaction.id,
+            user_id=user_id,
+            state=PiPaymentState.PENDING,
+            amount=amount,
+            memo=memo,
+            payment_metadata=metadata,
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.add_all([transaction, outbox])
+        await db.flush()
+        return outbox
+
+    async def record_txid(self, db: AsyncSession, outbox_id: str, txid: str, user_id: Optional[str]) -> Optional[PiPaymentOutbox]:
+        """Attach the blockchain txid so the saga can complete the payment; None unless the user owns it"""
+        outbox = await db.get(PiPaymentOutbox, outbox_id)
+        if not outbox or outbox.user_id != user_id:
+            return None
+        if outbox.state in ACTIVE_STATES and not outbox.txid:
+            outbox.txid = txid
+            outbox.next_attempt_at = datetime.utcnow()
+            await db.flush()
+        return outbox
+
+    def notify(self):
+        """Wake idle workers after new work has been committed"""
+        self._wakeup.set()
+
+    async def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                claimed = await self._claim()
+            except Exception as e:
+                print(f"Pi saga claim error: {e}")
+                claimed = []
+
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            for outbox in claimed:
+                try:
+                    await self._drive(outbox)
+                except Exception as e:
+                    # The lease expires on its own and another worker picks the row up
+                    print(f"Pi saga error for outbox {outbox.id}: {e}")
+
+    async def _claim(self) -> List[PiPaymentOutbox]:
+        """Lease a batch of due outbox rows; SKIP LOCKED keeps workers from colliding"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(PiPaymentOutbox)
+                .where(PiPaymentOutbox.state.in_(ACTIVE_STATES))
+                .where(PiPaymentOutbox.next_attempt_at <= now)
+                .where(or_(PiPaymentOutbox.locked_until.is_(None), PiPaymentOutbox.locked_until < now))
+                # Approved payments wait for the txid before completion
+                .where(or_(PiPaymentOutbox.state != PiPaymentState.APPROVED, PiPaymentOutbox.txid.is_not(None)))
+                .order_by(PiPaymentOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = result.scalars().all()
+            for outbox in claimed:
+                outbox.locked_until = now + self.lease
+            await session.commit()
+        return claimed
+
+    async def _drive(self, outbox: PiPaymentOutbox):
+        """Advance one payment as far as it can go without waiting on the payer"""
+        while outbox.state in ACTIVE_STATES:
+            if outbox.state == PiPaymentState.APPROVED and not outbox.txid:
+                break
+            outbox = await self._renew(outbox)
+            if outbox is None:
+                return
+            try:
+                updates = await self._step(outbox)
+            except Exception as e:
+                await self._record_failure(outbox, e)
+                return
+            outbox = await self._record_step(outbox.id, updates)
+
+        await self._release(outbox.id)
+
+    async def _renew(self, outbox: PiPaymentOutbox) -> Optional[PiPaymentOutbox]:
+        """Extend this worker's lease before a Pi call; None if another worker has claimed the row"""
+        async with AsyncSessionLocal() as session:
+            row = await session.get(PiPaymentOutbox, outbox.id, with_for_update=True)
+            if row is None or row.locked_until != outbox.locked_until:
+                return None
+            row.locked_until = datetime.utcnow() + self.lease
+            await session.commit()
+        return row
+
+    async def _find_pi_payment(self, outbox_id: str) -> Optional[Dict]:
+        """The Pi payment an earlier create call opened for this outbox row, if any"""
+        for payment in await self.pi_service.get_incomplete_server_payments():
+            if (payment.get("metadata") or {}).get("outbox_id") == outbox_id:
+                return payment
+        return None
+
+    async def _mark_create_requested(self, outbox_id: str):
+        async with AsyncSessionLocal() as session:
+            row = await session.get(PiPaymentOutbox, outbox_id)
+            row.create_requested_at = datetime.utcnow()
+            await session.commit()
+
+    async def _step(self, outbox: PiPaymentOutbox) -> Dict:
+        """Perform the next Pi call and return the outbox fields it changes"""
+        if outbox.state == PiPaymentState.PENDING:
+            if outbox.create_requested_at:
+                # The last create may have reached Pi before it failed or before its result was saved
+                payment = await self._find_pi_payment(outbox.id)
+                if payment:
+                    return {"state": PiPaymentState.CREATED, "pi_payment_id": payment.get("identifier")}
+            else:
+                await self._mark_create_requested(outbox.id)
+            result = await self.pi_service.create_payment(
+                amount=float(outbox.amount),
+                memo=outbox.memo,
+                metadata={**(outbox.payment_metadata or {}), "outbox_id": outbox.id}
+            )
+            return {"state": PiPaymentState.CREATED, "pi_payment_id": result.get("identifier")}
+
+        if outbox.state == PiPaymentState.CREATED:
+            await self.pi_service.approve_payment(outbox.pi_payment_id)
+            return {"state": PiPaymentState.APPROVED}
+
+        await self.pi_service.complete_payment(outbox.pi_payment_id, outbox.txid)
+        return {"state": PiPaymentState.COMPLETED}
+
+    async def _record_step(self, outbox_id: str, updates: Dict) -> PiPaymentOutbox:
+        """Persist a successful step and mirror it onto the ledger in one commit"""
+        async with AsyncSessionLocal() as session:
+            outbox = await session.get(PiPaymentOutbox, outbox_id)
+            for field, value in updates.items():
+                setattr(outbox, field, value)
+            outbox.attempts = 0
+            outbox.last_error = None
+            outbox.next_attempt_at = datetime.utcnow()
+            transaction = await LedgerService.update_transaction_status(
+                session, outbox.transaction_id, LEDGER_STATUS[outbox.state]
+            )
+            # Only money that actually moved counts towards the AML rules
+            if outbox.state == PiPaymentState.COMPLETED and transaction:
+                await transaction_monitor.check_transaction(session, transaction, outbox.user_id)
+            await session.commit()
+        return outbox
+
+    async def _record_failure(self, outbox: PiPaymentOutbox, error: Exception):
+        async with AsyncSessionLocal() as session:
+            row = await session.get(PiPaymentOutbox, outbox.id)
+            row.attempts += 1
+            row.last_error = str(error)
+            row.locked_until = None
+
+            if row.attempts >= self.max_attempts or not self._is_retryable(error):
+                row.state = PiPaymentState.FAILED
+                await LedgerService.update_transaction_status(
+                    session, row.transaction_id, TransactionStatus.FAILED
+                )
+            else:
+                delay = min(self.base_backoff * 2 ** (row.attempts - 1), self.max_backoff)
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+            await session.commit()
+
+    async def _release(self, outbox_id: str):
+        async with AsyncSessionLocal() as session:
+            row = await session.get(PiPaymentOutbox, outbox_id)
+            row.locked_until = None
+            await session.commit()
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """Client errors other than timeouts and throttling will not succeed on retry"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status in (408, 429)
+        return True
+
+
+# Initialize global saga
+pi_payment_saga = PiPaymentSaga(
+    PiNetworkService(),
+    workers=settings.PI_SAGA_WORKERS,
+    max_attempts=settings.PI_SAGA_MAX_ATTEMPTS
+)
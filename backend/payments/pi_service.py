@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import httpx
 from backend.core.config import settings
 
@@ -7,8 +7,9 @@ class PiNetworkService:
     
     BASE_URL = "https://api.minepi.com"
     
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None):
         self.api_key = settings.PI_API_KEY
+        self.base_url = base_url or settings.PI_API_BASE_URL or self.BASE_URL
     
     async def create_payment(
         self,
@@ -19,7 +20,7 @@ class PiNetworkService:
         """Create Pi payment"""
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                f"{self.BASE_URL}/v2/payments",
+                f"{self.base_url}/v2/payments",
                 headers={"Authorization": f"Key {self.api_key}"},
                 json={
                     "payment": {
@@ -36,7 +37,7 @@ class PiNetworkService:
         """Approve Pi payment"""
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                f"{self.BASE_URL}/v2/payments/{payment_id}/approve",
+                f"{self.base_url}/v2/payments/{payment_id}/approve",
                 headers={"Authorization": f"Key {self.api_key}"}
             )
             response.raise_for_status()
@@ -46,18 +47,28 @@ class PiNetworkService:
         """Complete Pi payment"""
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                f"{self.BASE_URL}/v2/payments/{payment_id}/complete",
+                f"{self.base_url}/v2/payments/{payment_id}/complete",
                 headers={"Authorization": f"Key {self.api_key}"},
                 json={"txid": txid}
             )
             response.raise_for_status()
             return response.json()
     
+    async def get_incomplete_server_payments(self) -> List[Dict]:
+        """List this app's payments that are neither completed nor cancelled"""
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.base_url}/v2/payments/incomplete_server_payments",
+                headers={"Authorization": f"Key {self.api_key}"}
+            )
+            response.raise_for_status()
+            return response.json().get("incomplete_server_payments", [])
+    
     async def get_payment(self, payment_id: str) -> Dict:
         """Get Pi payment status"""
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"{self.BASE_URL}/v2/payments/{payment_id}",
+                f"{self.base_url}/v2/payments/{payment_id}",
                 headers={"Authorization": f"Key {self.api_key}"}
             )
             response.raise_for_status()
@@ -0,0 +1,149 @@
+"""
+Local Pi Network API simulator for load testing the payment path.
+
+Run it and point the backend at it:
+
+    uvicorn backend.payments.pi_simulator:app --port 8100
+    PI_API_BASE_URL=http://localhost:8100 uvicorn backend.main:app
+
+Latency, error rate and rate limiting are configured through PI_SIM_* env vars.
+"""
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import random
+import time
+import uuid
+
+class PiSimulatorConfig(BaseSettings):
+    """Fault injection knobs for the simulated Pi API"""
+
+    LATENCY_MS: float = 50.0
+    LATENCY_JITTER_MS: float = 20.0
+    ERROR_RATE: float = 0.0  # fraction of requests answered with ERROR_STATUS
+    ERROR_STATUS: int = 503
+    RATE_LIMIT_RPS: float = 0.0  # 0 disables rate limiting
+    RATE_LIMIT_BURST: int = 50
+    SEED: Optional[int] = None
+
+    class Config:
+        env_prefix = "PI_SIM_"
+
+class PaymentCreateBody(BaseModel):
+    payment: Dict
+
+class PaymentCompleteBody(BaseModel):
+    txid: str
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+def create_pi_simulator(config: Optional[PiSimulatorConfig] = None) -> FastAPI:
+    """Build an ASGI app implementing the subset of /v2/payments the backend uses"""
+    config = config or PiSimulatorConfig()
+    rng = random.Random(config.SEED)
+    bucket = _TokenBucket(config.RATE_LIMIT_RPS, config.RATE_LIMIT_BURST) if config.RATE_LIMIT_RPS > 0 else None
+    payments: Dict[str, Dict] = {}
+    stats = {"requests": 0, "rate_limited": 0, "injected_errors": 0}
+
+    app = FastAPI(title="Pi Network API Simulator")
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path.startswith("/_simulator"):
+            return await call_next(request)
+
+        stats["requests"] += 1
+
+        if bucket and not bucket.take():
+            stats["rate_limited"] += 1
+            return JSONResponse({"error": "rate_limited"}, status_code=429, headers={"Retry-After": "1"})
+
+        delay = max(0.0, rng.gauss(config.LATENCY_MS, config.LATENCY_JITTER_MS)) / 1000
+        await asyncio.sleep(delay)
+
+        if rng.random() < config.ERROR_RATE:
+            stats["injected_errors"] += 1
+            return JSONResponse({"error": "injected_failure"}, status_code=config.ERROR_STATUS)
+
+        return await call_next(request)
+
+    def _get(payment_id: str) -> Dict:
+        payment = payments.get(payment_id)
+        if not payment:
+            raise HTTPException(status_code=404, detail="payment_not_found")
+        return payment
+
+    @app.post("/v2/payments")
+    async def create_payment(body: PaymentCreateBody):
+        identifier = uuid.uuid4().hex
+        payments[identifier] = {
+            "identifier": identifier,
+            "amount": body.payment.get("amount"),
+            "memo": body.payment.get("memo"),
+            "metadata": body.payment.get("metadata", {}),
+            "created_at": datetime.utcnow().isoformat(),
+            "status": {
+                "developer_approved": False,
+                "transaction_verified": False,
+                "developer_completed": False,
+                "cancelled": False
+            },
+            "transaction": None
+        }
+        return payments[identifier]
+
+    @app.get("/v2/payments/incomplete_server_payments")
+    async def incomplete_server_payments():
+        incomplete = [
+            payment for payment in payments.values()
+            if not payment["status"]["developer_completed"] and not payment["status"]["cancelled"]
+        ]
+        return {"incomplete_server_payments": incomplete}
+
+    @app.get("/v2/payments/{payment_id}")
+    async def get_payment(payment_id: str):
+        return _get(payment_id)
+
+    @app.post("/v2/payments/{payment_id}/approve")
+    async def approve_payment(payment_id: str):
+        payment = _get(payment_id)
+        payment["status"]["developer_approved"] = True
+        return payment
+
+    @app.post("/v2/payments/{payment_id}/complete")
+    async def complete_payment(payment_id: str, body: PaymentCompleteBody):
+        payment = _get(payment_id)
+        if not payment["status"]["developer_approved"]:
+            raise HTTPException(status_code=400, detail="payment_not_approved")
+        payment["status"]["transaction_verified"] = True
+        payment["status"]["developer_completed"] = True
+        payment["transaction"] = {"txid": body.txid, "verified": True}
+        return payment
+
+    @app.get("/_simulator/stats")
+    async def simulator_stats():
+        return {**stats, "payments": len(payments)}
+
+    return app
+
+
+app = create_pi_simulator()
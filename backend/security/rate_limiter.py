@@ -1,104 +1,594 @@
-from fastapi import Request, HTTPException
+from fastapi import Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from abc import ABC, abstractmethod
+from jose import JWTError, jwt
+from sqlalchemy import select
 import asyncio
+import json
+import math
+import time
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.ledger.models import Account
+from backend.payments.fx_service import FXService
 
-class RateLimiter:
-    """In-memory rate limiter with sliding window"""
+# (key, max_requests, window_seconds, cost)
+LimitCheck = Tuple[str, int, float, float]
+
+class RateLimitBackend(ABC):
+    """Where rate limit state is kept"""
     
-    def __init__(self):
-        # Store: {key: [(timestamp, count)]}
-        self._storage: Dict[str, list] = defaultdict(list)
-        self._lock = asyncio.Lock()
+    @abstractmethod
+    async def acquire(self, checks: Sequence[LimitCheck]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Consume `cost` units from every limit, or from none if any would be
+        exceeded. Keys must be distinct.
+        Returns (is_allowed, metadata) where metadata describes the limit
+        that refused, or the one closest to running out, and its "index"
+        """
+        pass
     
     async def is_allowed(
         self,
         key: str,
         max_requests: int,
-        window_seconds: int
-    ) -> Tuple[bool, Dict[str, any]]:
+        window_seconds: float,
+        cost: float = 1.0
+    ) -> Tuple[bool, Dict[str, Any]]:
         """
         Check if request is allowed within rate limit
         Returns (is_allowed, metadata)
         """
-        async with self._lock:
-            now = datetime.utcnow()
-            window_start = now - timedelta(seconds=window_seconds)
+        return await self.acquire([(key, max_requests, window_seconds, cost)])
+    
+    async def close(self):
+        """Release connections"""
+        pass
+
+
+class RateLimiter(RateLimitBackend):
+    """
+    In-memory GCRA (generic cell rate algorithm) limiter. Limits are per
+    process; use RedisRateLimitBackend to share them between workers.
+    
+    Each key stores a single float, its theoretical arrival time (TAT). A
+    request is allowed when it would leave the TAT at most one window ahead
+    of now, and moves the TAT one emission interval (window / max_requests)
+    forward. That admits bursts of up to max_requests and then a steady
+    max_requests per window, with O(1) time and memory per key.
+    
+    The check is a plain read-modify-write with no await in between, so on
+    the event loop it needs no lock. A key whose TAT has passed is
+    indistinguishable from a new one. Such keys are dropped by a timer wheel
+    that is advanced as requests arrive.
+    """
+    
+    def __init__(self, tick: float = 1.0, wheel_slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self._tat: Dict[str, float] = {}
+        self._tick = tick
+        self._clock = clock
+        self._wheel: List[List[str]] = [[] for _ in range(wheel_slots)]
+        self._wheel_tick = int(clock() / tick)
+    
+    def __len__(self) -> int:
+        return len(self._tat)
+    
+    def _schedule(self, key: str, tat: float):
+        """Queue the key for an idle check once its TAT has passed"""
+        slot = max(int(tat / self._tick) + 1, self._wheel_tick + 1)
+        self._wheel[slot % len(self._wheel)].append(key)
+    
+    def _advance(self, now: float):
+        """Fire every wheel slot up to now; each key is checked about once per idle period"""
+        current = int(now / self._tick)
+        if current <= self._wheel_tick:
+            return
+        slots = len(self._wheel)
+        first = max(self._wheel_tick + 1, current - slots + 1)
+        self._wheel_tick = current
+        for tick in range(first, current + 1):
+            slot = self._wheel[tick % slots]
+            if not slot:
+                continue
+            self._wheel[tick % slots] = []
+            for key in slot:
+                tat = self._tat.get(key)
+                if tat is None:
+                    continue
+                if tat <= now:
+                    del self._tat[key]
+                else:
+                    # Still active, or scheduled a lap early; check again later
+                    self._schedule(key, tat)
+    
+    def check_many(self, checks: Sequence[LimitCheck]) -> Tuple[bool, Dict[str, Any]]:
+        """Synchronous all-or-nothing check-and-consume; see acquire"""
+        now = self._clock()
+        self._advance(now)
+        to_epoch = time.time() - now
+        
+        updates = []
+        tightest = None
+        for index, (key, max_requests, window_seconds, cost) in enumerate(checks):
+            interval = window_seconds / max_requests
+            tat = self._tat.get(key)
+            base = now if tat is None or tat < now else tat
+            new_tat = base + interval * cost
+            if new_tat - now > window_seconds + 1e-9:
+                return False, {
+                    "limit": max_requests,
+                    "remaining": 0,
+                    "reset": base + to_epoch,
+                    "retry_after": max(1, math.ceil(new_tat - window_seconds - now)),
+                    "index": index
+                }
             
-            # Clean old entries
-            if key in self._storage:
-                self._storage[key] = [
-                    (ts, count) for ts, count in self._storage[key]
-                    if ts > window_start
-                ]
+            updates.append((key, new_tat, tat is None))
+            remaining = max(0, int((now + window_seconds - new_tat) / interval + 1e-9))
+            if tightest is None or remaining / max_requests < tightest[0]:
+                tightest = (remaining / max_requests, {
+                    "limit": max_requests,
+                    "remaining": remaining,
+                    "reset": new_tat + to_epoch,
+                    "index": index
+                })
+        
+        for key, new_tat, new_key in updates:
+            self._tat[key] = new_tat
+            if new_key:
+                self._schedule(key, new_tat)
+        return True, tightest[1] if tightest else {}
+    
+    def check(self, key: str, max_requests: int, window_seconds: float, cost: float = 1.0) -> Tuple[bool, Dict[str, Any]]:
+        """Synchronous check-and-consume of a single limit"""
+        return self.check_many([(key, max_requests, window_seconds, cost)])
+    
+    async def acquire(self, checks: Sequence[LimitCheck]) -> Tuple[bool, Dict[str, Any]]:
+        return self.check_many(checks)
+
+
+# All-or-nothing GCRA over every key in one round trip, on the server clock
+# so every process agrees on time. ARGV holds (interval, window, needed,
+# wanted) per key; each key is granted between needed and wanted units, as
+# many as its limit allows. Returns {'1', granted, ahead, ...} with how far
+# each TAT now runs ahead of the clock, or {'0', index, ahead} for the first
+# key that cannot spare `needed`.
+GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tats, grants = {}, {}
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[i * 4 - 3])
+    local window = tonumber(ARGV[i * 4 - 2])
+    local needed = tonumber(ARGV[i * 4 - 1])
+    local wanted = tonumber(ARGV[i * 4])
+    local tat = tonumber(redis.call('GET', KEYS[i])) or now
+    if tat < now then
+        tat = now
+    end
+    local available = (now + window - tat) / interval
+    if available + 1e-9 < needed then
+        return {'0', tostring(i), string.format('%.6f', tat - now)}
+    end
+    grants[i] = math.min(wanted, available)
+    tats[i] = tat + grants[i] * interval
+end
+local result = {'1'}
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], string.format('%.6f', tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    result[i * 2] = string.format('%.6f', grants[i])
+    result[i * 2 + 1] = string.format('%.6f', tats[i] - now)
+end
+return result
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    GCRA state in Redis (or anything speaking its protocol), shared by every
+    worker and pod. Each check is a single EVALSHA, however many limits it
+    covers.
+    
+    To cut round trips a process leases a slice of a key's limit
+    (lease_fraction of max_requests) and serves requests from it locally
+    until it runs out or lease_ttl passes. Leased units are already charged
+    in Redis, so the shared limit still holds; near the limit the script
+    grants only what is left. A refusal is remembered until its retry time,
+    since no capacity can free up before then, so a client hammering a
+    spent limit costs no round trips. When Redis is unreachable the failure
+    policy applies: "open" falls back to per-process in-memory limits,
+    "closed" refuses requests. Redis is retried after retry_interval.
+    """
+    
+    def __init__(
+        self,
+        url: str = "",
+        client=None,
+        prefix: str = "ratelimit:",
+        lease_fraction: float = 0.02,
+        lease_ttl: float = 1.0,
+        timeout: float = 0.1,
+        failure_policy: str = "open",
+        retry_interval: float = 1.0
+    ):
+        if failure_policy not in ("open", "closed"):
+            raise ValueError(f"Unknown rate limit failure policy: {failure_policy}")
+        self.url = url
+        self.prefix = prefix
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.timeout = timeout
+        self.failure_policy = failure_policy
+        self.retry_interval = retry_interval
+        self._client = client
+        self._script = None
+        # key -> [units left, lease expiry (monotonic), reset (epoch), units left in Redis]
+        self._leases: Dict[str, List[float]] = {}
+        # key -> (time the limit starts freeing up (monotonic), emission interval, reset (epoch))
+        self._refused: Dict[str, Tuple[float, float, float]] = {}
+        self._next_sweep = 0.0
+        self._down_until = 0.0
+        self._fallback = RateLimiter()
+        self.round_trips = 0
+        self.failures = 0
+    
+    def _get_client(self):
+        """Lazy load Redis client"""
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, socket_timeout=self.timeout, socket_connect_timeout=self.timeout)
+        if self._script is None:
+            self._script = self._client.register_script(GCRA_SCRIPT)
+        return self._script
+    
+    def _lease_size(self, max_requests: int, cost: float) -> float:
+        return max(cost, float(int(max_requests * self.lease_fraction)))
+    
+    def _sweep(self, now: float):
+        """Drop expired leases and refusals, at most once per lease_ttl"""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.lease_ttl
+        self._leases = {key: lease for key, lease in self._leases.items() if lease[1] > now}
+        self._refused = {key: refusal for key, refusal in self._refused.items() if refusal[0] + refusal[1] > now}
+    
+    def _refund(self, reserved: List[Tuple[List[float], float]]):
+        for lease, cost in reserved:
+            lease[0] += cost
+    
+    async def acquire(self, checks: Sequence[LimitCheck]) -> Tuple[bool, Dict[str, Any]]:
+        now = time.monotonic()
+        self._sweep(now)
+        
+        # Take what the local leases cover, remembering it in case another limit refuses
+        leases: List[Optional[List[float]]] = [None] * len(checks)
+        reserved: List[Tuple[List[float], float]] = []
+        remote: List[int] = []
+        for index, (key, max_requests, window_seconds, cost) in enumerate(checks):
+            refusal = self._refused.get(key)
+            if refusal is not None and refusal[0] + cost * refusal[1] > now:
+                self._refund(reserved)
+                return False, {
+                    "limit": max_requests,
+                    "remaining": 0,
+                    "reset": refusal[2],
+                    "retry_after": max(1, math.ceil(refusal[0] + cost * refusal[1] - now)),
+                    "index": index
+                }
+            lease = self._leases.get(key)
+            if lease is not None and lease[1] > now and lease[0] + 1e-9 >= cost:
+                lease[0] -= cost
+                reserved.append((lease, cost))
+                leases[index] = lease
+            else:
+                remote.append(index)
+        
+        if remote:
+            if now < self._down_until:
+                self._refund(reserved)
+                return self._unavailable(checks)
             
-            # Count requests in window
-            current_count = sum(count for _, count in self._storage[key])
+            keys, args = [], []
+            for index in remote:
+                key, max_requests, window_seconds, cost = checks[index]
+                keys.append(self.prefix + key)
+                args += [window_seconds / max_requests, window_seconds, cost, self._lease_size(max_requests, cost)]
+            try:
+                script = self._get_client()
+                self.round_trips += 1
+                result = await asyncio.wait_for(script(keys=keys, args=args), timeout=self.timeout)
+            except Exception as e:
+                self._refund(reserved)
+                self.failures += 1
+                self._down_until = time.monotonic() + self.retry_interval
+                print(f"Rate limit backend unavailable, failing {self.failure_policy}: {e!r}")
+                return self._unavailable(checks)
             
-            if current_count >= max_requests:
-                # Calculate retry after
-                if self._storage[key]:
-                    oldest = min(ts for ts, _ in self._storage[key])
-                    retry_after = int((oldest + timedelta(seconds=window_seconds) - now).total_seconds())
-                else:
-                    retry_after = window_seconds
-                
+            received = time.monotonic()
+            if int(result[0]) == 0:
+                self._refund(reserved)
+                index = remote[int(result[1]) - 1]
+                key, max_requests, window_seconds, cost = checks[index]
+                interval = window_seconds / max_requests
+                ahead = float(result[2])
+                reset = time.time() + ahead
+                self._refused[key] = (received + ahead - window_seconds, interval, reset)
                 return False, {
                     "limit": max_requests,
                     "remaining": 0,
-                    "reset": (now + timedelta(seconds=retry_after)).timestamp(),
-                    "retry_after": retry_after
+                    "reset": reset,
+                    "retry_after": max(1, math.ceil(ahead + cost * interval - window_seconds)),
+                    "index": index
                 }
             
-            # Allow request
-            self._storage[key].append((now, 1))
-            
-            return True, {
-                "limit": max_requests,
-                "remaining": max_requests - current_count - 1,
-                "reset": (window_start + timedelta(seconds=window_seconds)).timestamp()
-            }
+            for position, index in enumerate(remote):
+                key, max_requests, window_seconds, cost = checks[index]
+                interval = window_seconds / max_requests
+                granted, ahead = float(result[position * 2 + 1]), float(result[position * 2 + 2])
+                lease = [
+                    granted - cost,
+                    received + min(self.lease_ttl, granted * interval),
+                    time.time() + ahead,
+                    max(0.0, (window_seconds - ahead) / interval)
+                ]
+                if lease[0] > 1e-9:
+                    self._leases[key] = lease
+                else:
+                    self._leases.pop(key, None)
+                leases[index] = lease
+        
+        tightest = None
+        for index, lease in enumerate(leases):
+            max_requests = checks[index][1]
+            remaining = int(lease[3] + lease[0] + 1e-9)
+            if tightest is None or remaining / max_requests < tightest[0]:
+                tightest = (remaining / max_requests, {
+                    "limit": max_requests,
+                    "remaining": remaining,
+                    "reset": lease[2],
+                    "index": index
+                })
+        return True, tightest[1] if tightest else {}
+    
+    def _unavailable(self, checks: Sequence[LimitCheck]) -> Tuple[bool, Dict[str, Any]]:
+        if self.failure_policy == "open":
+            return self._fallback.check_many(checks)
+        return False, {
+            "limit": checks[0][1],
+            "remaining": 0,
+            "reset": time.time() + self.retry_interval,
+            "retry_after": max(1, math.ceil(self.retry_interval)),
+            "index": 0
+        }
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "leased_keys": len(self._leases),
+            "refused_keys": len(self._refused),
+            "round_trips": self.round_trips,
+            "failures": self.failures,
+            "failure_policy": self.failure_policy,
+            "available": time.monotonic() >= self._down_until
+        }
 
 
+class InProcessRedis:
+    """
+    Stand-in for a Redis client in tests and benchmarks. It covers the part
+    of redis.asyncio RedisRateLimitBackend uses, running GCRA_SCRIPT in
+    Python. Set `down` to simulate an outage and `latency` to add a round
+    trip delay.
+    """
+    
+    def __init__(self, latency: float = 0.0, clock: Callable[[], float] = time.time):
+        self.latency = latency
+        self.down = False
+        self.calls = 0
+        self._clock = clock
+        self._store: Dict[str, Tuple[str, float]] = {}
+    
+    def register_script(self, script: str):
+        if script != GCRA_SCRIPT:
+            raise NotImplementedError("InProcessRedis only runs GCRA_SCRIPT")
+        return self._gcra
+    
+    async def _gcra(self, keys: List[str], args: List[Any]) -> List[bytes]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.down:
+            raise ConnectionError("Connection refused")
+        
+        now = self._clock()
+        tats, grants = [], []
+        for i, key in enumerate(keys):
+            interval, window, needed, wanted = (float(arg) for arg in args[i * 4:i * 4 + 4])
+            stored = self._store.get(key)
+            tat = float(stored[0]) if stored is not None and stored[1] > now else now
+            tat = max(tat, now)
+            available = (now + window - tat) / interval
+            if available + 1e-9 < needed:
+                return [b"0", str(i + 1).encode(), f"{tat - now:.6f}".encode()]
+            grants.append(min(wanted, available))
+            tats.append(tat + grants[-1] * interval)
+        
+        result = [b"1"]
+        for key, granted, tat in zip(keys, grants, tats):
+            self._store[key] = (f"{tat:.6f}", tat)
+            result += [f"{granted:.6f}".encode(), f"{tat - now:.6f}".encode()]
+        return result
+    
+    async def aclose(self):
+        pass
+
+
+class Quota:
+    """
+    `max_requests` units per `window_seconds` for each distinct value of
+    `scope` (ip, user, account or tenant). Each request costs one unit, or
+    with `weight="amount"` the amount in its JSON body converted to
+    VALUE_CURRENCY; amounts in a currency the FX table does not quote are
+    tracked in that currency. Requests without a value for the scope are
+    not counted.
+    """
+    
+    __slots__ = ("name", "scope", "max_requests", "window_seconds", "methods", "weight")
+    
+    SCOPES = ("ip", "user", "account", "tenant")
+    
+    def __init__(
+        self,
+        name: str,
+        scope: str,
+        max_requests: int,
+        window_seconds: float,
+        methods: Optional[Sequence[str]] = None,
+        weight: Optional[str] = None
+    ):
+        if scope not in self.SCOPES:
+            raise ValueError(f"Unknown quota scope: {scope}")
+        self.name = name
+        self.scope = scope
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.methods = frozenset(methods) if methods else None
+        self.weight = weight
+    
+    @property
+    def needs_body(self) -> bool:
+        return self.scope == "account" or self.weight is not None
+
+
+class _RouteNode:
+    __slots__ = ("children", "quotas", "effective", "by_method")
+    
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        self.quotas: List[Quota] = []
+        self.effective: List[Quota] = []
+        self.by_method: Dict[str, Tuple[Quota, ...]] = {}
+
+
+class RouteQuotas:
+    """
+    Path-segment trie from route prefixes to quotas. A request is subject to
+    the quotas of every prefix of its path; each node holds its ancestors'
+    quotas as well, so a lookup is one walk down the path.
+    """
+    
+    def __init__(self, limits: Dict[str, List[Quota]]):
+        self._root = _RouteNode()
+        for prefix, quotas in limits.items():
+            node = self._root
+            for segment in self._segments(prefix):
+                node = node.children.setdefault(segment, _RouteNode())
+            node.quotas.extend(quotas)
+        self._compile(self._root, [])
+    
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+    
+    def _compile(self, node: _RouteNode, inherited: List[Quota]):
+        node.effective = inherited + node.quotas
+        for child in node.children.values():
+            self._compile(child, node.effective)
+    
+    def match(self, method: str, path: str) -> Tuple[Quota, ...]:
+        node = self._root
+        for segment in self._segments(path):
+            child = node.children.get(segment)
+            if child is None:
+                break
+            node = child
+        
+        quotas = node.by_method.get(method)
+        if quotas is None:
+            quotas = node.by_method[method] = tuple(
+                quota for quota in node.effective if quota.methods is None or method in quota.methods
+            )
+        return quotas
+
+
+# Amount-weighted quotas are expressed in this currency
+VALUE_CURRENCY = "USD"
+
+# Value-moving endpoints: transfer count and value per user, value per account and tenant
+TRANSFERS = Quota("transfers", "user", 30, 3600, methods=["POST"])
+TRANSFER_VALUE = Quota("transfer_value", "user", 50_000, 3600, methods=["POST"], weight="amount")
+ACCOUNT_VALUE = Quota("account_value", "account", 50_000, 3600, methods=["POST"], weight="amount")
+TENANT_VALUE = Quota("tenant_value", "tenant", 5_000_000, 3600, methods=["POST"], weight="amount")
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Rate limiting middleware"""
     
-    def __init__(self, app, limiter: RateLimiter):
+    def __init__(
+        self,
+        app,
+        limiter: RateLimitBackend,
+        limits: Optional[Dict[str, List[Quota]]] = None,
+        fx: Optional[FXService] = None,
+        max_cached_accounts: int = 100_000
+    ):
         super().__init__(app)
         self.limiter = limiter
+        self.fx = fx or FXService()
+        self.max_cached_accounts = max_cached_accounts
+        self._account_owners: Dict[str, str] = {}
         
-        # Define rate limits for different endpoint types
-        self.limits = {
-            "/api/v1/auth": (10, 60),  # 10 requests per minute
-            "/api/v1/transactions": (100, 60),  # 100 requests per minute
-            "/api/v1/compliance": (50, 60),  # 50 requests per minute
-            "default": (1000, 60),  # 1000 requests per minute default
+        # Define rate limits for different endpoint types; every matching prefix applies
+        self.limits = limits or {
+            "/": [Quota("requests", "ip", 1000, 60)],  # 1000 requests per minute
+            "/api/v1/auth": [Quota("auth", "ip", 10, 60)],  # 10 requests per minute
+            "/api/v1/compliance": [Quota("compliance", "ip", 50, 60)],  # 50 requests per minute
+            "/api/v1/ledger/transactions": [
+                Quota("transactions", "ip", 100, 60),  # 100 requests per minute
+                TRANSFERS, TRANSFER_VALUE, ACCOUNT_VALUE, TENANT_VALUE
+            ],
+            "/api/v1/payments/pi/create": [TRANSFERS, TRANSFER_VALUE, ACCOUNT_VALUE, TENANT_VALUE],
         }
+        self.routes = RouteQuotas(self.limits)
     
     async def dispatch(self, request: Request, call_next):
         # Skip rate limiting for health checks
         if request.url.path in ["/health", "/metrics"]:
             return await call_next(request)
         
-        # Get rate limit for endpoint
-        max_requests, window = self._get_limit(request.url.path)
+        # Get quotas for endpoint and charge them all at once
+        quotas = self.routes.match(request.method, request.url.path)
+        checks, applied = await self._get_checks(request, quotas)
+        if not checks:
+            return await call_next(request)
         
-        # Create rate limit key (by IP and user if authenticated)
-        key = self._get_key(request)
+        # A cost above the whole limit would never be admitted, so there is nothing to retry
+        for (_, max_requests, window_seconds, cost), quota in zip(checks, applied):
+            if cost > max_requests:
+                return JSONResponse(
+                    {
+                        "detail": f"Amount exceeds the {quota.name} limit of {max_requests:g} per {window_seconds:g} seconds",
+                        "quota": quota.name
+                    },
+                    status_code=422
+                )
         
-        # Check rate limit
-        is_allowed, metadata = await self.limiter.is_allowed(key, max_requests, window)
+        is_allowed, metadata = await self.limiter.acquire(checks)
         
         if not is_allowed:
-            raise HTTPException(
+            # Exceptions raised in middleware bypass FastAPI's handlers, so answer directly
+            return JSONResponse(
+                {"detail": "Rate limit exceeded", "quota": applied[metadata["index"]].name},
                 status_code=429,
-                detail="Rate limit exceeded",
                 headers={
                     "X-RateLimit-Limit": str(metadata["limit"]),
                     "X-RateLimit-Remaining": str(metadata["remaining"]),
-                    "X-RateLimit-Reset": str(metadata["reset"]),
+                    "X-RateLimit-Reset": str(int(metadata["reset"])),
                     "Retry-After": str(metadata["retry_after"])
                 }
             )
@@ -111,25 +601,128 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         return response
     
-    def _get_limit(self, path: str) -> Tuple[int, int]:
-        """Get rate limit for path"""
-        for prefix, limit in self.limits.items():
-            if path.startswith(prefix):
-                return limit
-        return self.limits["default"]
-    
-    def _get_key(self, request: Request) -> str:
-        """Generate rate limit key from request"""
-        # Use IP address
-        client_ip = request.client.host if request.client else "unknown"
+    async def _get_checks(self, request: Request, quotas: Sequence[Quota]) -> Tuple[List[LimitCheck], List[Quota]]:
+        """
+        Key and cost of each quota that applies to this request. Only IP
+        quotas apply to anonymous requests: anything read from the body is
+        the caller's claim, so account and amount quotas need a verified
+        user, and an account is only charged when that user owns it.
+        """
+        claims: Dict[str, Any] = {}
+        if any(quota.scope != "ip" or quota.weight is not None for quota in quotas):
+            claims = self._get_claims(request)
+        user_id = claims.get("sub")
+        body: Dict[str, Any] = {}
+        if user_id and any(quota.needs_body for quota in quotas):
+            body = await self._get_body(request)
         
-        # Add user ID if authenticated
-        user_id = getattr(request.state, "user_id", None)
-        if user_id:
-            return f"{client_ip}:{user_id}"
+        account_id = body.get("account_id")
+        if not isinstance(account_id, str) or not any(quota.scope == "account" for quota in quotas):
+            account_id = None
+        elif not await self._owns_account(user_id, account_id):
+            account_id = None
         
-        return client_ip
+        scopes = {
+            "ip": request.client.host if request.client else "unknown",
+            "user": user_id,
+            "tenant": claims.get("tenant_id") if user_id else None,
+            "account": account_id,
+        }
+        value: Optional[Tuple[float, str]] = None
+        checks, applied = [], []
+        for quota in quotas:
+            scope_value = scopes[quota.scope]
+            if not scope_value:
+                continue
+            key = f"{quota.name}:{scope_value}"
+            cost = 1.0
+            if quota.weight is not None:
+                if value is None:
+                    amount = self._get_weight(body.get(quota.weight))
+                    if amount is None:
+                        continue
+                    value = await self._get_value(amount, str(body.get("currency", "")).upper())
+                cost, unit = value
+                key = f"{key}:{unit}"
+            checks.append((key, quota.max_requests, quota.window_seconds, cost))
+            applied.append(quota)
+        return checks, applied
+    
+    async def _owns_account(self, user_id: str, account_id: str) -> bool:
+        """Whether the account belongs to the user; owners are cached, unknown accounts are not"""
+        owner = self._account_owners.get(account_id)
+        if owner is None:
+            try:
+                async with AsyncSessionLocal() as session:
+                    owner = await session.scalar(select(Account.user_id).where(Account.id == account_id))
+            except Exception as e:
+                print(f"Rate limit account lookup error: {e}")
+                return False
+            if owner is None:
+                return False
+            self._account_owners[account_id] = owner
+            if len(self._account_owners) > self.max_cached_accounts:
+                del self._account_owners[next(iter(self._account_owners))]  # Forget the oldest account
+        return owner == user_id
+    
+    async def _get_value(self, amount: float, currency: str) -> Tuple[float, str]:
+        """Amount in VALUE_CURRENCY, or in its own currency when the FX table cannot convert it"""
+        if currency == VALUE_CURRENCY:
+            return amount, VALUE_CURRENCY
+        try:
+            table = await self.fx.get_table()
+            return amount * table.rate(currency, VALUE_CURRENCY), VALUE_CURRENCY
+        except ValueError:
+            # Not quoted (e.g. PI); limited in units of that currency
+            return amount, currency
+        except Exception as e:
+            print(f"Rate limit FX conversion error: {e}")
+            return amount, currency
+    
+    def _get_claims(self, request: Request) -> Dict[str, Any]:
+        """Verified JWT claims, or none for anonymous or invalid tokens"""
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return {}
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return {}
+    
+    async def _get_body(self, request: Request) -> Dict[str, Any]:
+        """JSON request body; the endpoint still receives it"""
+        if "json" not in request.headers.get("content-type", ""):
+            return {}
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+    
+    def _get_weight(self, value: Any) -> Optional[float]:
+        try:
+            weight = float(value)
+        except (TypeError, ValueError):
+            return None
+        return weight if weight > 0 and math.isfinite(weight) else None
+
+
+# Factory function to create the configured rate limit backend
+def get_rate_limit_backend() -> RateLimitBackend:
+    """Get rate limit backend based on configuration"""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        if settings.REDIS_URL:
+            return RedisRateLimitBackend(
+                settings.REDIS_URL,
+                lease_fraction=settings.RATE_LIMIT_LEASE_FRACTION,
+                timeout=settings.RATE_LIMIT_BACKEND_TIMEOUT,
+                failure_policy=settings.RATE_LIMIT_FAILURE_POLICY
+            )
+        print("RATE_LIMIT_BACKEND is redis but REDIS_URL is empty; limits are per process")
+    
+    # Default to in-memory limits
+    return RateLimiter()
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = get_rate_limit_backend()
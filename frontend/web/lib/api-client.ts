@@ -58,8 +58,13 @@ class APIClient {
     return this.request(`/api/v1/compliance/audit-logs?limit=${limit}&offset=${offset}`)
   }
 
-  async getComplianceAlerts() {
-    return this.request("/api/v1/compliance/alerts")
+  async getComplianceAlerts(filters: { severity?: string; alert_type?: string; user_id?: string; cursor?: string } = {}) {
+    const params = new URLSearchParams(Object.entries(filters).filter(([, value]) => value) as [string, string][])
+    return this.request(`/api/v1/compliance/alerts?${params}`)
+  }
+
+  async getComplianceAlertCounts() {
+    return this.request("/api/v1/compliance/alerts/counts")
   }
 
   async resolveAlert(alertId: string) {